@@ -0,0 +1,148 @@
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from account.models import CustomUser, FarmUser, Role
+
+
+class AccessSet:
+    """
+    Compiled roles and permission codenames of a user, globally and in one farm.
+
+    Global access comes from the user's own permissions, roles and groups,
+    farm access from the roles of the user's FarmUser in that farm. A set is
+    built in three queries, cached across requests under the user's
+    membership_version, and memoized on the user instance, i.e. for the
+    request it was authenticated for. The account signals increment the
+    membership_version of the users a change to roles, role permissions,
+    memberships or groups affects, in the transaction making it.
+    """
+
+    SET_KEY = 'account:access:{}:{}:{}'
+    FARMS_KEY = 'account:access:{}:farms:{}'
+    VERSION_CLAIM = 'membership_version'
+
+    def __init__(self, roles=(), permissions=(), farm_roles=(), farm_permissions=(), is_member=False):
+        self.roles = frozenset(roles)
+        self.permissions = frozenset(permissions)
+        self.farm_roles = frozenset(farm_roles)
+        self.farm_permissions = frozenset(farm_permissions)
+        self.is_member = is_member
+
+    @staticmethod
+    def bump_version(user_ids):
+        """Outdate the sets and tokens of `user_ids` (ids or a queryset of users), with the current transaction."""
+        CustomUser.objects.filter(pk__in=user_ids).update(membership_version=F('membership_version') + 1)
+
+    @classmethod
+    def for_user(cls, user, farm_id=None):
+        """The access set of `user` in `farm_id` (global access only without a farm)."""
+        farm_id = int(farm_id) if farm_id else None
+        memo = user.__dict__.setdefault('_access_sets', {})
+        if farm_id not in memo:
+            key = cls.SET_KEY.format(user.pk, farm_id or '-', user.membership_version)
+            compiled = cache.get(key)
+            if compiled is None:
+                compiled = cls.compile(user, farm_id)
+                cache.set(key, compiled, timeout=getattr(settings, 'ACCESS_CACHE_TIMEOUT', 60 * 60 * 24))
+            memo[farm_id] = cls(**compiled)
+        return memo[farm_id]
+
+    @classmethod
+    def claims(cls, user):
+        """
+        Token claims of `user`: global roles and permissions, and the roles and
+        permissions of each farm, as of the returned membership version.
+        """
+        # Loaded with the user, before the rows: a change racing the queries outdates the token
+        claims = {cls.VERSION_CLAIM: user.membership_version}
+        claims.update(cls.compile(user))
+        farms = {}
+        rows = FarmUser.objects.filter(user=user).values_list(
+            'farm_id', 'farm__name', 'roles__name', 'roles__permissions__codename'
+        ).order_by('farm_id')
+        for farm_id, farm_name, role_name, codename in rows:
+            farm = farms.setdefault(farm_id, {'id': farm_id, 'name': farm_name, 'roles': set(), 'permissions': set()})
+            if role_name is not None:
+                farm['roles'].add(role_name)
+            if codename is not None:
+                farm['permissions'].add(codename)
+        claims['farms'] = [
+            {**farm, 'roles': sorted(farm['roles']), 'permissions': sorted(farm['permissions'])}
+            for farm in farms.values()
+        ]
+        return claims
+
+    @classmethod
+    def has_claims(cls, token):
+        """Whether `token` carries access claims (tokens issued before them do not)."""
+        return token is not None and hasattr(token, 'payload') and cls.VERSION_CLAIM in token.payload
+
+    @classmethod
+    def from_token(cls, token, farm_id=None):
+        """The access set claimed by `token`, None when it carries no claims."""
+        if not cls.has_claims(token):
+            return None
+        farm_id = int(farm_id) if farm_id else None
+        farm = next((farm for farm in token.get('farms', ()) if farm['id'] == farm_id), None) if farm_id else None
+        return cls(
+            token.get('roles', ()),
+            token.get('permissions', ()),
+            farm['roles'] if farm else (),
+            farm.get('permissions', ()) if farm else (),
+            farm is not None,
+        )
+
+    @classmethod
+    def for_request(cls, request, farm_id=None):
+        """The access set claimed by the request's token, else compiled for its user."""
+        return cls.from_token(getattr(request, 'auth', None), farm_id) or cls.for_user(request.user, farm_id)
+
+    @classmethod
+    def request_farm_ids(cls, request):
+        token = getattr(request, 'auth', None)
+        if cls.has_claims(token):
+            return frozenset(farm['id'] for farm in token.get('farms', ()))
+        return cls.farm_ids(request.user)
+
+    @classmethod
+    def farm_ids(cls, user):
+        """Ids of the farms `user` is a member of."""
+        key = cls.FARMS_KEY.format(user.pk, user.membership_version)
+        farm_ids = cache.get(key)
+        if farm_ids is None:
+            farm_ids = frozenset(FarmUser.objects.filter(user=user).values_list('farm_id', flat=True))
+            cache.set(key, farm_ids, timeout=getattr(settings, 'ACCESS_CACHE_TIMEOUT', 60 * 60 * 24))
+        return farm_ids
+
+    @staticmethod
+    def forget(user):
+        """Drop the sets memoized on `user`, e.g. after changing its roles in place."""
+        user.__dict__.pop('_access_sets', None)
+
+    @staticmethod
+    def compile(user, farm_id=None):
+        compiled = {
+            'roles': list(user.roles.values_list('name', flat=True)),
+            'permissions': list(
+                Permission.objects.filter(
+                    Q(user=user)
+                    | Q(pk__in=Role.permissions.through.objects.filter(role__users=user).values('permission_id'))
+                    | Q(pk__in=CustomUser.groups.through.objects.filter(customuser=user).values('group__permissions'))
+                ).values_list('codename', flat=True).distinct()
+            ),
+        }
+        if farm_id is not None:
+            # One row per (role, permission) of the membership, a single NULL row without roles
+            rows = list(FarmUser.objects.filter(user=user, farm_id=farm_id).values_list('roles__name', 'roles__permissions__codename'))
+            compiled['farm_roles'] = list({name for name, _ in rows if name is not None})
+            compiled['farm_permissions'] = list({codename for _, codename in rows if codename is not None})
+            compiled['is_member'] = bool(rows)
+        return compiled
+
+    def has_role(self, role_name):
+        return role_name in self.roles or role_name in self.farm_roles
+
+    def has_permission(self, codename):
+        return codename in self.permissions or codename in self.farm_permissions
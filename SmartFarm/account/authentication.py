@@ -0,0 +1,26 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from account.access import AccessSet
+
+
+class MembershipJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication rejecting tokens whose access claims are outdated.
+
+    Tokens carry the user's farms and roles as of a membership version (see
+    AccessSet.claims). Once a membership, role or group change incremented
+    the user's membership_version, read from the user row loaded anyway,
+    the token is refused and the client refreshes it to get the current
+    claims. Tokens issued without claims are still accepted.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if AccessSet.has_claims(validated_token) and validated_token[AccessSet.VERSION_CLAIM] != user.membership_version:
+            raise InvalidToken({
+                'detail': _('Farm memberships changed, refresh the token.'),
+                'code': 'membership_changed',
+            })
+        return user
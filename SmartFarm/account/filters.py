@@ -2,27 +2,20 @@ from django_filters import rest_framework as filters
 
 from account.models import Customer
 from utilities.filters import BaseFarmFilter
-from django.db.models import Q
+from utilities.search import SearchIndex
 
 
 class CustomerFilter(BaseFarmFilter):
     """Filter for Customer model"""
     
-    # Text search
+    # Text search (name, phone, email, city, street), see utilities.search
     search = filters.CharFilter(method='filter_search')
-    is_active = filters.BooleanFilter()
     
     def filter_search(self, queryset, name, value):
         if value:
-            return queryset.filter(
-                Q(name__icontains=value) | 
-                Q(contact_person__icontains=value) |
-                Q(phone__icontains=value) |
-                Q(email__icontains=value) |
-                Q(address__icontains=value)
-            )
+            return SearchIndex.filter(queryset, value, SearchIndex.request_farm_ids(self.request))
         return queryset
     
     class Meta:
         model = Customer
-        fields = ['name', 'is_active', 'search', 'farm']
\ No newline at end of file
+        fields = ['name', 'search', 'farm']
\ No newline at end of file
@@ -1,31 +1,117 @@
-from account.models import Farm
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.utils.functional import SimpleLazyObject
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from account.access import AccessSet
+from account.authentication import MembershipJWTAuthentication
+from account.models import Farm, FarmUser
+
+
+class LazyFarm(SimpleLazyObject):
+    """The current farm, loaded on first use; its id and truthiness need no query."""
+
+    def __init__(self, farm_id):
+        self.__dict__['farm_id'] = farm_id
+        super().__init__(lambda: Farm.objects.get(pk=farm_id))
+
+    @property
+    def id(self):
+        return self.__dict__['farm_id']
+
+    pk = id
+
+    def __bool__(self):
+        return True
 
 
 class FarmContextMiddleware:
+    """
+    Sets request.current_farm_id and a lazy request.current_farm.
+
+    The farm comes from the X-Farm-Id header, else from the farm claim of the
+    bearer token, else from the session for session users, and must be one
+    of the user's farms, read from the token claims or AccessSet.farm_ids.
+    API calls are resolved from the token itself, without loading the user
+    nor any query. A farm missing from outdated claims is checked against
+    the memberships, so that the view refuses the token and the client
+    refreshes it. An explicitly requested farm outside the user's farms is
+    rejected.
+    """
+
+    HEADER = 'HTTP_' + getattr(settings, 'FARM_CONTEXT_HEADER', 'X-Farm-Id').upper().replace('-', '_')
+    CLAIM = getattr(settings, 'FARM_CONTEXT_CLAIM', 'farm_id')
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.jwt = MembershipJWTAuthentication()
 
     def __call__(self, request):
         request.current_farm = None
         request.current_farm_id = None
 
-        if request.user.is_authenticated:
-            farm_id = request.session.get('current_farm_id')
-
-            farm = (
-                Farm.objects.filter(id=farm_id, farmuser__user=request.user).first()
-                if farm_id else None
-            )
+        header = request.META.get(self.HEADER)
+        token = self.get_token(request)
+        if token is not None:
+            user_id = token.get(api_settings.USER_ID_CLAIM)
+            requested = header or token.get(self.CLAIM)
+            session = None
+        elif request.user.is_authenticated:
+            user_id = request.user.pk
+            requested = header
+            session = request.session
+        else:
+            return self.get_response(request)
 
+        if requested:
+            try:
+                farm_id = int(requested)
+            except (TypeError, ValueError):
+                return JsonResponse({'detail': 'Invalid farm id.'}, status=400)
+            if not self.is_member(token, user_id, farm_id) and not (
+                self.is_superuser(request, user_id, token) and Farm.objects.filter(pk=farm_id).exists()
+            ):
+                return JsonResponse({'detail': 'You do not have access to this farm.'}, status=403)
+        elif session is not None:
+            farm_ids = AccessSet.farm_ids(request.user)
+            farm_id = session.get('current_farm_id')
             # Fallback to first accessible farm if session is invalid or missing
-            if not farm:
-                farm_user = request.user.farmuser_set.select_related('farm').first()
-                if farm_user:
-                    farm = farm_user.farm
-                    request.session['current_farm_id'] = farm.id
+            if farm_id not in farm_ids:
+                farm_id = min(farm_ids) if farm_ids else None
+                if farm_id is not None:
+                    session['current_farm_id'] = farm_id
+        else:
+            farm_id = None
 
-            if farm:
-                request.current_farm = farm
-                request.current_farm_id = farm.id
+        if farm_id is not None:
+            request.current_farm = LazyFarm(farm_id)
+            request.current_farm_id = farm_id
 
         return self.get_response(request)
+
+    @staticmethod
+    def is_member(token, user_id, farm_id):
+        access = AccessSet.from_token(token, farm_id)
+        if access is not None and access.is_member:
+            return True
+        return FarmUser.objects.filter(user_id=user_id, farm_id=farm_id).exists()
+
+    def get_token(self, request):
+        """The validated bearer token of an API call, None without one."""
+        header = self.jwt.get_header(request)
+        raw_token = self.jwt.get_raw_token(header) if header else None
+        if raw_token is None:
+            return None
+        try:
+            return self.jwt.get_validated_token(raw_token)
+        except (InvalidToken, TokenError):
+            # Rejected by the authentication of the view
+            return None
+
+    @staticmethod
+    def is_superuser(request, user_id, token):
+        if token is None:
+            return request.user.is_superuser
+        return get_user_model().objects.filter(pk=user_id, is_superuser=True).exists()
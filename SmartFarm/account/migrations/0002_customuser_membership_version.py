@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='membership_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -7,22 +7,19 @@ from utilities.models import TimestampedModel
 
 
 def get_user_roles(user):
-    return list(user.roles.values_list('name', flat=True))
+    from account.access import AccessSet
+    return list(AccessSet.for_user(user).roles)
 
 def get_user_permissions(user):
-    permissions = set(user.user_permissions.values_list('codename', flat=True))
-    for role in user.roles.all():
-        permissions.update(role.permissions.values_list('codename', flat=True))
-    for group in user.groups.all():
-        permissions.update(group.permissions.values_list('codename', flat=True))
-    return permissions
+    from account.access import AccessSet
+    return set(AccessSet.for_user(user).permissions)
 
 def get_farm_roles(user, farm_id):
     return Role.objects.filter(farm_users__farm_id=farm_id, farm_users__user=user)
 
 def has_farm_permission(user, farm_id, permission_codename):
-    roles = get_farm_roles(user, farm_id)
-    return any(role.permissions.filter(codename=permission_codename).exists() for role in roles)
+    from account.access import AccessSet
+    return permission_codename in AccessSet.for_user(user, farm_id).farm_permissions
 
 
 class Role(models.Model):
@@ -63,6 +60,8 @@ class CustomUser(AddressFields, AbstractUser):
         related_name="custom_user_set",
         related_query_name="custom_user",
     )
+    # Incrémentée à chaque changement de ses rôles, groupes ou fermes (voir account.signals)
+    membership_version = models.PositiveIntegerField(default=0, editable=False)
 
     def has_role(self, role_name):
         return role_name in get_user_roles(self)
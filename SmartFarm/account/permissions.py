@@ -1,6 +1,12 @@
 from rest_framework.permissions import BasePermission
 from rest_framework import exceptions
 
+from account.access import AccessSet
+
+
+def request_farm_id(request, view):
+    return view.kwargs.get('farm_id') or getattr(request, 'current_farm_id', None)
+
 class IsAuthenticatedAndHasRole(BasePermission):
     """
     Permission qui vérifie si l'utilisateur a un rôle spécifique.
@@ -15,25 +21,15 @@ class IsAuthenticatedAndHasRole(BasePermission):
         if not request.user.is_authenticated:
             raise exceptions.PermissionDenied("User is not authenticated.")
         
-        # Vérification du rôle global
+        # Rôles globaux et rôles dans la ferme, lus dans le token ou compilés
         required_role = getattr(view, 'required_role', None)
-        if required_role and not request.user.has_role(required_role):
-            # Si pas de rôle global, vérifions le rôle dans la ferme
-            farm_id = view.kwargs.get('farm_id') or getattr(request, 'current_farm_id', None)
-            if farm_id:
-                # Vérifie si l'utilisateur a le rôle requis dans cette ferme
-                from ..account.models import FarmUser
-                has_farm_role = FarmUser.objects.filter(
-                    user=request.user,
-                    farm_id=farm_id,
-                    role__name=required_role
-                ).exists()
-                
-                if not has_farm_role:
+        if required_role:
+            farm_id = request_farm_id(request, view)
+            if not AccessSet.for_request(request, farm_id).has_role(required_role):
+                if farm_id:
                     raise exceptions.PermissionDenied(
                         f"User does not have the required role '{required_role}' for this farm."
                     )
-            else:
                 raise exceptions.PermissionDenied(
                     f"User does not have the required role: {required_role}"
                 )
@@ -58,24 +54,9 @@ class HasSpecificPermission(BasePermission):
         if not required_permission:
             return True
             
-        # Vérification de la permission globale
-        if request.user.has_permission(required_permission):
-            return True
-            
-        # Vérification de la permission dans le contexte d'une ferme
-        farm_id = view.kwargs.get('farm_id') or getattr(request, 'current_farm_id', None)
-        if farm_id:
-            from ..account.models import FarmUser
-            # Récupère le rôle de l'utilisateur dans cette ferme
-            try:
-                farm_user = FarmUser.objects.get(user=request.user, farm_id=farm_id)
-                # Vérifie si le rôle a la permission requise
-                if farm_user.role.permissions.filter(codename=required_permission).exists():
-                    return True
-            except FarmUser.DoesNotExist:
-                pass
-                
-        return False
+        # Permission globale ou permission d'un rôle dans la ferme
+        access = AccessSet.for_request(request, request_farm_id(request, view))
+        return access.has_permission(required_permission)
 
 class HasFarmAccess(BasePermission):
     """
@@ -89,14 +70,10 @@ class HasFarmAccess(BasePermission):
             return False
             
         # Récupère l'ID de la ferme depuis l'URL ou le contexte
-        farm_id = view.kwargs.get('farm_id') or getattr(request, 'current_farm_id', None)
+        farm_id = request_farm_id(request, view)
         if not farm_id:
             # Si pas de ferme spécifiée, on autorise (filtrage fait dans get_queryset)
             return True
             
         # Vérifie si l'utilisateur a accès à cette ferme
-        from ..account.models import FarmUser
-        return FarmUser.objects.filter(
-            user=request.user,
-            farm_id=farm_id
-        ).exists()
\ No newline at end of file
+        return AccessSet.for_request(request, farm_id).is_member
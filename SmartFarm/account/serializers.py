@@ -1,6 +1,9 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth import get_user_model
+from account.access import AccessSet
 from account.models import Farm, FarmUser, Role, Customer, Supplier
 
 # 🔐 Token avec rôles, fermes et permissions
@@ -8,29 +11,33 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
+        cls.set_claims(token, user)
+        return token
 
+    @staticmethod
+    def set_claims(token, user):
         token['username'] = user.username
         token['email'] = user.email
-        token['roles'] = list(user.roles.values_list('name', flat=True))
-
-        farms_info = []
-        farm_users = FarmUser.objects.filter(user=user).prefetch_related('roles', 'farm')
-        for fu in farm_users:
-            farms_info.append({
-                'id': fu.farm.id,
-                'name': fu.farm.name,
-                'roles': list(fu.roles.values_list('name', flat=True))
-            })
-        token['farms'] = farms_info
+        # Rôles, fermes (avec leurs rôles et permissions) et version des adhésions
+        for claim, value in AccessSet.claims(user).items():
+            token[claim] = value
 
-        all_perms = set(user.user_permissions.values_list('codename', flat=True))
-        for role in user.roles.all():
-            all_perms.update(role.permissions.values_list('codename', flat=True))
-        for group in user.groups.all():
-            all_perms.update(group.permissions.values_list('codename', flat=True))
+# 🔄 Rafraîchissement avec des claims à jour
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Re-issues the tokens with the current claims, so that refreshing a token
+    refused for outdated memberships brings it up to date.
+    """
 
-        token['permissions'] = list(all_perms)
-        return token
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = get_user_model().objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None:
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        CustomTokenObtainPairSerializer.set_claims(refresh, user)
+        return super().validate({**attrs, 'refresh': str(refresh)})
 
 # 🎭 Rôles
 class RoleSerializer(serializers.ModelSerializer):
@@ -0,0 +1,70 @@
+from django.contrib.auth.models import Group
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from account.access import AccessSet
+from account.models import CustomUser, FarmUser, Role
+
+
+def role_users(roles):
+    # Users holding the roles globally or in one of their farms
+    return CustomUser.objects.filter(Q(roles__in=roles) | Q(farmuser__roles__in=roles)).values('pk')
+
+def group_users(groups):
+    return CustomUser.objects.filter(groups__in=groups).values('pk')
+
+@receiver(post_save, sender=Role)
+@receiver(pre_delete, sender=Role)
+def invalidate_role_access(sender, instance, created=False, raw=False, **kwargs):
+    # Before the delete, while the role still lists its users
+    if not created and not raw:
+        AccessSet.bump_version(role_users([instance.pk]))
+
+@receiver(pre_delete, sender=Group)
+def invalidate_group_access(sender, instance, **kwargs):
+    AccessSet.bump_version(group_users([instance.pk]))
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_permission_access(sender, instance, action, reverse, pk_set, **kwargs):
+    # pre_ actions, while a clear still lists its rows
+    if not action.startswith('pre_'):
+        return
+    owner = Role if sender is Role.permissions.through else Group
+    if not reverse:
+        owners = [instance.pk]
+    else:
+        # permission.role_set / permission.group_set, pk_set lists roles or groups
+        owners = pk_set if pk_set is not None else owner.objects.filter(permissions=instance).values('pk')
+    AccessSet.bump_version(role_users(owners) if owner is Role else group_users(owners))
+
+@receiver(post_save, sender=FarmUser)
+@receiver(post_delete, sender=FarmUser)
+def invalidate_member_access(sender, instance, raw=False, **kwargs):
+    if not raw:
+        AccessSet.bump_version([instance.user_id])
+
+@receiver(m2m_changed, sender=FarmUser.roles.through)
+def invalidate_farm_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('pre_'):
+        return
+    if not reverse:
+        AccessSet.bump_version([instance.user_id])
+    else:
+        # role.farm_users.add(...) lists FarmUser ids, not users
+        farm_users = FarmUser.objects.filter(pk__in=pk_set) if pk_set is not None else FarmUser.objects.filter(roles=instance)
+        AccessSet.bump_version(farm_users.values('user_id'))
+
+@receiver(m2m_changed, sender=CustomUser.roles.through)
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+@receiver(m2m_changed, sender=CustomUser.user_permissions.through)
+def invalidate_user_access(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('pre_'):
+        return
+    if not reverse:
+        AccessSet.forget(instance)
+        AccessSet.bump_version([instance.pk])
+    else:
+        # role.users.add(...) and group.custom_user_set.add(...) list user ids, the current ones on clear
+        field = {CustomUser.roles.through: 'roles', CustomUser.groups.through: 'groups'}.get(sender, 'user_permissions')
+        AccessSet.bump_version(pk_set if pk_set is not None else CustomUser.objects.filter(**{field: instance}).values('pk'))
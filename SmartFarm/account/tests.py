@@ -1,3 +1,217 @@
-from django.test import TestCase
+from django.contrib.auth.models import AnonymousUser, Permission
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from account.access import AccessSet
+from account.middleware import FarmContextMiddleware
+from account.models import CustomUser, Farm, FarmUser, Role
+from account.serializers import CustomTokenObtainPairSerializer
+
+ADDRESS = dict(street='1 rue des Baobabs', city='Thiès', postal_code='21000', country_name='Sénégal', country_code='SN')
+# Access sets stay out of the development cache
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'account-tests'}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AccountTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_superuser('admin', password='secret', **ADDRESS)
+        cls.farm = Farm.objects.create(name='Ferme', owner=cls.owner, **ADDRESS)
+        cls.other_farm = Farm.objects.create(name='Autre ferme', owner=cls.owner, **ADDRESS)
+        cls.manager = Role.objects.create(name='production_manager')
+
+    def setUp(self):
+        cache.clear()
+
+    def add_member(self, username, farm=None, roles=()):
+        """A user (not a superuser) of `farm`, holding `roles` in it, reloaded past the version bumps."""
+        user = CustomUser.objects.create_user(username, password='secret', **ADDRESS)
+        membership = FarmUser.objects.create(farm=farm or self.farm, user=user)
+        membership.roles.add(*roles)
+        user.refresh_from_db()
+        return user
+
+    @staticmethod
+    def bearer(user):
+        return f'Bearer {CustomTokenObtainPairSerializer.get_token(user).access_token}'
+
+    def member_client(self, user, farm=None):
+        """A client holding a freshly issued JWT of `user`, working in `farm`."""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=self.bearer(user), HTTP_X_FARM_ID=str((farm or self.farm).pk))
+        return client
+
+
+class AccessSetTests(AccountTestCase):
+    def test_sets_are_cached_under_the_membership_version(self):
+        user = self.add_member('awa')
+        self.assertFalse(AccessSet.for_user(user, self.farm.pk).has_role('production_manager'))
+
+        # Another request: a fresh user instance, the set from the shared cache
+        user = CustomUser.objects.get(pk=user.pk)
+        with self.assertNumQueries(0):
+            access = AccessSet.for_user(user, self.farm.pk)
+        self.assertTrue(access.is_member)
+        self.assertFalse(AccessSet.for_user(user, self.other_farm.pk).is_member)
+
+        FarmUser.objects.get(user=user, farm=self.farm).roles.add(self.manager)
+        user = CustomUser.objects.get(pk=user.pk)
+        self.assertTrue(AccessSet.for_user(user, self.farm.pk).has_role('production_manager'))
+        # Farm roles only count in their farm
+        self.assertFalse(AccessSet.for_user(user).has_role('production_manager'))
+
+    def test_changes_only_outdate_the_users_they_affect(self):
+        holder = self.add_member('awa', roles=[self.manager])
+        bystander = self.add_member('binta')
+        versions = dict(CustomUser.objects.values_list('pk', 'membership_version'))
+
+        permission = Permission.objects.get(codename='add_farm')
+        self.manager.permissions.add(permission)
+
+        after = dict(CustomUser.objects.values_list('pk', 'membership_version'))
+        self.assertEqual(after[holder.pk], versions[holder.pk] + 1)
+        self.assertEqual(after[bystander.pk], versions[bystander.pk])
+        holder.refresh_from_db()
+        self.assertTrue(AccessSet.for_user(holder, self.farm.pk).has_permission('add_farm'))
+
+    def test_global_roles_and_permissions_apply_everywhere(self):
+        user = self.add_member('awa')
+        user.roles.add(self.manager)
+        user.user_permissions.add(Permission.objects.get(codename='view_farm'))
+        user.refresh_from_db()
+        access = AccessSet.for_user(user, self.other_farm.pk)
+        self.assertTrue(access.has_role('production_manager'))
+        self.assertTrue(access.has_permission('view_farm'))
+        self.assertFalse(access.is_member)
+
+    def test_views_require_the_role_in_the_current_farm(self):
+        user = self.add_member('awa')
+        response = self.member_client(user).post('/api/productions/animal-types/', {'name': 'Chèvre'})
+        self.assertEqual(response.status_code, 403)
+
+        FarmUser.objects.get(user=user, farm=self.farm).roles.add(self.manager)
+        user.refresh_from_db()
+        response = self.member_client(user).post('/api/productions/animal-types/', {'name': 'Chèvre'})
+        self.assertEqual(response.status_code, 201)
+
+        # The role does not follow the user into a farm where it lacks it
+        FarmUser.objects.create(farm=self.other_farm, user=user)
+        user.refresh_from_db()
+        response = self.member_client(user, self.other_farm).post('/api/productions/animal-types/', {'name': 'Mouton'})
+        self.assertEqual(response.status_code, 403)
+
+
+class FarmContextTests(AccountTestCase):
+    def resolve(self, request, user=None):
+        """The request the middleware passed on, else its own response."""
+        request.user = user or AnonymousUser()
+        request.session = getattr(request, 'session', {})
+        passed = []
+        response = FarmContextMiddleware(lambda request: passed.append(request) or HttpResponse())(request)
+        return passed[0] if passed else response
+
+    def api_request(self, user, farm_id):
+        return RequestFactory().get('/api/finance/expenses/', HTTP_AUTHORIZATION=self.bearer(user), HTTP_X_FARM_ID=str(farm_id))
+
+    def test_members_work_in_their_farm_without_queries(self):
+        request = self.api_request(self.add_member('awa'), self.farm.pk)
+        with self.assertNumQueries(0):
+            request = self.resolve(request)
+            self.assertEqual(request.current_farm_id, self.farm.pk)
+            self.assertEqual(request.current_farm.pk, self.farm.pk)
+            self.assertTrue(request.current_farm)
+        self.assertEqual(request.current_farm.name, 'Ferme')
+
+    def test_invalid_farm_ids_are_a_400(self):
+        response = self.resolve(self.api_request(self.add_member('awa'), 'abc'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, b'{"detail": "Invalid farm id."}')
+
+    def test_farms_of_other_users_are_a_403(self):
+        response = self.resolve(self.api_request(self.add_member('awa'), self.other_farm.pk))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.content, b'{"detail": "You do not have access to this farm."}')
+
+    def test_memberships_newer_than_the_token_are_checked(self):
+        user = self.add_member('awa')
+        request = self.api_request(user, self.other_farm.pk)
+        FarmUser.objects.create(farm=self.other_farm, user=user)
+        # Let through, for the view to refuse the outdated token
+        self.assertEqual(self.resolve(request).current_farm_id, self.other_farm.pk)
+
+    def test_superusers_work_in_any_existing_farm(self):
+        self.assertEqual(self.resolve(self.api_request(self.owner, self.other_farm.pk)).current_farm_id, self.other_farm.pk)
+        self.assertEqual(self.resolve(self.api_request(self.owner, 999999)).status_code, 403)
+
+    def test_session_users_fall_back_to_their_first_farm(self):
+        user = self.add_member('awa')
+        FarmUser.objects.create(farm=self.other_farm, user=user)
+        user.refresh_from_db()
+        request = RequestFactory().get('/')
+        request.session = {'current_farm_id': 999999}
+        self.assertEqual(self.resolve(request, user).current_farm_id, self.farm.pk)
+        self.assertEqual(request.session['current_farm_id'], self.farm.pk)
+
+        request = RequestFactory().get('/')
+        request.session = {'current_farm_id': self.other_farm.pk}
+        self.assertEqual(self.resolve(request, user).current_farm_id, self.other_farm.pk)
+
+    def test_views_answer_the_farm_checks(self):
+        user = self.add_member('awa')
+        self.assertEqual(self.member_client(user, self.other_farm).get('/api/finance/expenses/').status_code, 403)
+        self.assertEqual(self.member_client(user).get('/api/finance/expenses/').status_code, 200)
+
+
+class TokenClaimsTests(AccountTestCase):
+    def login(self, username):
+        response = APIClient().post('/api/auth/login/', {'username': username, 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def get(self, access, farm=None):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}', HTTP_X_FARM_ID=str((farm or self.farm).pk))
+        return client.get('/api/finance/expenses/')
+
+    def test_tokens_carry_the_farms_and_the_membership_version(self):
+        user = self.add_member('awa', roles=[self.manager])
+        self.manager.permissions.add(Permission.objects.get(codename='add_farm'))
+        user.refresh_from_db()
+        token = AccessToken(self.login('awa')['access'])
+        self.assertEqual(token['membership_version'], user.membership_version)
+        self.assertEqual(token['roles'], [])
+        self.assertEqual(token['farms'], [{
+            'id': self.farm.pk, 'name': 'Ferme', 'roles': ['production_manager'], 'permissions': ['add_farm'],
+        }])
+
+    def test_outdated_tokens_are_refused_until_refreshed(self):
+        self.add_member('awa')
+        tokens = self.login('awa')
+        self.assertEqual(self.get(tokens['access']).status_code, 200)
+
+        FarmUser.objects.create(farm=self.other_farm, user=CustomUser.objects.get(username='awa'))
+        response = self.get(tokens['access'])
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'membership_changed')
+
+        response = APIClient().post('/api/auth/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        access = response.json()['access']
+        self.assertEqual({farm['id'] for farm in AccessToken(access)['farms']}, {self.farm.pk, self.other_farm.pk})
+        self.assertEqual(self.get(access, self.other_farm).status_code, 200)
+
+    def test_changes_leave_the_tokens_of_other_users_valid(self):
+        self.add_member('awa')
+        self.add_member('binta')
+        access = self.login('binta')['access']
+        FarmUser.objects.get(user__username='awa').roles.add(self.manager)
+        self.assertEqual(self.get(access).status_code, 200)
+
+    def test_tokens_without_claims_are_accepted(self):
+        user = self.add_member('awa')
+        self.assertEqual(self.get(AccessToken.for_user(user)).status_code, 200)
+        self.assertEqual(self.get(AccessToken.for_user(user), self.other_farm).status_code, 403)
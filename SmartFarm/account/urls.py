@@ -1,7 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenRefreshView
-from .views import CustomTokenObtainPairView, CustomerViewSet, FarmViewSet, RegisterAPIView, RoleViewSet, AdminDashboardAPIView, SupplierViewSet, UserFarmListView, UserListAPIView, UserViewSet
+from .views import CustomTokenObtainPairView, CustomTokenRefreshView, CustomerViewSet, FarmViewSet, RegisterAPIView, RoleViewSet, AdminDashboardAPIView, SupplierViewSet, UserFarmListView, UserListAPIView, UserViewSet
 
 
 # Création d'un routeur DRF pour les ViewSets
@@ -14,7 +13,7 @@ router.register(r'farms', FarmViewSet)
 
 urlpatterns = [
     path('login/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('register/', RegisterAPIView.as_view(), name='register'),
     path('', include(router.urls)),
     path('api/admin-dashboard/', AdminDashboardAPIView.as_view(), name='api-admin-dashboard'),
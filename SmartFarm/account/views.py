@@ -2,21 +2,26 @@ from rest_framework import generics, viewsets, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth import get_user_model
 from account.models import Customer, Farm, Role, Supplier, FarmUser
 from .serializers import (
     CustomerSerializer, FarmSerializer, FarmUserSerializer, SupplierSerializer,
-    UserSerializer, CustomTokenObtainPairSerializer, RoleSerializer
+    UserSerializer, CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer, RoleSerializer
 )
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from utilities.fieldsets import SparseFieldsMixin
+from utilities.search import IndexedSearchFilter
 from .permissions import HasFarmAccess
 
 # 🔐 JWT token view
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
+
 # 🔐 Base class for authenticated access
 class BaseRoleViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
@@ -27,7 +32,7 @@ class RoleViewSet(BaseRoleViewSet):
     serializer_class = RoleSerializer
 
 # 👤 User management
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = get_user_model().objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
@@ -58,7 +63,7 @@ class UserListAPIView(generics.ListAPIView):
         return get_user_model().objects.all()
 
 # 🌾 Farm management
-class FarmViewSet(viewsets.ModelViewSet):
+class FarmViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Farm.objects.all()
     serializer_class = FarmSerializer
     permission_classes = [IsAuthenticated]
@@ -70,11 +75,12 @@ class FarmViewSet(viewsets.ModelViewSet):
         return Farm.objects.filter(users=user)
 
 # 👥 Customer management
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+    expandable_fields = {'farm': FarmSerializer}
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, OrderingFilter]
     search_fields = ['name', 'phone', 'email', 'city']
     ordering_fields = ['name', 'created_at']
 
@@ -88,15 +94,16 @@ class CustomerViewSet(viewsets.ModelViewSet):
         serializer.save(created_by=self.request.user)
 
 # 🧾 Supplier management
-class SupplierViewSet(viewsets.ModelViewSet):
+class SupplierViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
     permission_classes = [IsAuthenticated]
 
 # 👥 Farm-User link management
-class FarmUserViewSet(viewsets.ModelViewSet):
+class FarmUserViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = FarmUser.objects.all()
     serializer_class = FarmUserSerializer
+    expandable_fields = {'farm': FarmSerializer}
     permission_classes = [IsAuthenticated]
     
 class UserFarmListView(APIView):
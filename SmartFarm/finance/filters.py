@@ -1,11 +1,12 @@
 from django_filters import rest_framework as filters
 from django_filters.widgets import RangeWidget
-from django.db.models import Q, F
+from django.db.models import F
 
 from finance.models import Expense, ExpenseCategory, Supplier, PaymentMethod
 from productions.models import AnimalType, AnimalBreed
 from finance.sales_models import Customer, Sale, SaleItem
-from utilities.filters import BaseFarmFilter, BasePeriodFilter
+from utilities.filters import BaseFarmFilter, BasePeriodFilter, LookupChoiceFilter
+from utilities.search import SearchIndex
 
 class ExpenseFilter(BaseFarmFilter, BasePeriodFilter):
     """Filter for Expense with period, category, animal type, breed, supplier, payment method"""
@@ -31,11 +32,11 @@ class ExpenseFilter(BaseFarmFilter, BasePeriodFilter):
     )
     
     # Category, animal type, breed, supplier, payment method filters
-    category = filters.ModelChoiceFilter(queryset=ExpenseCategory.objects.all())
-    animal_type = filters.ModelChoiceFilter(queryset=AnimalType.objects.all())
-    animal_breed = filters.ModelChoiceFilter(queryset=AnimalBreed.objects.all())
+    category = LookupChoiceFilter(queryset=ExpenseCategory.objects.all())
+    animal_type = LookupChoiceFilter(queryset=AnimalType.objects.all())
+    animal_breed = LookupChoiceFilter(queryset=AnimalBreed.objects.all())
     supplier = filters.ModelChoiceFilter(queryset=Supplier.objects.all())
-    payment_method = filters.ModelChoiceFilter(queryset=PaymentMethod.objects.all())
+    payment_method = LookupChoiceFilter(queryset=PaymentMethod.objects.all())
     
     # Additional filters
     amount_min = filters.NumberFilter(field_name='amount', lookup_expr='gte')
@@ -51,10 +52,7 @@ class ExpenseFilter(BaseFarmFilter, BasePeriodFilter):
     
     def filter_search(self, queryset, name, value):
         if value:
-            return queryset.filter(
-                Q(description__icontains=value) | 
-                Q(invoice_number__icontains=value)
-            )
+            return SearchIndex.filter(queryset, value, SearchIndex.request_farm_ids(self.request))
         return queryset
     
     def filter_expense_period(self, queryset, name, value):
@@ -93,7 +91,7 @@ class SaleFilter(BaseFarmFilter, BasePeriodFilter):
     
     # Customer and payment method filters
     customer = filters.ModelChoiceFilter(queryset=Customer.objects.all())
-    payment_method = filters.ModelChoiceFilter(queryset=PaymentMethod.objects.all())
+    payment_method = LookupChoiceFilter(queryset=PaymentMethod.objects.all())
     
     # Additional filters
     invoice_number = filters.CharFilter(lookup_expr='icontains')
@@ -113,11 +111,7 @@ class SaleFilter(BaseFarmFilter, BasePeriodFilter):
     
     def filter_search(self, queryset, name, value):
         if value:
-            return queryset.filter(
-                Q(invoice_number__icontains=value) | 
-                Q(customer__name__icontains=value) |
-                Q(notes__icontains=value)
-            )
+            return SearchIndex.filter(queryset, value, SearchIndex.request_farm_ids(self.request))
         return queryset
     
     def filter_fully_paid(self, queryset, name, value):
@@ -149,8 +143,8 @@ class SaleItemFilter(filters.FilterSet):
     
     # Animal, animal type and breed filters
     animal = filters.NumberFilter()
-    animal_type = filters.ModelChoiceFilter(queryset=AnimalType.objects.all())
-    breed = filters.ModelChoiceFilter(queryset=AnimalBreed.objects.all())
+    animal_type = LookupChoiceFilter(queryset=AnimalType.objects.all())
+    breed = LookupChoiceFilter(queryset=AnimalBreed.objects.all())
     
     # Additional filters
     quantity_min = filters.NumberFilter(field_name='quantity', lookup_expr='gte')
@@ -177,9 +171,9 @@ class SaleItemFilter(filters.FilterSet):
         user = getattr(self.request, 'user', None)
         if user and user.is_authenticated:
             # Get user's current farm
-            current_farm = getattr(self.request, 'current_farm', None)
-            if current_farm:
-                queryset = queryset.filter(sale__farm=current_farm)
+            current_farm_id = getattr(self.request, 'current_farm_id', None)
+            if current_farm_id:
+                queryset = queryset.filter(sale__farm_id=current_farm_id)
             # Or filter by all farms the user has access to
             elif hasattr(user, 'accessible_farms'):
                 queryset = queryset.filter(sale__farm__in=user.accessible_farms.all())
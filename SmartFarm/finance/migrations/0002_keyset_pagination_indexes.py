@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+        ('finance', '0001_initial'),
+        ('productions', '0005_remove_animal_qr_code'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['farm', 'date', 'id'], name='finance_exp_farm_id_327572_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['farm', 'sale_date', 'id'], name='finance_sal_farm_id_7d0c5d_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+        ('finance', '0002_keyset_pagination_indexes'),
+        ('productions', '0009_farm_scoped_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['farm', 'status'], name='finance_exp_farm_id_5546d7_idx'),
+        ),
+    ]
@@ -8,6 +8,7 @@ from django.forms import ValidationError
 from productions.models import AnimalType, AnimalBreed
 from productions.models import Animal, AnimalGroup
 from utilities.models import TimestampedModel
+from utilities.lookups import related
 from utilities.validators import validate_attachment_extension
 from account.models import Farm, Supplier
 
@@ -75,12 +76,15 @@ class Expense(TimestampedModel):
             models.Index(fields=['date']),
             models.Index(fields=['category']),
             models.Index(fields=['animal_type']),
+            # Keyset pagination, see utilities.pagination.KeysetPagination
+            models.Index(fields=['farm', 'date', 'id']),
+            models.Index(fields=['farm', 'status']),
         ]
         verbose_name = "Dépense"
         verbose_name_plural = "Dépenses"
 
     def __str__(self):
-        return f"{self.category.name} - {self.amount} FCFA le {self.date}"
+        return f"{related(self, 'category').name} - {self.amount} FCFA le {self.date}"
 
     def clean(self):
         if self.animal_breed and self.animal_type:
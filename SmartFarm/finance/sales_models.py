@@ -25,6 +25,12 @@ class Sale(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination, see utilities.pagination.KeysetPagination
+            models.Index(fields=['farm', 'sale_date', 'id']),
+        ]
+
     @property
     def balance_due(self):
         return max(self.total_amount - self.amount_paid, 0)
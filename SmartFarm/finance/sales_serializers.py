@@ -2,6 +2,7 @@ from rest_framework import serializers
 
 from finance.sales_models import Sale, SaleItem
 from productions.models import Animal, AnimalGroup, AnimalType
+from utilities.lookups import LookupRelatedField
 
 # ----------------------------
 # Serializers
@@ -9,7 +10,7 @@ from productions.models import Animal, AnimalGroup, AnimalType
 class SaleItemSerializer(serializers.ModelSerializer):
     animal_id = serializers.PrimaryKeyRelatedField(queryset=Animal.objects.all(), source='animal', required=False, allow_null=True)
     animal_group_id = serializers.PrimaryKeyRelatedField(queryset=AnimalGroup.objects.all(), source='animal_group', required=False, allow_null=True)
-    animal_type_id = serializers.PrimaryKeyRelatedField(queryset=AnimalType.objects.all(), source='animal_type', required=False, allow_null=True)
+    animal_type_id = LookupRelatedField(queryset=AnimalType.objects.all(), source='animal_type', required=False, allow_null=True)
 
     class Meta:
         model = SaleItem
@@ -23,6 +24,7 @@ class SaleItemSerializer(serializers.ModelSerializer):
 
 
 class SaleSerializer(serializers.ModelSerializer):
+    serializer_related_field = LookupRelatedField
     items = SaleItemSerializer(many=True)
     balance_due = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
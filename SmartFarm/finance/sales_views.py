@@ -1,21 +1,30 @@
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
+from account.serializers import CustomerSerializer
+from finance.serializers import PaymentMethodSerializer
+from utilities.fieldsets import SparseFieldsMixin
+from utilities.pagination import KeysetPagination
 
 from finance.sales_models import Sale, SaleItem
 from finance.sales_serializers import SaleItemSerializer, SaleSerializer
 
-class SaleViewSet(viewsets.ModelViewSet):
+class SaleViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Sale.objects.all().prefetch_related('items')
     serializer_class = SaleSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = '-sale_date'
+    cursor_ordering_fields = ['sale_date']
+    field_sources = {'balance_due': ['total_amount', 'amount_paid']}
+    expandable_fields = {'customer': CustomerSerializer, 'payment_method': PaymentMethodSerializer}
 
     def get_queryset(self):
         user = self.request.user
         if user.is_superuser:
             return self.queryset
-        current_farm = getattr(self.request, 'current_farm', None)
-        if current_farm:
-            return self.queryset.filter(farm=current_farm)
+        current_farm_id = getattr(self.request, 'current_farm_id', None)
+        if current_farm_id:
+            return self.queryset.filter(farm_id=current_farm_id)
         return self.queryset.none()
 
     def perform_create(self, serializer):
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from finance.models import Expense, ExpenseCategory, PaymentMethod
 from account.models import Farm
+from utilities.lookups import LookupRelatedField
 
 class FarmRelatedSerializer(serializers.ModelSerializer):
     """Base serializer for models with farm relationship"""
+    serializer_related_field = LookupRelatedField
     farm = serializers.PrimaryKeyRelatedField(
         queryset=Farm.objects.all(),
         required=False,  # Make it not required for backward compatibility
@@ -35,6 +37,9 @@ class PaymentMethodSerializer(serializers.ModelSerializer):
 
 
 class ExpenseSerializer(serializers.ModelSerializer):
+    # Category, payment method, type and breed validated from the lookup tables
+    serializer_related_field = LookupRelatedField
+
     class Meta:
         model = Expense
         fields = '__all__'
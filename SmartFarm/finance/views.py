@@ -1,5 +1,9 @@
 from rest_framework import viewsets, permissions
 from rest_framework.permissions import IsAuthenticated
+from account.serializers import SupplierSerializer
+from productions.serializers import AnimalTypeSerializer
+from utilities.fieldsets import SparseFieldsMixin
+from utilities.pagination import KeysetPagination
 from .models import Expense, ExpenseCategory, PaymentMethod
 from .serializers import (
     ExpenseSerializer,
@@ -28,18 +32,27 @@ class PaymentMethodViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+class ExpenseViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = '-date'
+    cursor_ordering_fields = ['date']
+    expandable_fields = {
+        'category': ExpenseCategorySerializer,
+        'payment_method': PaymentMethodSerializer,
+        'supplier': SupplierSerializer,
+        'animal_type': AnimalTypeSerializer,
+    }
 
     def get_queryset(self):
         user = self.request.user
-        current_farm = getattr(self.request, 'current_farm', None)
+        current_farm_id = getattr(self.request, 'current_farm_id', None)
         if user.is_superuser:
             return self.queryset
-        if current_farm:
-            return self.queryset.filter(farm=current_farm)
+        if current_farm_id:
+            return self.queryset.filter(farm_id=current_farm_id)
         return self.queryset.none()
 
     def perform_create(self, serializer):
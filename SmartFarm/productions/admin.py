@@ -1,10 +1,13 @@
 from django.contrib import admin
+from django.urls import reverse
+from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
+from productions.weight_models import WeighSession, WeightRecord
 from productions.health_models import AdministeredTreatment, HealthCondition, HealthIssue, HealthRecord, MedicationType, Treatment
 from .models import (
     AcquisitionRecord, Animal, AnimalType, AnimalBreed, WeightCategory, 
-    BirthRecord, AnimalInventory, DiedRecord, AnimalGroup
+    BirthRecord, AnimalInventory, DiedRecord, AnimalGroup, InventoryMovement
 )
 
 class FarmFilterMixin:
@@ -80,6 +83,19 @@ class AnimalInventoryAdmin(admin.ModelAdmin, FarmFilterMixin):
     readonly_fields = ('quantity',)
     autocomplete_fields = ('animal_type', 'breed')
 
+@admin.register(InventoryMovement)
+class InventoryMovementAdmin(admin.ModelAdmin, FarmFilterMixin):
+    list_display = ('id', 'date', 'reason', 'animal_type', 'breed', 'quantity', 'source_id', 'farm')
+    list_filter = ('reason', 'animal_type', 'farm')
+    date_hierarchy = 'date'
+    readonly_fields = ('farm', 'animal_type', 'breed', 'quantity', 'reason', 'source_id', 'date', 'created_by', 'created_at')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 @admin.register(AcquisitionRecord)
 class AcquisitionRecordAdmin(admin.ModelAdmin, FarmFilterMixin):
     list_display = ('id', 'quantity', 'gender', 'unit_preis', 'date_of_acquisition', 'farm', 'created_by')
@@ -181,6 +197,13 @@ class AnimalAdmin(admin.ModelAdmin, FarmFilterMixin):
     autocomplete_fields = ('animal_type', 'breed', 'birth_record', 'acquisition_record', 'death_record')
     readonly_fields = ('qr_code', 'created_by', 'created_at', 'updated_at')
 
+    @admin.display(description='QR code')
+    def qr_code(self, obj):
+        if not obj.pk:
+            return '-'
+        url = reverse('animal-qr-code', args=[obj.pk])
+        return format_html('<a href="{0}?type=svg" target="_blank">SVG</a> | <a href="{0}" target="_blank">PNG</a>', url)
+
     fieldsets = (
         (None, {'fields': ('tracking_id', 'animal_type', 'breed', 'gender', 'status', 'farm')}),
         ('Dates', {'fields': ('date_of_birth', 'date_of_acquisition')}),
@@ -196,3 +219,29 @@ class AnimalAdmin(admin.ModelAdmin, FarmFilterMixin):
         if not change:
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
+
+
+class WeightRecordInline(admin.TabularInline):
+    model = WeightRecord
+    fields = ('animal', 'date', 'weight')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+@admin.register(WeighSession)
+class WeighSessionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'date', 'farm', 'animal_group', 'created_by', 'created_at')
+    list_filter = ('farm', 'date')
+    readonly_fields = ('created_by', 'created_at')
+    inlines = [WeightRecordInline]
+
+@admin.register(WeightRecord)
+class WeightRecordAdmin(admin.ModelAdmin):
+    # Readings go through the API so Animal.current_weight stays in sync
+    list_display = ('animal', 'date', 'weight', 'session', 'farm')
+    list_filter = ('farm', 'date')
+    search_fields = ('animal__tracking_id',)
+    readonly_fields = ('farm', 'animal', 'session', 'date', 'weight')
+
+    def has_add_permission(self, request):
+        return False
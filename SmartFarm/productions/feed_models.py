@@ -6,6 +6,7 @@ from django.core.exceptions import ValidationError
 from productions.models import AnimalType
 from .models import Animal, AnimalGroup
 from finance.models import Supplier
+from utilities.lookups import related
 
 class FeedType(models.Model):
     name = models.CharField(max_length=100)
@@ -34,7 +35,7 @@ class FeedInventory(models.Model):
         return False
 
     def __str__(self):
-        return f"{self.feed_type.name}: {self.quantity_kg}kg (Batch: {self.batch_number})"
+        return f"{related(self, 'feed_type').name}: {self.quantity_kg}kg (Batch: {self.batch_number})"
 
 class FeedingRecord(models.Model):
     feed_type = models.ForeignKey(FeedType, on_delete=models.CASCADE)
@@ -58,7 +59,7 @@ class FeedingRecord(models.Model):
 
     def __str__(self):
         subject = self.animal.tracking_id if self.animal else f"Group({self.animal_group.id})"
-        return f"{self.feed_type.name} ({self.quantity_kg}kg) for {subject} on {self.date}"
+        return f"{related(self, 'feed_type').name} ({self.quantity_kg}kg) for {subject} on {self.date}"
 
     def save(self, *args, **kwargs):
         self.clean()
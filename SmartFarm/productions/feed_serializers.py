@@ -1,14 +1,18 @@
 from rest_framework import serializers
 
 from productions.feed_models import FeedInventory, FeedType, FeedingRecord
+from utilities.lookups import LookupRelatedField
 
 class FeedTypeSerializer(serializers.ModelSerializer):
+    serializer_related_field = LookupRelatedField
+
     class Meta:
         model = FeedType
         fields = '__all__'
 
 
 class FeedInventorySerializer(serializers.ModelSerializer):
+    serializer_related_field = LookupRelatedField
     is_expired = serializers.ReadOnlyField()
 
     class Meta:
@@ -17,6 +21,7 @@ class FeedInventorySerializer(serializers.ModelSerializer):
 
 
 class FeedingRecordSerializer(serializers.ModelSerializer):
+    serializer_related_field = LookupRelatedField
     estimated_cost = serializers.ReadOnlyField()
 
     class Meta:
@@ -1,8 +1,19 @@
+from django.db.models import Q
 from django_filters import rest_framework as filters
 from django_filters.widgets import RangeWidget
 
 from productions.models import Animal, AnimalGroup, BirthRecord, AcquisitionRecord, AnimalInventory, DiedRecord, AnimalType, AnimalBreed
-from utilities.filters import BaseFarmFilter, BasePeriodFilter
+from utilities.filters import BaseFarmFilter, BasePeriodFilter, LookupChoiceFilter
+
+def filter_intake(queryset, group=None, since=None):
+    """Animals of an intake: born or acquired into `group`, or created on or after `since`."""
+    if group:
+        queryset = queryset.filter(
+            Q(birth_record__animal_group=group) | Q(acquisition_record__animal_group=group)
+        )
+    if since:
+        queryset = queryset.filter(created_at__date__gte=since)
+    return queryset
 
 class BirthRecordFilter(BaseFarmFilter, BasePeriodFilter):
     period = filters.ChoiceFilter(method='filter_birth_period', label='Period', choices=[
@@ -48,8 +59,8 @@ class AcquisitionRecordFilter(BaseFarmFilter, BasePeriodFilter):
                   'weight_min', 'weight_max', 'quantity_min', 'gender', 'farm']
 
 class AnimalInventoryFilter(BaseFarmFilter):
-    animal_type = filters.ModelChoiceFilter(queryset=AnimalType.objects.all())
-    breed = filters.ModelChoiceFilter(queryset=AnimalBreed.objects.all())
+    animal_type = LookupChoiceFilter(queryset=AnimalType.objects.all())
+    breed = LookupChoiceFilter(queryset=AnimalBreed.objects.all())
     quantity_min = filters.NumberFilter(field_name='quantity', lookup_expr='gte')
     quantity_max = filters.NumberFilter(field_name='quantity', lookup_expr='lte')
 
@@ -5,6 +5,7 @@ from django.forms import ValidationError
 from finance.models import Supplier
 from account.models import Farm
 from productions.models import Animal, AnimalGroup
+from utilities.lookups import related
 
 class HealthIssue(models.Model):
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name="health_issues")
@@ -64,7 +65,7 @@ class Treatment(models.Model):
 
     def __str__(self):
         subject = self.health_record.animal.tracking_id if self.health_record.animal else f"Group({self.health_record.animal_group.id})"
-        return f"{self.medication.name} for {subject} on {self.date_administered}"
+        return f"{related(self, 'medication').name} for {subject} on {self.date_administered}"
 
 class AdministeredTreatment(models.Model):
     health_record = models.ForeignKey(HealthRecord, on_delete=models.CASCADE)
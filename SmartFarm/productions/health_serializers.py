@@ -1,6 +1,7 @@
 from datetime import timedelta
 from rest_framework import serializers
 from productions.health_models import HealthIssue, HealthRecord, MedicationType, Treatment
+from utilities.lookups import LookupRelatedField, related
 
 
 class HealthIssueSerializer(serializers.ModelSerializer):
@@ -31,6 +32,7 @@ class HealthRecordSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class TreatmentSerializer(serializers.ModelSerializer):
+    serializer_related_field = LookupRelatedField
     safe_consumption_date = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -38,8 +40,9 @@ class TreatmentSerializer(serializers.ModelSerializer):
         fields = '__all__'   # We'll set this in `create()`
 
     def get_safe_consumption_date(self, obj):
-        if obj.medication and obj.date_administered:
-            return obj.date_administered + timedelta(days=obj.medication.withdrawal_period_days)
+        medication = related(obj, 'medication')
+        if medication and obj.date_administered:
+            return obj.date_administered + timedelta(days=medication.withdrawal_period_days)
         return None
 
     def create(self, validated_data):
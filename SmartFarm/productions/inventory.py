@@ -0,0 +1,276 @@
+# productions/inventory.py
+import bisect
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DateField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from productions.models import (
+    AcquisitionRecord, AnimalInventory, BirthRecord, DiedRecord, InventoryMovement, InventorySnapshot
+)
+
+
+class InsufficientInventoryError(ValidationError):
+    pass
+
+
+class InventoryLedger:
+    """
+    Writes inventory movements and keeps the cached AnimalInventory.quantity
+    in step with them using atomic F() updates, never read-modify-write.
+
+    Inside `batch()` the movements are only collected, then written together
+    when the block closes: one UPDATE per (farm, type, breed) for the net
+    change, one for the checkpoints and one INSERT for the movements.
+    """
+
+    _local = threading.local()
+
+    reasons = {
+        BirthRecord: 'birth',
+        AcquisitionRecord: 'acquisition',
+        DiedRecord: 'death',
+    }
+
+    @staticmethod
+    def record_date(instance):
+        if isinstance(instance, BirthRecord):
+            return instance.date_of_birth
+        if isinstance(instance, AcquisitionRecord):
+            return instance.date_of_acquisition
+        return instance.date_of_death
+
+    @staticmethod
+    def record_quantity(instance):
+        """Headcount change a production record stands for."""
+        if isinstance(instance, BirthRecord):
+            return instance.number_of_male + instance.number_of_female
+        if isinstance(instance, AcquisitionRecord):
+            return instance.quantity
+        if instance.status == 'cancelled':
+            return 0
+        return -instance.quantity
+
+    @classmethod
+    def record_movements(cls, instance):
+        """{(farm_id, animal_type_id, breed_id): quantity} the record should contribute."""
+        subject = instance.animal or instance.animal_group
+        quantity = cls.record_quantity(instance)
+        if not subject or not quantity:
+            return {}
+        return {(instance.farm_id, subject.animal_type_id, subject.breed_id): quantity}
+
+    @classmethod
+    def sync_record(cls, instance, created=False, deleted=False):
+        """
+        Append the movements bringing the ledger in line with a production
+        record: its full contribution on creation, the difference with what
+        was already booked on update, and the reversal on deletion.
+        """
+        reason = cls.reasons[type(instance)]
+        target = {} if deleted else cls.record_movements(instance)
+
+        booked = defaultdict(int)
+        if not created:
+            rows = InventoryMovement.objects.filter(reason=reason, source_id=instance.pk).values(
+                'farm_id', 'animal_type_id', 'breed_id'
+            ).annotate(total=Sum('quantity'))
+            for row in rows:
+                booked[row['farm_id'], row['animal_type_id'], row['breed_id']] += row['total']
+        for movement in cls.pending():
+            if movement.reason == reason and movement.source_id == instance.pk:
+                booked[movement.farm_id, movement.animal_type_id, movement.breed_id] += movement.quantity
+
+        changes = {key: target.get(key, 0) - booked.get(key, 0) for key in set(target) | set(booked)}
+        # Increases first, so moving a record between keys never trips the stock check
+        for key, quantity in sorted(changes.items(), key=lambda item: -item[1]):
+            if quantity:
+                farm_id, animal_type_id, breed_id = key
+                cls.record(
+                    farm_id, animal_type_id, breed_id, quantity, reason,
+                    cls.record_date(instance) or date.today(),
+                    source_id=instance.pk, created_by_id=instance.created_by_id
+                )
+
+    @classmethod
+    def record(cls, farm_id, animal_type_id, breed_id, quantity, reason, movement_date, source_id=None, created_by_id=None):
+        batch = getattr(cls._local, 'batch', None)
+        if batch is not None:
+            movement = InventoryMovement(
+                farm_id=farm_id, animal_type_id=animal_type_id, breed_id=breed_id,
+                quantity=quantity, reason=reason, date=movement_date,
+                source_id=source_id, created_by_id=created_by_id
+            )
+            batch.append(movement)
+            return movement
+
+        with transaction.atomic():
+            cls.apply(farm_id, animal_type_id, breed_id, quantity)
+            # Back-dated movements also belong to the checkpoints taken since
+            InventorySnapshot.objects.filter(
+                farm_id=farm_id, animal_type_id=animal_type_id, breed_id=breed_id, date__gte=movement_date
+            ).update(quantity=F('quantity') + quantity)
+            return InventoryMovement.objects.create(
+                farm_id=farm_id, animal_type_id=animal_type_id, breed_id=breed_id,
+                quantity=quantity, reason=reason, date=movement_date,
+                source_id=source_id, created_by_id=created_by_id
+            )
+
+    @classmethod
+    def pending(cls):
+        """Movements collected by the current batch and not written yet."""
+        return getattr(cls._local, 'batch', None) or []
+
+    @classmethod
+    @contextmanager
+    def batch(cls):
+        """
+        Run the block in a transaction, coalescing the movements it books.
+
+        They are written when the block closes, still inside the transaction,
+        so a stock shortage rolls the whole block back as before. Stock is
+        checked against the net change of the block, which lets an import list
+        a death before the birth it follows. Nested batches join the outer one
+        in a savepoint: when it rolls back, the movements they collected are
+        discarded with it. Roll back part of a batch with a nested batch, not
+        a bare atomic(), which would leave its movements to be written.
+        """
+        batch = getattr(cls._local, 'batch', None)
+        if batch is not None:
+            mark = len(batch)
+            try:
+                with transaction.atomic():
+                    yield
+            except BaseException:
+                del batch[mark:]
+                raise
+            return
+
+        cls._local.batch = []
+        try:
+            with transaction.atomic():
+                yield
+                movements, cls._local.batch = cls._local.batch, None
+                cls.flush(movements)
+        finally:
+            cls._local.batch = None
+
+    @classmethod
+    def flush(cls, movements):
+        totals = defaultdict(int)
+        for movement in movements:
+            totals[movement.farm_id, movement.animal_type_id, movement.breed_id] += movement.quantity
+        # Increases first, as in sync_record
+        for key, quantity in sorted(totals.items(), key=lambda item: -item[1]):
+            if quantity:
+                cls.apply(*key, quantity)
+        cls.apply_to_snapshots(movements)
+        InventoryMovement.objects.bulk_create(movements, batch_size=500)
+
+    @staticmethod
+    def apply_to_snapshots(movements, batch_size=500):
+        """Add each movement to the checkpoints taken on or after its date, in grouped UPDATEs."""
+        if not movements:
+            return
+        dates, running = defaultdict(list), defaultdict(list)
+        for movement in sorted(movements, key=lambda movement: movement.date):
+            key = (movement.farm_id, movement.animal_type_id, movement.breed_id)
+            dates[key].append(movement.date)
+            running[key].append((running[key][-1] if running[key] else 0) + movement.quantity)
+
+        keys = Q()
+        for farm_id, animal_type_id, breed_id in dates:
+            keys |= Q(farm_id=farm_id, animal_type_id=animal_type_id, breed_id=breed_id)
+        snapshots = InventorySnapshot.objects.filter(
+            keys, date__gte=min(movement.date for movement in movements)
+        ).values_list('pk', 'farm_id', 'animal_type_id', 'breed_id', 'date')
+
+        deltas = {}
+        for pk, farm_id, animal_type_id, breed_id, day in snapshots:
+            key = (farm_id, animal_type_id, breed_id)
+            # Movements dated on or before the checkpoint belong to it
+            position = bisect.bisect_right(dates[key], day)
+            if position and running[key][position - 1]:
+                deltas[pk] = running[key][position - 1]
+
+        pks = list(deltas)
+        for start in range(0, len(pks), batch_size):
+            chunk = pks[start:start + batch_size]
+            InventorySnapshot.objects.filter(pk__in=chunk).update(quantity=F('quantity') + Case(
+                *[When(pk=pk, then=Value(deltas[pk])) for pk in chunk], output_field=IntegerField()
+            ))
+
+    @staticmethod
+    def apply(farm_id, animal_type_id, breed_id, quantity):
+        """Add `quantity` to the cached balance, refusing to go below zero."""
+        inventories = AnimalInventory.objects.filter(farm_id=farm_id, animal_type_id=animal_type_id, breed_id=breed_id)
+        if quantity < 0:
+            if not inventories.filter(quantity__gte=-quantity).update(quantity=F('quantity') + quantity):
+                raise InsufficientInventoryError(
+                    f"Not enough animals in inventory to remove {-quantity}.", code='insufficient_inventory'
+                )
+            return
+
+        if inventories.update(quantity=F('quantity') + quantity):
+            return
+        try:
+            with transaction.atomic():
+                AnimalInventory.objects.create(
+                    farm_id=farm_id, animal_type_id=animal_type_id, breed_id=breed_id, quantity=quantity
+                )
+        except IntegrityError:
+            # Created concurrently in the meantime
+            inventories.update(quantity=F('quantity') + quantity)
+
+    @staticmethod
+    def balances(farm=None):
+        """Ledger balance of every (farm, animal type, breed), in one grouped query."""
+        movements = InventoryMovement.objects.order_by()
+        if farm:
+            movements = movements.filter(farm=farm)
+        rows = movements.values('farm_id', 'animal_type_id', 'breed_id').annotate(balance=Sum('quantity'))
+        return {(row['farm_id'], row['animal_type_id'], row['breed_id']): row['balance'] for row in rows}
+
+    @staticmethod
+    def annotate_as_of(queryset, as_of):
+        """
+        Annotate AnimalInventory rows with `quantity_as_of`, their balance at the
+        end of `as_of`: the latest checkpoint on or before that day plus the
+        movements booked after it, so only a bounded slice of the ledger is read.
+        """
+        key = {'farm': OuterRef('farm'), 'animal_type': OuterRef('animal_type'), 'breed': OuterRef('breed')}
+        snapshots = InventorySnapshot.objects.filter(**key, date__lte=as_of).order_by('-date')
+        queryset = queryset.annotate(
+            snapshot_date=Coalesce(Subquery(snapshots.values('date')[:1]), Value(date.min), output_field=DateField()),
+            snapshot_quantity=Coalesce(Subquery(snapshots.values('quantity')[:1]), 0),
+        )
+        movements = InventoryMovement.objects.order_by().filter(
+            **key, date__gt=OuterRef('snapshot_date'), date__lte=as_of
+        ).annotate(_group=Value(1)).values('_group').annotate(total=Sum('quantity')).values('total')
+        return queryset.annotate(quantity_as_of=F('snapshot_quantity') + Coalesce(Subquery(movements), 0))
+
+    @staticmethod
+    def snapshot(as_of, farm=None):
+        """Checkpoint every ledger balance at the end of `as_of`, replacing that day's checkpoints."""
+        movements = InventoryMovement.objects.order_by().filter(date__lte=as_of)
+        if farm:
+            movements = movements.filter(farm=farm)
+        rows = movements.values('farm_id', 'animal_type_id', 'breed_id').annotate(balance=Sum('quantity'))
+        snapshots = [
+            InventorySnapshot(
+                farm_id=row['farm_id'], animal_type_id=row['animal_type_id'], breed_id=row['breed_id'],
+                date=as_of, quantity=row['balance']
+            )
+            for row in rows
+        ]
+        with transaction.atomic():
+            existing = InventorySnapshot.objects.filter(date=as_of)
+            if farm:
+                existing = existing.filter(farm=farm)
+            existing.delete()
+            InventorySnapshot.objects.bulk_create(snapshots, batch_size=500)
+        return len(snapshots)
@@ -0,0 +1,135 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+
+from productions.pdf import StreamingPDF
+from productions.qr import QRCodeRenderer
+
+
+class LabelSheet:
+    """
+    Multi-page PDF of QR labels laid out for label paper.
+
+    The default layout matches A4 sheets of 3 x 8 labels of 70 x 36 mm;
+    subclass and override the layout attributes for another paper.
+    QR codes missing from the QR cache are rendered in a process pool while
+    the pages are drawn, page by page, in the order the results come back;
+    each page is written out as soon as it is drawn (see StreamingPDF).
+    """
+
+    PAGE_SIZE = A4
+    COLUMNS = 3
+    ROWS = 8
+    LABEL_WIDTH = 70 * mm
+    LABEL_HEIGHT = 36 * mm
+    MARGIN_LEFT = 0
+    MARGIN_TOP = 4.5 * mm
+    PADDING = 3 * mm
+
+    # Below this many missing codes a process pool costs more than it saves
+    POOL_MIN_SIZE = 50
+
+    @classmethod
+    def qr_images(cls, animal_ids):
+        """PNG bytes for each animal id, in order, served from the QR cache where possible."""
+        cache = QRCodeRenderer.get_cache()
+        data = [QRCodeRenderer.animal_data(animal_id) for animal_id in animal_ids]
+        keys = [QRCodeRenderer.KEY.format(QRCodeRenderer.digest(item, 'png')) for item in data]
+        cached = cache.get_many(keys)
+        missing = [item for item, key in zip(data, keys) if key not in cached]
+
+        if len(missing) < cls.POOL_MIN_SIZE:
+            yield from cls.merge_images(keys, cached, (QRCodeRenderer.render(item, 'png') for item in missing))
+            return
+        workers = getattr(settings, 'QR_LABEL_WORKERS', None) or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rendered = executor.map(QRCodeRenderer.render, missing, ['png'] * len(missing), chunksize=16)
+            yield from cls.merge_images(keys, cached, rendered)
+
+    @staticmethod
+    def merge_images(keys, cached, rendered):
+        """Interleave cached images with the freshly `rendered` ones, caching the latter as they come."""
+        cache = QRCodeRenderer.get_cache()
+        timeout = getattr(settings, 'QR_CODE_CACHE_TIMEOUT', None)
+        for key in keys:
+            if key in cached:
+                yield cached[key]
+            else:
+                image = next(rendered)
+                cache.set(key, image, timeout=timeout)
+                yield image
+
+    @classmethod
+    def render(cls, animals, output):
+        """Draw a label per animal of `animals` into the file-like `output`, return the label count."""
+        sheet = cls.pages(animals)
+        while True:
+            try:
+                output.write(next(sheet))
+            except StopIteration as done:
+                return done.value
+
+    @classmethod
+    def stream(cls, animals):
+        """
+        Yield the PDF of `animals` page by page, for a streaming response: the
+        labels are only drawn once the response is iterated, and each page is
+        sent as soon as its 24 labels are drawn.
+        """
+        yield from cls.pages(animals)
+
+    @classmethod
+    def pages(cls, animals):
+        """Yield the bytes of the PDF as its pages are drawn, return the label count."""
+        animals = list(animals.select_related('animal_type', 'breed', 'farm'))
+        pdf = StreamingPDF(cls.PAGE_SIZE, "Animal QR labels")
+        yield pdf.start()
+        per_page = cls.COLUMNS * cls.ROWS
+
+        page = pdf.new_page()
+        images = cls.qr_images([animal.pk for animal in animals])
+        for index, (animal, image) in enumerate(zip(animals, images)):
+            if index and index % per_page == 0:
+                yield pdf.finish_page(page)
+                page = pdf.new_page()
+            row, column = divmod(index % per_page, cls.COLUMNS)
+            x = cls.MARGIN_LEFT + column * cls.LABEL_WIDTH
+            y = cls.PAGE_SIZE[1] - cls.MARGIN_TOP - (row + 1) * cls.LABEL_HEIGHT
+            cls.draw_label(page, animal, image, x, y)
+
+        if not animals:
+            page.setFont("Helvetica", 12)
+            page.drawString(20 * mm, cls.PAGE_SIZE[1] - 20 * mm, "No animals match the selection.")
+        yield pdf.finish_page(page)
+        yield pdf.finish()
+        return len(animals)
+
+    @classmethod
+    def draw_label(cls, pdf, animal, image, x, y):
+        size = cls.LABEL_HEIGHT - 2 * cls.PADDING
+        pdf.drawImage(image, x + cls.PADDING, y + cls.PADDING, width=size, height=size)
+
+        text_x = x + 2 * cls.PADDING + size
+        text_width = x + cls.LABEL_WIDTH - cls.PADDING - text_x
+        text_y = y + cls.LABEL_HEIGHT - cls.PADDING - 4 * mm
+        pdf.setFont("Helvetica-Bold", 11)
+        pdf.drawString(text_x, text_y, cls.fit(pdf, animal.tracking_id, "Helvetica-Bold", 11, text_width))
+        pdf.setFont("Helvetica", 8)
+        for line in (
+            f"{animal.animal_type.name} - {animal.breed.name}",
+            animal.gender,
+            animal.farm.name,
+        ):
+            text_y -= 4.5 * mm
+            pdf.drawString(text_x, text_y, cls.fit(pdf, line, "Helvetica", 8, text_width))
+
+    @staticmethod
+    def fit(pdf, text, font, size, width):
+        """Truncate `text` with an ellipsis so it fits in `width`."""
+        if pdf.stringWidth(text, font, size) <= width:
+            return text
+        while text and pdf.stringWidth(text + '…', font, size) > width:
+            text = text[:-1]
+        return text + '…'
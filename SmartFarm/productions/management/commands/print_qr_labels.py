@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from productions.filters import filter_intake
+from productions.labels import LabelSheet
+from productions.models import Animal
+
+class Command(BaseCommand):
+    help = 'Generate a PDF sheet of QR labels for a farm, an animal group or a recent intake'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Path of the PDF file to write')
+        parser.add_argument('--farm', type=int, help='Only animals of this farm id')
+        parser.add_argument('--group', type=int, help='Only animals born or acquired into this animal group id')
+        parser.add_argument('--since', help='Only animals created on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--status', help='Only animals with this status, e.g. active')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = parse_date(options['since'])
+            except ValueError:
+                # Well formed but impossible, e.g. 2024-02-30
+                since = None
+            if not since:
+                raise CommandError(f"Invalid date: {options['since']}")
+
+        animals = Animal.objects.order_by('tracking_id')
+        if options['farm']:
+            animals = animals.filter(farm_id=options['farm'])
+        if options['status']:
+            animals = animals.filter(status=options['status'])
+        animals = filter_intake(animals, options['group'], since)
+
+        with open(options['output'], 'wb') as output:
+            count = LabelSheet.render(animals, output)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} labels to {options['output']}."))
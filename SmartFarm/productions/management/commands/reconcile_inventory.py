@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from account.models import Farm
+from productions.inventory import InventoryLedger
+from productions.models import AnimalInventory
+
+class Command(BaseCommand):
+    help = 'Recompute every AnimalInventory balance from the movement ledger and report drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farm', type=int, help='Only reconcile this farm id')
+        parser.add_argument('--fix', action='store_true', help='Overwrite drifted quantities with the ledger balance')
+
+    def handle(self, *args, **options):
+        farm = None
+        if options['farm']:
+            farm = Farm.objects.filter(pk=options['farm']).first()
+            if not farm:
+                raise CommandError(f"Farm {options['farm']} does not exist.")
+
+        with transaction.atomic():
+            balances = InventoryLedger.balances(farm)
+            inventories = AnimalInventory.objects.select_for_update()
+            if farm:
+                inventories = inventories.filter(farm=farm)
+            inventories = {(inv.farm_id, inv.animal_type_id, inv.breed_id): inv for inv in inventories}
+
+            drifted, missing = [], []
+            for key in sorted(set(balances) | set(inventories)):
+                balance = balances.get(key, 0)
+                inventory = inventories.get(key)
+                cached = inventory.quantity if inventory else 0
+                if balance == cached:
+                    continue
+
+                farm_id, animal_type_id, breed_id = key
+                self.stdout.write(self.style.WARNING(
+                    f"Farm {farm_id}, type {animal_type_id}, breed {breed_id}: "
+                    f"inventory {cached}, ledger {balance} (drift {cached - balance:+d})"
+                ))
+                if balance < 0:
+                    self.stdout.write(self.style.ERROR("  Ledger balance is negative, check the death records."))
+                if inventory:
+                    inventory.quantity = max(balance, 0)
+                    drifted.append(inventory)
+                else:
+                    missing.append(AnimalInventory(
+                        farm_id=farm_id, animal_type_id=animal_type_id, breed_id=breed_id, quantity=max(balance, 0)
+                    ))
+
+            if not drifted and not missing:
+                self.stdout.write(self.style.SUCCESS("Inventory matches the ledger."))
+                return
+
+            if options['fix']:
+                AnimalInventory.objects.bulk_update(drifted, ['quantity'], batch_size=500)
+                AnimalInventory.objects.bulk_create(missing, batch_size=500)
+                self.stdout.write(self.style.SUCCESS(f"Fixed {len(drifted) + len(missing)} inventory lines."))
+            else:
+                self.stdout.write(f"{len(drifted) + len(missing)} inventory lines drifted, rerun with --fix to correct them.")
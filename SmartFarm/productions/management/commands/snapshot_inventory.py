@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from account.models import Farm
+from productions.inventory import InventoryLedger
+
+class Command(BaseCommand):
+    help = 'Checkpoint inventory balances so point-in-time (as_of) queries only scan recent movements'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to checkpoint (YYYY-MM-DD), defaults to yesterday')
+        parser.add_argument('--farm', type=int, help='Only checkpoint this farm id')
+
+    def handle(self, *args, **options):
+        as_of = date.today() - timedelta(days=1)
+        if options['date']:
+            as_of = parse_date(options['date'])
+            if not as_of:
+                raise CommandError(f"Invalid date: {options['date']}")
+
+        farm = None
+        if options['farm']:
+            farm = Farm.objects.filter(pk=options['farm']).first()
+            if not farm:
+                raise CommandError(f"Farm {options['farm']} does not exist.")
+
+        count = InventoryLedger.snapshot(as_of, farm)
+        self.stdout.write(self.style.SUCCESS(f"Checkpointed {count} inventory balances as of {as_of}."))
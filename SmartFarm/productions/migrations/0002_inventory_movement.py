@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+        ('productions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(help_text='Signed change of the headcount')),
+                ('reason', models.CharField(choices=[('opening', 'Opening balance'), ('birth', 'Birth'), ('acquisition', 'Acquisition'), ('death', 'Death'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('source_id', models.PositiveBigIntegerField(blank=True, help_text='Id of the birth, acquisition or death record', null=True)),
+                ('date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('animal_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_movements', to='productions.animaltype')),
+                ('breed', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_movements', to='productions.animalbreed')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_movements', to='account.farm')),
+            ],
+            options={
+                'ordering': ['-date', '-id'],
+                'indexes': [models.Index(fields=['farm', 'animal_type', 'breed', 'date'], name='productions_farm_id_7ba813_idx'), models.Index(fields=['reason', 'source_id'], name='productions_reason_4b8e93_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,134 @@
+from collections import defaultdict
+from django.db import migrations
+from django.db.models import Case, F, IntegerField, Min, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+SUBJECT = {
+    'subject_type': ('animal__animal_type', 'animal_group__animal_type'),
+    'subject_breed': ('animal__breed', 'animal_group__breed'),
+}
+
+# Ledger sources as of this migration, see productions.inventory.InventoryLedger
+RECORDS = [
+    ('productions', 'BirthRecord', 'birth', 'date_of_birth', lambda: F('number_of_male') + F('number_of_female')),
+    ('productions', 'AcquisitionRecord', 'acquisition', 'date_of_acquisition', lambda: F('quantity')),
+    ('productions', 'DiedRecord', 'death', 'date_of_death', lambda: Case(
+        When(status='cancelled', then=Value(0)), default=-F('quantity'), output_field=IntegerField()
+    )),
+]
+BATCH_SIZE = 500
+
+
+def record_movements(apps, today):
+    """One dated movement per production record and sold animal or group, as the ledger books them."""
+    InventoryMovement = apps.get_model('productions', 'InventoryMovement')
+    for app_label, model_name, reason, date_field, quantity in RECORDS:
+        rows = apps.get_model(app_label, model_name).objects.order_by('pk').annotate(
+            **{name: Coalesce(*paths) for name, paths in SUBJECT.items()}, change=quantity()
+        ).values_list('pk', 'farm_id', 'subject_type', 'subject_breed', date_field, 'change', 'created_by_id')
+        for pk, farm_id, animal_type_id, breed_id, day, change, created_by_id in rows.iterator(chunk_size=BATCH_SIZE):
+            if animal_type_id is not None and change:
+                yield InventoryMovement(
+                    farm_id=farm_id, animal_type_id=animal_type_id, breed_id=breed_id, quantity=change,
+                    reason=reason, source_id=pk, date=day or today, created_by_id=created_by_id
+                )
+
+    # Sales were never booked: the stock kept by hand went down with them, on the day of the sale
+    items = apps.get_model('finance', 'SaleItem').objects.order_by('pk').annotate(
+        **{name: Coalesce(*paths) for name, paths in SUBJECT.items()}
+    ).values_list('sale__farm_id', 'subject_type', 'subject_breed', 'sale__sale_date', 'quantity', 'sale__created_by_id')
+    for farm_id, animal_type_id, breed_id, day, quantity, created_by_id in items.iterator(chunk_size=BATCH_SIZE):
+        if animal_type_id is not None and quantity:
+            yield InventoryMovement(
+                farm_id=farm_id, animal_type_id=animal_type_id, breed_id=breed_id, quantity=-quantity,
+                reason='adjustment', date=day or today, created_by_id=created_by_id
+            )
+
+
+def earliest_record_dates(apps):
+    """{farm_id: earliest date} of the farm records, animals and groups."""
+    sources = [
+        ('Animal', 'date_of_birth'),
+        ('Animal', 'date_of_acquisition'),
+        ('BirthRecord', 'date_of_birth'),
+        ('AcquisitionRecord', 'date_of_acquisition'),
+        ('DiedRecord', 'date_of_death'),
+    ]
+    earliest = {}
+    for model_name, field in sources:
+        rows = apps.get_model('productions', model_name).objects.order_by().filter(**{f'{field}__isnull': False})
+        for farm_id, day in rows.values('farm_id').annotate(day=Min(field)).values_list('farm_id', 'day'):
+            earliest[farm_id] = min(day, earliest.get(farm_id, day))
+    groups = apps.get_model('productions', 'AnimalGroup').objects.order_by()
+    for farm_id, day in groups.values('farm_id').annotate(day=Min(TruncDate('created_at'))).values_list('farm_id', 'day'):
+        earliest[farm_id] = min(day, earliest.get(farm_id, day))
+    return earliest
+
+
+def book_opening_balances(apps, schema_editor):
+    """
+    Rebuild the history of the stock counted before the ledger: a dated
+    movement for each birth, acquisition, death and sale on record, then
+    what they leave unexplained of today's AnimalInventory.quantity. Animals
+    held before the first record open the ledger on the farm's earliest
+    record, removals nobody recorded are an adjustment of today.
+    """
+    AnimalInventory = apps.get_model('productions', 'AnimalInventory')
+    InventoryMovement = apps.get_model('productions', 'InventoryMovement')
+    today = timezone.now().date()
+
+    booked = defaultdict(int)
+    batch = []
+    for movement in record_movements(apps, today):
+        booked[movement.farm_id, movement.animal_type_id, movement.breed_id] += movement.quantity
+        batch.append(movement)
+        if len(batch) >= BATCH_SIZE:
+            InventoryMovement.objects.bulk_create(batch)
+            batch = []
+    InventoryMovement.objects.bulk_create(batch)
+
+    stock = {
+        (row.farm_id, row.animal_type_id, row.breed_id): row.quantity
+        for row in AnimalInventory.objects.all()
+    }
+    earliest = earliest_record_dates(apps)
+    residuals = []
+    for key in set(stock) | set(booked):
+        residual = stock.get(key, 0) - booked[key]
+        farm_id, animal_type_id, breed_id = key
+        if residual > 0:
+            residuals.append(InventoryMovement(
+                farm_id=farm_id, animal_type_id=animal_type_id, breed_id=breed_id, quantity=residual,
+                reason='opening', date=min(earliest.get(farm_id, today), today)
+            ))
+        elif residual < 0:
+            residuals.append(InventoryMovement(
+                farm_id=farm_id, animal_type_id=animal_type_id, breed_id=breed_id, quantity=residual,
+                reason='adjustment', date=today
+            ))
+    InventoryMovement.objects.bulk_create(residuals, batch_size=BATCH_SIZE)
+
+    # Stock of the records without an inventory row yet, as the ledger keeps it
+    AnimalInventory.objects.bulk_create([
+        AnimalInventory(farm_id=farm_id, animal_type_id=animal_type_id, breed_id=breed_id, quantity=0)
+        for farm_id, animal_type_id, breed_id in set(booked) - set(stock)
+    ], batch_size=BATCH_SIZE)
+
+
+def remove_opening_balances(apps, schema_editor):
+    # Every movement is rebuilt from the records when the migration runs again
+    InventoryMovement = apps.get_model('productions', 'InventoryMovement')
+    InventoryMovement.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productions', '0002_inventory_movement'),
+        ('finance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(book_opening_balances, remove_opening_balances),
+    ]
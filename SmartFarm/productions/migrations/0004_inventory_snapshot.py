@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+        ('productions', '0003_inventory_opening_balances'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.IntegerField()),
+                ('animal_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='productions.animaltype')),
+                ('breed', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='productions.animalbreed')),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_snapshots', to='account.farm')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('farm', 'animal_type', 'breed', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productions', '0004_inventory_snapshot'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='animal',
+            name='qr_code',
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+        ('productions', '0005_remove_animal_qr_code'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['farm', 'id'], name='productions_farm_id_0c1f01_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='birthrecord',
+            index=models.Index(fields=['farm', 'date_of_birth', 'id'], name='productions_farm_id_d437dc_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:19
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+        ('productions', '0006_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeighSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(default=datetime.date.today)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('animal_group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='weigh_sessions', to='productions.animalgroup')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weigh_sessions', to='account.farm')),
+            ],
+            options={
+                'ordering': ['-date', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WeightRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(default=datetime.date.today)),
+                ('weight', models.FloatField()),
+                ('animal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weight_records', to='productions.animal')),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weight_records', to='account.farm')),
+                ('session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='records', to='productions.weighsession')),
+            ],
+            options={
+                'ordering': ['animal', 'date'],
+                'indexes': [models.Index(fields=['animal', 'date'], name='productions_animal__7bc672_idx')],
+            },
+        ),
+    ]
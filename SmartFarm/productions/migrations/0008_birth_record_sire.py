@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productions', '0007_weight_records'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='birthrecord',
+            name='sire',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sired_births', to='productions.animal'),
+        ),
+    ]
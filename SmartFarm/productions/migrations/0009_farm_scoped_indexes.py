@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+        ('productions', '0008_birth_record_sire'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='acquisitionrecord',
+            index=models.Index(fields=['farm', 'date_of_acquisition'], name='productions_farm_id_13002f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['farm', 'status'], name='productions_farm_id_2473cd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diedrecord',
+            index=models.Index(fields=['farm', 'date_of_death'], name='productions_farm_id_4f9f75_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diedrecord',
+            index=models.Index(fields=['farm', 'status'], name='productions_farm_id_a05db3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weighsession',
+            index=models.Index(fields=['farm', 'date'], name='productions_farm_id_b96e87_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='weightrecord',
+            index=models.Index(fields=['farm', 'date', 'id'], name='productions_farm_id_65348a_idx'),
+        ),
+    ]
@@ -5,6 +5,7 @@ from imagekit.models import ImageSpecField
 from imagekit.processors import ResizeToFill
 
 from account.models import Farm
+from utilities.lookups import related
 from utilities.validators import validate_attachment_extension
 
 class AnimalType(models.Model):
@@ -34,7 +35,7 @@ class AnimalBreed(models.Model):
     farms = models.ManyToManyField(Farm, related_name='animal_breeds', blank=True)
 
     def __str__(self):
-        return f"{self.name} ({self.animal_type.name})"
+        return f"{self.name} ({related(self, 'animal_type').name})"
 
 class WeightCategory(models.Model):
     min_weight = models.FloatField()
@@ -50,6 +51,12 @@ class WeightCategory(models.Model):
             raise ValidationError("Weights cannot be negative.")
         if self.min_weight >= self.max_weight:
             raise ValidationError("Max weight must be greater than min weight.")
+        # Categories may share a bound but not overlap, so a weight has one category
+        overlapping = WeightCategory.objects.filter(min_weight__lt=self.max_weight, max_weight__gt=self.min_weight)
+        if self.pk:
+            overlapping = overlapping.exclude(pk=self.pk)
+        if overlapping.exists():
+            raise ValidationError("Weight categories cannot overlap.")
 
     def save(self, *args, **kwargs):
         self.clean()
@@ -69,7 +76,7 @@ class AnimalGroup(models.Model):
     notes = models.TextField(blank=True, null=True)
 
     def __str__(self):
-        return f"Group of {self.quantity} {self.animal_type.name} - {self.breed.name}"
+        return f"Group of {self.quantity} {related(self, 'animal_type').name} - {related(self, 'breed').name}"
 
 class Animal(models.Model):
     tracking_id = models.CharField(max_length=50, unique=True)
@@ -95,41 +102,20 @@ class Animal(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    qr_code = models.ImageField(upload_to='qr_codes/', blank=True, null=True)
 
-    def save(self, *args, **kwargs):
-        if not self.id and not self.qr_code:
-            super().save(*args, **kwargs)
-            self.generate_qr_code()
-            super().save(update_fields=['qr_code'])
-        else:
-            super().save(*args, **kwargs)
-
-    def generate_qr_code(self):
-        import qrcode
-        from io import BytesIO
-        from django.core.files import File
-
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_H,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(f"{settings.SITE_URL}/api/animals/{self.id}/")
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-
-        buffer = BytesIO()
-        img.save(buffer)
-        filename = f'qr_animal_{self.tracking_id}.png'
-        self.qr_code.save(filename, File(buffer), save=False)
-    
+    class Meta:
+        indexes = [
+            # Keyset pagination, see utilities.pagination.KeysetPagination
+            models.Index(fields=['farm', 'id']),
+            models.Index(fields=['farm', 'status']),
+        ]
+
     def __str__(self):
         return f"Animal {self.tracking_id}"
     
 class BirthRecord(models.Model):
-    animal = models.ForeignKey(Animal, null=True, blank=True, on_delete=models.SET_NULL)
+    animal = models.ForeignKey(Animal, null=True, blank=True, on_delete=models.SET_NULL)  # La mère
+    sire = models.ForeignKey(Animal, null=True, blank=True, on_delete=models.SET_NULL, related_name='sired_births')
     animal_group = models.ForeignKey(AnimalGroup, null=True, blank=True, on_delete=models.SET_NULL)
     date_of_birth = models.DateField(auto_now_add=True)
     number_of_male = models.PositiveIntegerField(default=0)
@@ -142,6 +128,12 @@ class BirthRecord(models.Model):
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='birth_records')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination, see utilities.pagination.KeysetPagination
+            models.Index(fields=['farm', 'date_of_birth', 'id']),
+        ]
+
     def clean(self):
         if self.animal and self.animal_group:
             raise ValidationError("Only one of 'animal' or 'animal_group' can be set, not both.")
@@ -165,6 +157,12 @@ class AcquisitionRecord(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='acquisition_records')
 
+    class Meta:
+        indexes = [
+            # Period filters, see utilities.filters.BasePeriodFilter
+            models.Index(fields=['farm', 'date_of_acquisition']),
+        ]
+
     def clean(self):
         if self.animal and self.animal_group:
             raise ValidationError("Only one of 'animal' or 'animal_group' can be set, not both.")
@@ -193,6 +191,13 @@ class DiedRecord(models.Model):
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='died_records')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Period filters, see utilities.filters.BasePeriodFilter
+            models.Index(fields=['farm', 'date_of_death']),
+            models.Index(fields=['farm', 'status']),
+        ]
+
     def clean(self):
         if self.animal and self.animal_group:
             raise ValidationError("Only one of 'animal' or 'animal_group' can be set, not both.")
@@ -209,4 +214,50 @@ class AnimalInventory(models.Model):
         unique_together = ('farm', 'animal_type', 'breed')
 
     def __str__(self):
-        return f"{self.animal_type.name} - {self.breed.name} ({self.quantity})"
\ No newline at end of file
+        return f"{related(self, 'animal_type').name} - {related(self, 'breed').name} ({self.quantity})"
+
+class InventoryMovement(models.Model):
+    """Append-only ledger of inventory changes; AnimalInventory caches its balances."""
+    REASON_CHOICES = [
+        ('opening', 'Opening balance'),
+        ('birth', 'Birth'),
+        ('acquisition', 'Acquisition'),
+        ('death', 'Death'),
+        ('adjustment', 'Adjustment'),
+    ]
+
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='inventory_movements')
+    animal_type = models.ForeignKey(AnimalType, on_delete=models.CASCADE, related_name='inventory_movements')
+    breed = models.ForeignKey(AnimalBreed, on_delete=models.CASCADE, related_name='inventory_movements')
+    quantity = models.IntegerField(help_text="Signed change of the headcount")
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    source_id = models.PositiveBigIntegerField(null=True, blank=True, help_text="Id of the birth, acquisition or death record")
+    date = models.DateField()
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['farm', 'animal_type', 'breed', 'date']),
+            models.Index(fields=['reason', 'source_id']),
+        ]
+
+    def __str__(self):
+        return f"{related(self, 'animal_type').name} - {related(self, 'breed').name}: {self.quantity:+d} ({self.get_reason_display()}, {self.date})"
+
+
+class InventorySnapshot(models.Model):
+    """Checkpoint of a ledger balance, including every movement dated on or before `date`."""
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='inventory_snapshots')
+    animal_type = models.ForeignKey(AnimalType, on_delete=models.CASCADE, related_name='inventory_snapshots')
+    breed = models.ForeignKey(AnimalBreed, on_delete=models.CASCADE, related_name='inventory_snapshots')
+    date = models.DateField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        ordering = ['-date']
+        unique_together = ('farm', 'animal_type', 'breed', 'date')
+
+    def __str__(self):
+        return f"{related(self, 'animal_type').name} - {related(self, 'breed').name} ({self.quantity} on {self.date})"
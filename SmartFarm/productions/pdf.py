@@ -0,0 +1,151 @@
+import zlib
+from io import BytesIO
+from PIL import Image
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+
+class PDFPage:
+    """
+    One page of a StreamingPDF, drawn with the subset of the reportlab canvas
+    API the label sheets use: setFont, drawString, stringWidth and drawImage
+    (PNG bytes). Coordinates are in points from the bottom left corner.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.operations = []
+        self.images = []
+        self.font = None
+
+    def setFont(self, name, size):
+        self.font = (name, size)
+
+    @staticmethod
+    def stringWidth(text, font, size):
+        return stringWidth(text, font, size)
+
+    def drawString(self, x, y, text):
+        name, size = self.font
+        resource = self.document.font_resource(name)
+        self.operations.append(f'BT /{resource} {size:g} Tf {x:.2f} {y:.2f} Td '.encode() + escape(text) + b' Tj ET')
+
+    def drawImage(self, image, x, y, width, height):
+        name = f'Im{len(self.images) + 1}'
+        self.images.append((name, image))
+        self.operations.append(f'q {width:.2f} 0 0 {height:.2f} {x:.2f} {y:.2f} cm /{name} Do Q'.encode())
+
+
+class StreamingPDF:
+    """
+    PDF written as it is drawn: each page and its images are serialized as
+    soon as the page is finished, the page tree and the cross-reference table
+    come last. Only the standard Helvetica fonts are available.
+
+        document = StreamingPDF(A4, "Title")
+        yield document.start()
+        page = document.new_page()
+        ...
+        yield document.finish_page(page)
+        yield document.finish()
+    """
+
+    FONTS = {'Helvetica': 'F1', 'Helvetica-Bold': 'F2'}
+    # Written by finish(), numbered first so that pages can point to them
+    CATALOG, PAGES, INFO = 1, 2, 3
+
+    def __init__(self, page_size, title=''):
+        self.page_size = page_size
+        self.title = title
+        self.offsets = {}
+        self.position = 0
+        self.next_number = self.INFO + 1
+        self.fonts = {}
+        self.pages = []
+
+    def font_resource(self, name):
+        if name not in self.FONTS:
+            raise ValueError(f"Unsupported font: {name}")
+        return self.FONTS[name]
+
+    def write_object(self, body, number=None):
+        if number is None:
+            number, self.next_number = self.next_number, self.next_number + 1
+        self.offsets[number] = self.position
+        data = f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+        self.position += len(data)
+        return number, data
+
+    def write_stream(self, dictionary, data):
+        return self.write_object(f'<< {dictionary} /Length {len(data)} >>\nstream\n'.encode() + data + b'\nendstream')
+
+    def start(self):
+        header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        self.position = len(header)
+        chunks = [header]
+        for name, resource in self.FONTS.items():
+            number, data = self.write_object(
+                f'<< /Type /Font /Subtype /Type1 /BaseFont /{name} /Encoding /WinAnsiEncoding >>'.encode()
+            )
+            self.fonts[resource] = number
+            chunks.append(data)
+        return b''.join(chunks)
+
+    def new_page(self):
+        return PDFPage(self)
+
+    def finish_page(self, page):
+        """The bytes of `page`, its images and content."""
+        chunks, images = [], []
+        for name, png in page.images:
+            with Image.open(BytesIO(png)) as image:
+                gray = image.convert('L')
+            number, data = self.write_stream(
+                f'/Type /XObject /Subtype /Image /Width {gray.width} /Height {gray.height} '
+                f'/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode',
+                zlib.compress(gray.tobytes()),
+            )
+            images.append(f'/{name} {number} 0 R')
+            chunks.append(data)
+        content, data = self.write_stream('/Filter /FlateDecode', zlib.compress(b'\n'.join(page.operations)))
+        chunks.append(data)
+
+        fonts = ' '.join(f'/{resource} {number} 0 R' for resource, number in self.fonts.items())
+        width, height = self.page_size
+        number, data = self.write_object((
+            f'<< /Type /Page /Parent {self.PAGES} 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] '
+            f'/Resources << /Font << {fonts} >> /XObject << {" ".join(images)} >> >> /Contents {content} 0 R >>'
+        ).encode())
+        self.pages.append(number)
+        chunks.append(data)
+        return b''.join(chunks)
+
+    def finish(self):
+        """The page tree, document information and cross-reference table."""
+        kids = ' '.join(f'{number} 0 R' for number in self.pages)
+        chunks = [
+            self.write_object(f'<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>'.encode(), self.PAGES)[1],
+            self.write_object(f'<< /Type /Catalog /Pages {self.PAGES} 0 R >>'.encode(), self.CATALOG)[1],
+            self.write_object(b'<< /Title ' + escape(self.title) + b' >>', self.INFO)[1],
+        ]
+        size = self.next_number
+        xref = [f'xref\n0 {size}\n0000000000 65535 f \n']
+        xref += [f'{self.offsets[number]:010d} 00000 n \n' for number in range(1, size)]
+        chunks.append(''.join(xref).encode())
+        chunks.append((
+            f'trailer\n<< /Size {size} /Root {self.CATALOG} 0 R /Info {self.INFO} 0 R >>\n'
+            f'startxref\n{self.position}\n%%EOF\n'
+        ).encode())
+        return b''.join(chunks)
+
+
+def escape(text):
+    """`text` as a PDF literal string in WinAnsiEncoding, unknown characters replaced."""
+    escaped = bytearray(b'(')
+    for byte in text.encode('cp1252', errors='replace'):
+        if byte in b'()\\':
+            escaped += b'\\' + bytes([byte])
+        elif 32 <= byte < 127:
+            escaped.append(byte)
+        else:
+            escaped += f'\\{byte:03o}'.encode()
+    return bytes(escaped + b')')
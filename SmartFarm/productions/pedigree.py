@@ -0,0 +1,123 @@
+from django.db import connection
+
+from productions.models import Animal, BirthRecord
+
+
+class Pedigree:
+    """
+    Lineage queries over Animal.birth_record -> BirthRecord (dam, sire).
+
+    Each walk is a single recursive CTE bounded by `depth` generations and
+    returns the animals reached with their dam and sire ids, i.e. the whole
+    tree as an adjacency list. An animal reached through several lines
+    (inbreeding) is listed once, at its nearest generation.
+    """
+
+    DEFAULT_DEPTH = 5
+    MAX_DEPTH = 20
+
+    @staticmethod
+    def tables():
+        quote = connection.ops.quote_name
+        return {
+            'animal': quote(Animal._meta.db_table),
+            'birth': quote(BirthRecord._meta.db_table),
+        }
+
+    @classmethod
+    def walk(cls, recursive_join, animal_ids, depth):
+        """
+        Run the CTE seeded with `animal_ids`, `recursive_join` leading from a
+        reached animal `l` to the next animals `n`.
+        """
+        tables = cls.tables()
+        seeds = ', '.join(['%s'] * len(animal_ids))
+        sql = f"""
+            WITH RECURSIVE lineage(id, depth) AS (
+                SELECT id, 0 FROM {tables['animal']} WHERE id IN ({seeds})
+                UNION
+                SELECT n.id, l.depth + 1 FROM lineage l {recursive_join.format(**tables)}
+                WHERE l.depth < %s
+            )
+            SELECT a.id, a.tracking_id, a.gender, a.status, a.date_of_birth,
+                   b.animal_id, b.sire_id, MIN(l.depth)
+            FROM lineage l
+            JOIN {tables['animal']} a ON a.id = l.id
+            LEFT JOIN {tables['birth']} b ON b.id = a.birth_record_id
+            GROUP BY a.id, a.tracking_id, a.gender, a.status, a.date_of_birth, b.animal_id, b.sire_id
+            ORDER BY MIN(l.depth), a.id
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*animal_ids, depth])
+            rows = cursor.fetchall()
+        keys = ('id', 'tracking_id', 'gender', 'status', 'date_of_birth', 'dam', 'sire', 'depth')
+        return [dict(zip(keys, row)) for row in rows]
+
+    @classmethod
+    def ancestors(cls, animal_ids, depth=DEFAULT_DEPTH):
+        return cls.walk("""
+            JOIN {animal} c ON c.id = l.id
+            JOIN {birth} b ON b.id = c.birth_record_id
+            JOIN {animal} n ON n.id = b.animal_id OR n.id = b.sire_id
+        """, animal_ids, depth)
+
+    @classmethod
+    def descendants(cls, animal_ids, depth=DEFAULT_DEPTH):
+        return cls.walk("""
+            JOIN {birth} b ON b.animal_id = l.id OR b.sire_id = l.id
+            JOIN {animal} n ON n.birth_record_id = b.id
+        """, animal_ids, depth)
+
+    @classmethod
+    def coancestry(cls, first_id, second_id, depth=DEFAULT_DEPTH, animals=None):
+        """
+        Coefficient of coancestry of two animals: the inbreeding coefficient
+        of their offspring. Parents beyond `depth` generations count as unknown.
+        """
+        if animals is None:
+            animals = cls.ancestors([first_id, second_id], depth)
+        # Parents that were not reached are unknown
+        parents = {animal['id']: (animal['dam'], animal['sire']) for animal in animals}
+
+        # Parents before offspring, so a pair is expanded on its younger member
+        order, visiting = {}, set()
+        def visit(animal_id):
+            visiting.add(animal_id)
+            for parent_id in parents[animal_id]:
+                if parent_id in visiting:
+                    # An animal recorded as its own ancestor, drop the link
+                    parents[animal_id] = tuple(None if p == parent_id else p for p in parents[animal_id])
+                elif parent_id in parents and parent_id not in order:
+                    visit(parent_id)
+            visiting.discard(animal_id)
+            order[animal_id] = len(order)
+        for animal_id in list(parents):
+            if animal_id not in order:
+                visit(animal_id)
+
+        memo = {}
+        def kinship(x, y):
+            if x is None or y is None or x not in parents or y not in parents:
+                return 0.0
+            if order[x] < order[y]:
+                x, y = y, x
+            if (x, y) in memo:
+                return memo[x, y]
+            dam, sire = parents[x]
+            if x == y:
+                value = (1 + kinship(dam, sire)) / 2
+            else:
+                value = (kinship(dam, y) + kinship(sire, y)) / 2
+            memo[x, y] = value
+            return value
+
+        return kinship(first_id, second_id)
+
+    @classmethod
+    def inbreeding(cls, animal_id, depth=DEFAULT_DEPTH):
+        """Wright's inbreeding coefficient of an animal, from `depth` generations of ancestors."""
+        animals = cls.ancestors([animal_id], depth)
+        root = next((animal for animal in animals if animal['id'] == animal_id), None)
+        if root is None or root['dam'] is None or root['sire'] is None:
+            return 0.0
+        return cls.coancestry(root['dam'], root['sire'], depth, animals)
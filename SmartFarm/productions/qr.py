@@ -0,0 +1,69 @@
+import hashlib
+from io import BytesIO
+from django.conf import settings
+from django.core.cache import caches
+
+
+class QRCodeRenderer:
+    """
+    Renders animal QR codes on demand into a content-addressed cache.
+
+    Entries are keyed by a digest of the encoded data, the image type and the
+    rendering parameters, so a given key always maps to the same bytes: the
+    digest doubles as a strong ETag and entries never need invalidating.
+    """
+
+    CONTENT_TYPES = {
+        'png': 'image/png',
+        'svg': 'image/svg+xml',
+    }
+    KEY = 'productions:qr:{}'
+    # Bump when the rendering below changes, to address new entries
+    RENDER_VERSION = 1
+
+    @staticmethod
+    def get_cache():
+        return caches[getattr(settings, 'QR_CODE_CACHE_ALIAS', 'default')]
+
+    @staticmethod
+    def animal_data(animal_id):
+        return f"{settings.SITE_URL}/api/animals/{animal_id}/"
+
+    @classmethod
+    def digest(cls, data, image_type):
+        return hashlib.sha256(f"{cls.RENDER_VERSION}:{image_type}:{data}".encode()).hexdigest()
+
+    @staticmethod
+    def render(data, image_type):
+        import qrcode
+        from qrcode.image.svg import SvgPathImage
+
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_H,
+            box_size=10,
+            border=4,
+            image_factory=SvgPathImage if image_type == 'svg' else None,
+        )
+        qr.add_data(data)
+        qr.make(fit=True)
+        img = qr.make_image(fill_color="black", back_color="white")
+
+        buffer = BytesIO()
+        img.save(buffer)
+        return buffer.getvalue()
+
+    @classmethod
+    def get(cls, data, image_type='png'):
+        """Return (digest, bytes) for `data`, rendering it on the first request only."""
+        digest = cls.digest(data, image_type)
+        cache = cls.get_cache()
+        content = cache.get(cls.KEY.format(digest))
+        if content is None:
+            content = cls.render(data, image_type)
+            cache.set(cls.KEY.format(digest), content, timeout=getattr(settings, 'QR_CODE_CACHE_TIMEOUT', None))
+        return digest, content
+
+    @classmethod
+    def get_for_animal(cls, animal_id, image_type='png'):
+        return cls.get(cls.animal_data(animal_id), image_type)
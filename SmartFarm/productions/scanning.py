@@ -0,0 +1,68 @@
+import sys
+from django.conf import settings
+
+from productions.models import Animal
+from utilities.cache import VersionedLRUCache
+
+
+class TagLookup:
+    """
+    Resolves scanned tags (QR, RFID) to a minimal animal payload.
+
+    Exact lookups hit the unique index on tracking_id and keep the hot
+    animals in a per-process LRU cache. A saved or deleted animal outdates its
+    old and new tags only, a saved type or breed every tag. Prefix lookups
+    (typeahead) are a range scan of the same index within one farm:
+    tracking_id >= prefix AND tracking_id < successor of the prefix.
+    """
+
+    FIELDS = {
+        'id': 'id',
+        'tracking_id': 'tracking_id',
+        'farm': 'farm_id',
+        'animal_type': 'animal_type__name',
+        'breed': 'breed__name',
+        'gender': 'gender',
+        'status': 'status',
+        'current_weight': 'current_weight',
+    }
+    MAX_PREFIX_RESULTS = 50
+
+    cache = VersionedLRUCache('productions:tags', maxsize=getattr(settings, 'TAG_LOOKUP_CACHE_SIZE', 2048))
+
+    @classmethod
+    def rows(cls, queryset):
+        return [
+            dict(zip(cls.FIELDS, row))
+            for row in queryset.values_list(*cls.FIELDS.values())
+        ]
+
+    @classmethod
+    def exact(cls, tracking_id):
+        def fetch():
+            rows = cls.rows(Animal.objects.filter(tracking_id=tracking_id))
+            return rows[0] if rows else None
+        return cls.cache.get_or_set(tracking_id, fetch)
+
+    @staticmethod
+    def successor(prefix):
+        """The smallest string greater than every string starting with `prefix`."""
+        prefix = prefix.rstrip(chr(sys.maxunicode))
+        if not prefix:
+            return None
+        return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    @classmethod
+    def prefix(cls, prefix, farm_id, limit=10):
+        queryset = Animal.objects.filter(farm_id=farm_id, tracking_id__gte=prefix)
+        upper = cls.successor(prefix)
+        if upper is not None:
+            queryset = queryset.filter(tracking_id__lt=upper)
+        # Under a linguistic collation the range may not match the prefix exactly
+        queryset = queryset.filter(tracking_id__startswith=prefix)
+        return cls.rows(queryset.order_by('tracking_id')[:min(limit, cls.MAX_PREFIX_RESULTS)])
+
+    @classmethod
+    def invalidate(cls, *tracking_ids):
+        """Outdate the cached `tracking_ids`, every tag without any."""
+        cls.cache.invalidate(*tracking_ids)
@@ -1,4 +1,6 @@
+from django.urls import reverse
 from rest_framework import serializers
+from account.access import AccessSet
 from account.serializers import FarmSerializer
 from productions.models import (
     AnimalType, AnimalBreed, WeightCategory,
@@ -6,8 +8,12 @@ from productions.models import (
 )
 from productions.models import Animal, AnimalGroup
 from account.models import Farm
+from productions.weight_bands import WeightCategoryIndex
+from utilities.lookups import LookupRelatedField
 
 class FarmRelatedSerializer(serializers.ModelSerializer):
+    # Types, breeds... validated from the lookup tables
+    serializer_related_field = LookupRelatedField
     farm = serializers.PrimaryKeyRelatedField(
         queryset=Farm.objects.all(),
         required=False,
@@ -47,6 +53,7 @@ class AnimalTypeSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_by', 'created_by_name']
 
 class AnimalBreedSerializer(serializers.ModelSerializer):
+    serializer_related_field = LookupRelatedField
     image = serializers.SerializerMethodField()
     thumbnail = serializers.SerializerMethodField()
     animal_type_name = serializers.CharField(source='animal_type.name', read_only=True)
@@ -83,7 +90,7 @@ class BirthRecordSerializer(FarmRelatedSerializer):
     class Meta:
         model = BirthRecord
         fields = [
-            'id', 'animal', 'animal_group', 'weight', 'number_of_male', 'number_of_female',
+            'id', 'animal', 'sire', 'animal_group', 'weight', 'number_of_male', 'number_of_female',
             'number_of_died', 'total_born', 'date_of_birth', 'notes', 'attachment',
             'created_by', 'created_by_name', 'farm'
         ]
@@ -99,6 +106,9 @@ class BirthRecordSerializer(FarmRelatedSerializer):
             raise serializers.ValidationError("You must provide either 'animal' or 'animal_group'.")
         if (data.get('number_of_male', 0) + data.get('number_of_female', 0) + data.get('number_of_died', 0)) == 0:
             raise serializers.ValidationError("Total number of births must be greater than 0.")
+        sire = data.get('sire')
+        if sire and (sire == data.get('animal') or sire.gender.lower() != 'male'):
+            raise serializers.ValidationError({'sire': "The sire must be a male other than the dam."})
         return data
 
 class AcquisitionRecordSerializer(FarmRelatedSerializer):
@@ -141,11 +151,22 @@ class AnimalInventorySerializer(FarmRelatedSerializer):
             'quantity', 'farm'
         ]
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if hasattr(instance, 'quantity_as_of'):
+            data['quantity'] = instance.quantity_as_of
+        return data
+
     def validate(self, data):
         animal_type = data.get('animal_type')
         breed = data.get('breed')
         if breed and animal_type and breed.animal_type != animal_type:
             raise serializers.ValidationError("The selected breed does not belong to the specified animal type.")
+        if self.instance:
+            # Balances are tracked per key in the movement ledger, so a line cannot be moved
+            for field in ('farm', 'animal_type', 'breed'):
+                if field in data and data[field].pk != getattr(self.instance, f'{field}_id'):
+                    raise serializers.ValidationError({field: "Cannot be changed on an existing inventory line."})
         return data
 
 class DiedRecordSerializer(FarmRelatedSerializer):
@@ -175,24 +196,32 @@ class AnimalSerializer(serializers.ModelSerializer):
     breed = AnimalBreedSerializer(read_only=True)
     farm = FarmSerializer(read_only=True)
 
-    animal_type_id = serializers.PrimaryKeyRelatedField(
-        queryset=Animal.objects.all(), source='animal_type', write_only=True
+    animal_type_id = LookupRelatedField(
+        queryset=AnimalType.objects.all(), source='animal_type', write_only=True
     )
-    breed_id = serializers.PrimaryKeyRelatedField(
-        queryset=Animal.objects.all(), source='breed', write_only=True
+    breed_id = LookupRelatedField(
+        queryset=AnimalBreed.objects.all(), source='breed', write_only=True
     )
     farm_id = serializers.PrimaryKeyRelatedField(
-        queryset=Animal.objects.all(), source='farm', write_only=True
+        queryset=Farm.objects.all(), source='farm', write_only=True
     )
 
     qr_code = serializers.SerializerMethodField()
+    weight_category = serializers.SerializerMethodField()
     created_by = serializers.SerializerMethodField()
 
+    def get_weight_category(self, obj):
+        # One index lookup per serialization, shared by the animals of a list
+        if 'weight_categories' not in self.context:
+            self.context['weight_categories'] = WeightCategoryIndex.current()
+        category = self.context['weight_categories'].classify(obj.current_weight)
+        return category.pk if category else None
+
     def get_qr_code(self, obj):
+        # Rendered on demand by AnimalViewSet.qr_code
         request = self.context.get('request')
-        if obj.qr_code and hasattr(obj.qr_code, 'url'):
-            return request.build_absolute_uri(obj.qr_code.url) if request else obj.qr_code.url
-        return None
+        url = reverse('animal-qr-code', args=[obj.pk])
+        return request.build_absolute_uri(url) if request else url
 
     def get_created_by(self, obj):
         return obj.created_by.username if obj.created_by else None
@@ -205,11 +234,113 @@ class AnimalSerializer(serializers.ModelSerializer):
             'animal_type', 'breed', 'farm',
             'animal_type_id', 'breed_id', 'farm_id',
             'gender', 'date_of_birth', 'date_of_acquisition',
-            'initial_weight', 'current_weight', 'last_weigh_date',
+            'initial_weight', 'current_weight', 'last_weigh_date', 'weight_category',
             'notes', 'qr_code', 'status',
             'created_by', 'created_at', 'updated_at'
         ]
 
+class AnimalCompactSerializer(serializers.ModelSerializer):
+    """
+    Flat list representation of animals: related objects are sent as ids and
+    described once per page in lookup tables (see `get_lookups`).
+    """
+
+    class Meta:
+        model = Animal
+        fields = [
+            'id', 'tracking_id', 'animal_type', 'breed', 'farm',
+            'gender', 'date_of_birth', 'date_of_acquisition',
+            'initial_weight', 'current_weight', 'last_weigh_date',
+            'notes', 'status', 'created_by', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+    @staticmethod
+    def get_lookups(animals, context, fields=('animal_type', 'breed', 'farm')):
+        """The types, breeds and farms referenced by `animals`, keyed by id, in their full form."""
+        lookups = {}
+        if 'animal_type' in fields:
+            types = AnimalType.objects.filter(pk__in={animal.animal_type_id for animal in animals})
+            types = AnimalTypeSerializer(types.prefetch_related('farms'), many=True, context=context).data
+            lookups['animal_types'] = {item['id']: item for item in types}
+        if 'breed' in fields:
+            breeds = AnimalBreed.objects.filter(pk__in={animal.breed_id for animal in animals})
+            breeds = breeds.select_related('animal_type').prefetch_related('farms')
+            breeds = AnimalBreedSerializer(breeds, many=True, context=context).data
+            lookups['breeds'] = {item['id']: item for item in breeds}
+        if 'farm' in fields:
+            farms = FarmSerializer(Farm.objects.filter(pk__in={animal.farm_id for animal in animals}), many=True).data
+            lookups['farms'] = {item['id']: item for item in farms}
+        return lookups
+
+class CachedPrimaryKeyRelatedField(LookupRelatedField):
+    """Resolves each primary key once, for list payloads repeating the same ids."""
+
+    def to_internal_value(self, data):
+        resolved = self.__dict__.setdefault('_resolved', {})
+        if str(data) not in resolved:
+            resolved[str(data)] = super().to_internal_value(data)
+        return resolved[str(data)]
+
+class AnimalBulkListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        # Uniqueness of tracking ids is checked for the whole batch in one query
+        tracking_ids = [item['tracking_id'] for item in attrs]
+        duplicates = sorted({tracking_id for tracking_id in tracking_ids if tracking_ids.count(tracking_id) > 1})
+        if duplicates:
+            raise serializers.ValidationError({'tracking_id': f"Duplicated in the payload: {', '.join(duplicates)}"})
+        existing = sorted(Animal.objects.filter(tracking_id__in=tracking_ids).values_list('tracking_id', flat=True))
+        if existing:
+            raise serializers.ValidationError({'tracking_id': f"Already registered: {', '.join(existing)}"})
+        return attrs
+
+    def create(self, validated_data):
+        created_by = self.context['request'].user
+        animals = [Animal(**item, created_by=created_by) for item in validated_data]
+        return Animal.objects.bulk_create(animals, batch_size=500)
+
+class AnimalBulkCreateSerializer(AnimalSerializer):
+    animal_type_id = CachedPrimaryKeyRelatedField(
+        queryset=AnimalType.objects.all(), source='animal_type', write_only=True
+    )
+    breed_id = CachedPrimaryKeyRelatedField(
+        queryset=AnimalBreed.objects.all(), source='breed', write_only=True
+    )
+    farm_id = CachedPrimaryKeyRelatedField(
+        queryset=Farm.objects.all(), source='farm', write_only=True, required=False
+    )
+
+    class Meta(AnimalSerializer.Meta):
+        list_serializer_class = AnimalBulkListSerializer
+        extra_kwargs = {'tracking_id': {'validators': []}}
+
+    def validate(self, attrs):
+        # Same rule as InventoryRecordMixin.bulk_create: the current farm by default, only the user's farms
+        request = self.context['request']
+        attrs['farm'] = attrs.get('farm') or getattr(request, 'current_farm', None)
+        if attrs['farm'] is None:
+            raise serializers.ValidationError({'farm_id': 'This field is required.'})
+        if not request.user.is_superuser:
+            if 'farm_ids' not in self.context:
+                self.context['farm_ids'] = AccessSet.request_farm_ids(request)
+            if attrs['farm'].pk not in self.context['farm_ids']:
+                raise serializers.ValidationError({'farm_id': 'You do not have access to this farm.'})
+        return super().validate(attrs)
+
+class BulkRecordSerializerMixin(FarmRelatedSerializer):
+    """Resolves the related ids of a batch once each, see InventoryRecordMixin.bulk_create."""
+    serializer_related_field = CachedPrimaryKeyRelatedField
+    farm = CachedPrimaryKeyRelatedField(queryset=Farm.objects.all(), required=False)
+
+class BirthRecordBulkSerializer(BulkRecordSerializerMixin, BirthRecordSerializer):
+    pass
+
+class AcquisitionRecordBulkSerializer(BulkRecordSerializerMixin, AcquisitionRecordSerializer):
+    pass
+
+class DiedRecordBulkSerializer(BulkRecordSerializerMixin, DiedRecordSerializer):
+    pass
+
 class AnimalGroupSerializer(FarmRelatedSerializer):
     class Meta:
         model = AnimalGroup
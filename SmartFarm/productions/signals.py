@@ -1,46 +1,51 @@
 #productions/signals.py
 from django.db import transaction
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from productions.models import AcquisitionRecord, AnimalInventory, BirthRecord, DiedRecord
+from productions.inventory import InventoryLedger
+from productions.models import AcquisitionRecord, Animal, AnimalBreed, AnimalType, BirthRecord, DiedRecord, WeightCategory
+from productions.scanning import TagLookup
+from productions.weight_bands import WeightCategoryIndex
 
 @receiver(post_save, sender=BirthRecord)
-def increase_inventory_on_birth(sender, instance, created, **kwargs):
-    if created:
-        with transaction.atomic():
-            inventory, _ = AnimalInventory.objects.get_or_create(
-                animal_type=instance.animal.animal_type,
-                breed=instance.animal.breed,
-                farm=instance.farm,  # added farm to the lookup
-                defaults={"quantity": 0}
-            )
-            inventory.quantity += instance.number_of_male + instance.number_of_female - instance.number_of_died
-            inventory.save()
-
 @receiver(post_save, sender=AcquisitionRecord)
-def increase_inventory_on_acquisition(sender, instance, created, **kwargs):
-    if created:
-        with transaction.atomic():
-            inventory, _ = AnimalInventory.objects.get_or_create(
-                animal_type=instance.animal_type,
-                breed=instance.breed,
-                farm=instance.farm,  # added farm to the lookup
-                defaults={"quantity": 0}
-            )
-            inventory.quantity += instance.quantity
-            inventory.save()
-
 @receiver(post_save, sender=DiedRecord)
-def decrease_inventory_on_death(sender, instance, created, **kwargs):
-    if created:
-        with transaction.atomic():
-            try:
-                inventory = AnimalInventory.objects.get(
-                    animal_type=instance.animal_type,
-                    breed=instance.breed,
-                    farm=instance.farm  # added farm to the lookup
-                )
-                inventory.quantity = max(0, inventory.quantity - instance.quantity)
-                inventory.save()
-            except AnimalInventory.DoesNotExist:
-                pass
+def book_inventory_movements(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        InventoryLedger.sync_record(instance, created=created)
+
+@receiver(post_delete, sender=BirthRecord)
+@receiver(post_delete, sender=AcquisitionRecord)
+@receiver(post_delete, sender=DiedRecord)
+def reverse_inventory_movements(sender, instance, origin=None, **kwargs):
+    # Records removed by a farm cascade take their ledger with them
+    origin_model = getattr(origin, 'model', type(origin))
+    if origin is None or origin_model is sender:
+        InventoryLedger.sync_record(instance, deleted=True)
+
+@receiver(post_save, sender=WeightCategory)
+@receiver(post_delete, sender=WeightCategory)
+def invalidate_weight_categories(sender, **kwargs):
+    # After commit, or another process could rebuild from the old rows under the new version
+    transaction.on_commit(WeightCategoryIndex.invalidate)
+
+@receiver(pre_save, sender=Animal)
+def remember_tracking_id(sender, instance, update_fields=None, raw=False, **kwargs):
+    # A retagged animal outdates its old tag too
+    instance._previous_tracking_id = None
+    if not raw and not instance._state.adding and (update_fields is None or 'tracking_id' in update_fields):
+        instance._previous_tracking_id = (
+            Animal.objects.filter(pk=instance.pk).values_list('tracking_id', flat=True).first()
+        )
+
+@receiver(post_save, sender=Animal)
+@receiver(post_delete, sender=Animal)
+def invalidate_animal_tags(sender, instance, **kwargs):
+    tags = {instance.tracking_id, getattr(instance, '_previous_tracking_id', None)} - {None}
+    transaction.on_commit(lambda: TagLookup.invalidate(*tags))
+
+@receiver(post_save, sender=AnimalType)
+@receiver(post_save, sender=AnimalBreed)
+def invalidate_tag_lookups(sender, **kwargs):
+    # Every cached tag shows the type and breed names
+    transaction.on_commit(TagLookup.invalidate)
@@ -0,0 +1,77 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+
+from productions.models import Animal
+from productions.qr import QRCodeRenderer
+
+logger = logging.getLogger(__name__)
+
+
+class QRCodeJobs:
+    """
+    Background warm-up of the QR code cache for animals inserted in bulk.
+
+    Jobs run on a process-wide thread pool once the inserting transaction has
+    committed; their progress is kept in the cache under the job id so the
+    client can poll it. With several server processes the cache must be shared
+    (Redis, file based) for a poll to reach the process that runs the job.
+    """
+
+    KEY = 'productions:qr-job:{}'
+    TIMEOUT = 60 * 60 * 24
+    BATCH_SIZE = 100
+
+    _executor = None
+
+    @classmethod
+    def executor(cls):
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'QR_CODE_WORKERS', 2),
+                thread_name_prefix='qr-codes'
+            )
+        return cls._executor
+
+    @classmethod
+    def enqueue(cls, animal_ids):
+        job_id = uuid.uuid4().hex
+        cls.set_state(job_id, status='queued', total=len(animal_ids), done=0, failed=[])
+        transaction.on_commit(lambda: cls.executor().submit(cls.run, job_id, list(animal_ids)))
+        return job_id
+
+    @classmethod
+    def get_state(cls, job_id):
+        return cache.get(cls.KEY.format(job_id))
+
+    @classmethod
+    def set_state(cls, job_id, **state):
+        state['id'] = job_id
+        cache.set(cls.KEY.format(job_id), state, timeout=cls.TIMEOUT)
+        return state
+
+    @classmethod
+    def run(cls, job_id, animal_ids):
+        close_old_connections()
+        done, failed = 0, []
+        try:
+            cls.set_state(job_id, status='running', total=len(animal_ids), done=done, failed=failed)
+            for start in range(0, len(animal_ids), cls.BATCH_SIZE):
+                batch = animal_ids[start:start + cls.BATCH_SIZE]
+                for animal_id in Animal.objects.filter(pk__in=batch).values_list('pk', flat=True):
+                    try:
+                        QRCodeRenderer.get_for_animal(animal_id)
+                    except Exception:
+                        logger.exception("QR code generation failed for animal %s", animal_id)
+                        failed.append(animal_id)
+                done += len(batch)
+                cls.set_state(job_id, status='running', total=len(animal_ids), done=done, failed=failed)
+            cls.set_state(job_id, status='finished', total=len(animal_ids), done=done, failed=failed)
+        except Exception:
+            logger.exception("QR code job %s failed", job_id)
+            cls.set_state(job_id, status='failed', total=len(animal_ids), done=done, failed=failed)
+        finally:
+            connection.close()
@@ -1,3 +1,710 @@
-from django.test import TestCase
+import re
+from datetime import date, datetime, timezone
+from importlib import import_module
+from io import BytesIO
+from unittest import mock
+from django.apps import apps
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from account.models import CustomUser, Farm, FarmUser
+from account.serializers import CustomTokenObtainPairSerializer
+from finance.sales_models import Sale, SaleItem
+from productions.filters import filter_intake
+from productions.inventory import InsufficientInventoryError, InventoryLedger
+from productions.models import (
+    Animal, AnimalBreed, AnimalGroup, AnimalInventory, AnimalType, BirthRecord, DiedRecord, InventoryMovement,
+    InventorySnapshot, WeightCategory
+)
+from productions.labels import LabelSheet
+from productions.pedigree import Pedigree
+from productions.qr import QRCodeRenderer
+from productions.scanning import TagLookup
+from productions.tasks import QRCodeJobs
+from productions.weight_bands import WeightCategoryIndex
+from productions.views import BirthRecordViewSet
+from productions.weight_models import WeighSession, WeightRecord
+from reports.models import FarmDailyStats
+from utilities.models import SearchEntry
+
+ADDRESS = dict(street='1 rue des Baobabs', city='Thiès', postal_code='21000', country_name='Sénégal', country_code='SN')
+# Versions and cached lookups stay out of the development cache
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'productions-tests'},
+    'qr_codes': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'productions-tests-qr'},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ProductionsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_superuser('admin', password='secret', **ADDRESS)
+        cls.farm = Farm.objects.create(name='Ferme', owner=cls.user, **ADDRESS)
+        FarmUser.objects.create(farm=cls.farm, user=cls.user)
+        cls.goat = AnimalType.objects.create(name='Goat')
+        cls.boer = AnimalBreed.objects.create(name='Boer', animal_type=cls.goat)
+        cls.group = AnimalGroup.objects.create(
+            animal_type=cls.goat, breed=cls.boer, quantity=10, location='Enclos', farm=cls.farm
+        )
+
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def member_client(self, farm=None, current=True):
+        """A client holding the JWT of a farm member (not a superuser), working in `farm` when `current`."""
+        farm = farm or self.farm
+        member = CustomUser.objects.create_user(f'membre-{farm.pk}', password='secret', **ADDRESS)
+        FarmUser.objects.create(farm=farm, user=member)
+        # The membership moved the version the token is checked against
+        member.refresh_from_db()
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {CustomTokenObtainPairSerializer.get_token(member).access_token}'}
+        if current:
+            headers['HTTP_X_FARM_ID'] = str(farm.pk)
+        client = APIClient()
+        client.credentials(**headers)
+        return client
+
+    def add_birth(self, males=2, females=1):
+        return BirthRecord.objects.create(
+            animal_group=self.group, number_of_male=males, number_of_female=females, farm=self.farm
+        )
+
+    def add_death(self, quantity=1):
+        return DiedRecord.objects.create(animal_group=self.group, quantity=quantity, weight=20, farm=self.farm)
+
+    def stock(self):
+        inventory = AnimalInventory.objects.filter(farm=self.farm, animal_type=self.goat, breed=self.boer).first()
+        return inventory.quantity if inventory else 0
+
+    def ledger(self):
+        return InventoryMovement.objects.filter(farm=self.farm).aggregate(total=Sum('quantity'))['total'] or 0
+
+
+class InventoryLedgerTests(ProductionsTestCase):
+    def test_records_book_their_movements(self):
+        birth = self.add_birth()
+        death = self.add_death()
+        self.assertEqual((self.stock(), self.ledger()), (2, 2))
+
+        birth.number_of_female = 3
+        birth.save()
+        death.status = 'cancelled'
+        death.save()
+        self.assertEqual((self.stock(), self.ledger()), (5, 5))
+
+        birth.delete()
+        self.assertEqual((self.stock(), self.ledger()), (0, 0))
+        self.assertEqual(
+            list(InventoryMovement.objects.filter(reason='birth').order_by('id').values_list('quantity', flat=True)),
+            [3, 2, -5]
+        )
+
+    def test_stock_never_goes_below_zero(self):
+        self.add_birth()
+        with self.assertRaises(InsufficientInventoryError):
+            self.add_death(quantity=4)
+        self.assertEqual((self.stock(), self.ledger()), (3, 3))
+
+    def test_a_death_beyond_the_stock_is_a_400(self):
+        self.add_birth()
+        response = self.client.post('/api/productions/died-records/', {
+            'animal_group': self.group.pk, 'quantity': 4, 'weight': 20, 'farm': self.farm.pk,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('inventory', response.json())
+        self.assertFalse(DiedRecord.objects.exists())
+
+    def test_balances_match_the_cached_quantities(self):
+        self.add_birth()
+        self.add_death()
+        self.assertEqual(InventoryLedger.balances(self.farm), {(self.farm.pk, self.goat.pk, self.boer.pk): 2})
+
+
+class InventoryAsOfTests(ProductionsTestCase):
+    def book(self, quantity, day, reason='adjustment'):
+        InventoryLedger.record(self.farm.pk, self.goat.pk, self.boer.pk, quantity, reason, day)
+
+    def as_of(self, day):
+        inventories = InventoryLedger.annotate_as_of(AnimalInventory.objects.filter(farm=self.farm), day)
+        return inventories.get().quantity_as_of
+
+    def test_balance_at_the_end_of_a_past_day(self):
+        self.book(10, date(2024, 1, 10))
+        self.book(-3, date(2024, 2, 10))
+        self.book(5, date(2024, 3, 10))
+
+        self.assertEqual(self.as_of(date(2024, 1, 9)), 0)
+        self.assertEqual(self.as_of(date(2024, 2, 10)), 7)
+        self.assertEqual(self.as_of(date(2024, 12, 31)), 12)
+
+    def test_checkpoints_take_back_dated_movements(self):
+        self.book(10, date(2024, 1, 10))
+        InventoryLedger.snapshot(date(2024, 2, 1))
+        self.book(-4, date(2024, 1, 20))
+        with InventoryLedger.batch():
+            self.book(2, date(2024, 1, 25))
+
+        self.assertEqual(InventorySnapshot.objects.get(date=date(2024, 2, 1)).quantity, 8)
+        self.assertEqual(self.as_of(date(2024, 2, 1)), 8)
+        self.assertEqual(self.as_of(date(2024, 1, 20)), 6)
+
+    def test_endpoint_answers_as_of_and_rejects_impossible_dates(self):
+        self.book(10, date(2024, 1, 10))
+        self.book(5, date(2024, 3, 10))
+
+        response = self.client.get('/api/productions/animal-inventories/', {'as_of': '2024-02-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['quantity'] for row in response.json()['results']], [10])
+
+        response = self.client.get('/api/productions/animal-inventories/', {'as_of': '2024-02-30'})
+        self.assertEqual(response.status_code, 400)
+
+    def backfill(self, quantity):
+        """Rebuild the ledger of the records on file as the 0003 migration does, for a counted stock of `quantity`."""
+        InventoryMovement.objects.all().delete()
+        AnimalInventory.objects.filter(farm=self.farm).update(quantity=quantity)
+        import_module('productions.migrations.0003_inventory_opening_balances').book_opening_balances(apps, None)
+
+    def test_history_is_rebuilt_from_the_records(self):
+        Animal.objects.create(
+            tracking_id='G-1', animal_type=self.goat, breed=self.boer, gender='Female',
+            date_of_birth=date(2023, 5, 1), farm=self.farm
+        )
+        AnimalGroup.objects.filter(pk=self.group.pk).update(created_at=datetime(2023, 8, 1, tzinfo=timezone.utc))
+        birth = self.add_birth(males=2, females=1)
+        BirthRecord.objects.filter(pk=birth.pk).update(date_of_birth=date(2024, 1, 10))
+        death = self.add_death(1)
+        DiedRecord.objects.filter(pk=death.pk).update(date_of_death=date(2024, 2, 10))
+        sale = Sale.objects.create(farm=self.farm, invoice_number='F-1', total_amount=100)
+        Sale.objects.filter(pk=sale.pk).update(sale_date=date(2024, 3, 10))
+        SaleItem.objects.create(sale=sale, animal_group=self.group, quantity=1, unit_price=100)
+
+        # Five animals held before the first record
+        self.backfill(6)
+
+        self.assertEqual(InventoryMovement.objects.get(reason='opening').date, date(2023, 5, 1))
+        expected = {
+            date(2023, 4, 30): 0, date(2023, 5, 1): 5, date(2024, 1, 10): 8, date(2024, 2, 10): 7,
+            date(2024, 3, 10): 6, date.today(): 6,
+        }
+        self.assertEqual({day: self.as_of(day) for day in expected}, expected)
+        # Booked under their record: an edit books the difference only
+        birth.refresh_from_db()
+        birth.number_of_male = 3
+        birth.save()
+        self.assertEqual(self.stock(), 7)
+        self.assertEqual(self.ledger(), 7)
+
+    def test_unrecorded_removals_are_adjusted_today(self):
+        birth = self.add_birth(males=2, females=1)
+        BirthRecord.objects.filter(pk=birth.pk).update(date_of_birth=date(2024, 1, 10))
+
+        self.backfill(1)
+
+        self.assertFalse(InventoryMovement.objects.filter(reason='opening').exists())
+        self.assertEqual(InventoryMovement.objects.get(reason='adjustment').quantity, -2)
+        self.assertEqual((self.as_of(date(2024, 1, 10)), self.as_of(date.today())), (3, 1))
+
+
+class AnimalBulkCreateTests(ProductionsTestCase):
+    def payload(self, *tracking_ids):
+        return [
+            {
+                'tracking_id': tracking_id, 'animal_type_id': self.goat.pk, 'breed_id': self.boer.pk,
+                'farm_id': self.farm.pk, 'gender': 'Female',
+            }
+            for tracking_id in tracking_ids
+        ]
+
+    def test_animals_are_inserted_and_their_qr_codes_queued_after_commit(self):
+        with mock.patch.object(QRCodeJobs, 'executor') as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/productions/animals/bulk/', self.payload('G-1', 'G-2', 'G-3'), format='json')
+
+        self.assertEqual(response.status_code, 201)
+        ids = response.json()['ids']
+        self.assertEqual(sorted(ids), sorted(Animal.objects.values_list('pk', flat=True)))
+        self.assertEqual(response.json()['qr_code_job']['status'], 'queued')
+        job_id = response.json()['qr_code_job']['id']
+        executor.return_value.submit.assert_called_once_with(QRCodeJobs.run, job_id, ids)
+
+        response = self.client.get(f'/api/productions/animals/bulk/{job_id}/')
+        self.assertEqual((response.status_code, response.json()['total']), (200, 3))
+
+    def test_tracking_ids_must_be_new_and_unique_in_the_batch(self):
+        Animal.objects.create(tracking_id='G-1', animal_type=self.goat, breed=self.boer, gender='Male', farm=self.farm)
+
+        for tracking_ids in (('G-2', 'G-2'), ('G-1', 'G-3')):
+            response = self.client.post('/api/productions/animals/bulk/', self.payload(*tracking_ids), format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(Animal.objects.count(), 1)
+
+    def test_members_only_register_animals_in_their_farms(self):
+        other_farm = Farm.objects.create(name='Autre', **ADDRESS)
+        payload = self.payload('G-1', 'G-2')
+        payload[1]['farm_id'] = other_farm.pk
+        client = self.member_client()
+        with mock.patch.object(QRCodeJobs, 'executor'):
+            response = client.post('/api/productions/animals/bulk/', payload, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['1']['farm_id'], ['You do not have access to this farm.'])
+            self.assertFalse(Animal.objects.exists())
+
+            # Without a farm id, the current farm
+            del payload[1]['farm_id']
+            response = client.post('/api/productions/animals/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(Animal.objects.values_list('farm_id', flat=True)), {self.farm.pk})
+
+
+class QRCodeTests(ProductionsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.animal = Animal.objects.create(
+            tracking_id='G-1', animal_type=self.goat, breed=self.boer, gender='Male', farm=self.farm
+        )
+        self.url = f'/api/productions/animals/{self.animal.pk}/qr-code/'
+
+    def test_codes_are_rendered_once_and_revalidated_without_rendering(self):
+        with mock.patch.object(QRCodeRenderer, 'render', wraps=QRCodeRenderer.render) as render:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+            revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual((first.status_code, first['Content-Type']), (200, 'image/png'))
+        self.assertEqual(first.content, second.content)
+        self.assertTrue(first.content.startswith(b'\x89PNG'))
+        self.assertEqual((revalidated.status_code, revalidated['ETag']), (304, first['ETag']))
+
+    def test_svg_codes_and_unknown_types(self):
+        response = self.client.get(self.url, {'type': 'svg'})
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/svg+xml'))
+        self.assertEqual(self.client.get(self.url, {'type': 'gif'}).status_code, 400)
+
+
+class LabelSheetTests(ProductionsTestCase):
+    def add_animals(self, count, birth_record=None):
+        return Animal.objects.bulk_create([
+            Animal(
+                tracking_id=f'{birth_record.pk if birth_record else "A"}-{index}', animal_type=self.goat,
+                breed=self.boer, gender='Female', farm=self.farm, birth_record=birth_record
+            )
+            for index in range(count)
+        ])
+
+    def pages(self, response):
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'application/pdf'))
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith(b'%PDF'))
+        return len(re.findall(rb'/Type /Page\b(?!s)', content))
+
+    def test_sheet_has_a_page_per_24_labels(self):
+        self.add_animals(25)
+        self.assertEqual(self.pages(self.client.get('/api/productions/animals/qr-labels/')), 2)
+
+    def test_sheet_of_one_group(self):
+        self.add_animals(3)
+        self.add_animals(2, birth_record=self.add_birth())
+        response = self.client.get('/api/productions/animals/qr-labels/', {'group': self.group.pk})
+        self.assertEqual(self.pages(response), 1)
+        self.assertEqual(LabelSheet.render(filter_intake(Animal.objects.all(), group=self.group.pk), BytesIO()), 2)
+
+    def test_malformed_filters_are_a_400(self):
+        for params in ({'group': 'abc'}, {'created_since': '2024-02-30'}, {'created_since': 'yesterday'}):
+            self.assertEqual(self.client.get('/api/productions/animals/qr-labels/', params).status_code, 400)
+
+    def test_pages_are_sent_as_they_are_drawn(self):
+        self.add_animals(50)
+        with mock.patch.object(LabelSheet, 'draw_label', wraps=LabelSheet.draw_label) as draw_label:
+            chunks = LabelSheet.stream(Animal.objects.order_by('pk'))
+            header, first_page = next(chunks), next(chunks)
+            self.assertEqual(draw_label.call_count, 24)
+            content = header + first_page + b''.join(chunks)
+        self.assertEqual(draw_label.call_count, 50)
+
+        # Every object sits where the cross-reference table says
+        xref = content.rindex(b'\nxref\n') + 1
+        self.assertEqual(int(re.search(rb'startxref\n(\d+)', content).group(1)), xref)
+        offsets = re.findall(rb'(\d{10}) 00000 n ', content[xref:])
+        for number, offset in enumerate(offsets, start=1):
+            self.assertTrue(content[int(offset):].startswith(b'%d 0 obj' % number))
+        self.assertIn(b'/Count 3', content)
+
+    def test_command_rejects_impossible_dates(self):
+        with self.assertRaisesMessage(CommandError, 'Invalid date: 2024-02-30'):
+            call_command('print_qr_labels', 'labels.pdf', since='2024-02-30')
+
+
+class AnimalCompactListTests(ProductionsTestCase):
+    def add_animals(self, count, start=0):
+        Animal.objects.bulk_create([
+            Animal(tracking_id=f'G-{index}', animal_type=self.goat, breed=self.boer, gender='Male', farm=self.farm)
+            for index in range(start, start + count)
+        ])
+
+    def list_compact(self):
+        return self.client.get('/api/productions/animals/', {'representation': 'compact'})
+
+    def test_rows_are_flat_and_related_objects_described_once(self):
+        self.add_animals(3)
+        data = self.list_compact().json()
+
+        self.assertEqual(len(data['results']), 3)
+        row = data['results'][0]
+        self.assertEqual((row['animal_type'], row['breed'], row['farm']), (self.goat.pk, self.boer.pk, self.farm.pk))
+        self.assertEqual(list(data['lookups']['animal_types']), [str(self.goat.pk)])
+        self.assertEqual(data['lookups']['breeds'][str(self.boer.pk)]['name'], 'Boer')
+        self.assertEqual(data['lookups']['farms'][str(self.farm.pk)]['name'], 'Ferme')
+        self.assertTrue(data['qr_code_url'].endswith('/animals/{id}/qr-code/'))
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        self.add_animals(2)
+        with CaptureQueriesContext(connection) as small:
+            self.list_compact()
+        self.add_animals(20, start=2)
+        with CaptureQueriesContext(connection) as large:
+            self.list_compact()
+        self.assertEqual(len(small), len(large))
+
+
+class WeighingTests(ProductionsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.billy, self.nanny = Animal.objects.bulk_create([
+            Animal(tracking_id=tag, animal_type=self.goat, breed=self.boer, gender=gender, farm=self.farm)
+            for tag, gender in (('G-1', 'Male'), ('G-2', 'Female'))
+        ])
+
+    def weigh(self, readings, day='2024-03-01'):
+        return self.client.post('/api/productions/weigh-sessions/', {
+            'farm': self.farm.pk, 'date': day, 'readings': readings,
+        }, format='json')
+
+    def test_a_session_records_and_mirrors_every_reading(self):
+        response = self.weigh([{'animal': self.billy.pk, 'weight': 31.5}, {'tracking_id': 'G-2', 'weight': 24}])
+
+        self.assertEqual((response.status_code, response.json()['records_count']), (201, 2))
+        self.billy.refresh_from_db()
+        self.assertEqual(
+            (self.billy.current_weight, self.billy.initial_weight, self.billy.last_weigh_date),
+            (31.5, 31.5, date(2024, 3, 1))
+        )
+        self.assertEqual(WeightRecord.objects.get(animal=self.nanny).weight, 24)
+
+    def test_readings_are_checked_together(self):
+        response = self.weigh([
+            {'animal': self.billy.pk, 'weight': 30}, {'tracking_id': 'G-1', 'weight': 31}, {'tracking_id': 'X', 'weight': 2},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.json()['readings']), ['1', '2'])
+        self.assertFalse(WeightRecord.objects.exists())
+
+    def test_older_readings_keep_the_latest_weight_and_deletes_restore_it(self):
+        self.weigh([{'animal': self.billy.pk, 'weight': 30}], day='2024-03-01')
+        self.weigh([{'animal': self.billy.pk, 'weight': 25}], day='2024-02-01')
+        self.billy.refresh_from_db()
+        self.assertEqual(self.billy.current_weight, 30)
+
+        latest = WeighSession.objects.get(date=date(2024, 3, 1))
+        self.assertEqual(self.client.delete(f'/api/productions/weigh-sessions/{latest.pk}/').status_code, 204)
+        self.billy.refresh_from_db()
+        self.assertEqual((self.billy.current_weight, self.billy.last_weigh_date), (25, date(2024, 2, 1)))
+
+    def test_moving_a_reading_re_mirrors_both_animals(self):
+        self.weigh([{'animal': self.billy.pk, 'weight': 30}], day='2024-02-01')
+        self.weigh([{'animal': self.billy.pk, 'weight': 34}], day='2024-03-01')
+        record = WeightRecord.objects.get(weight=34)
+        response = self.client.patch(f'/api/productions/weight-records/{record.pk}/', {'animal': self.nanny.pk})
+
+        self.assertEqual(response.status_code, 200)
+        self.billy.refresh_from_db()
+        self.nanny.refresh_from_db()
+        self.assertEqual((self.billy.current_weight, self.nanny.current_weight), (30, 34))
+
+    def test_animals_of_another_farm_cannot_be_weighed(self):
+        other_farm = Farm.objects.create(name='Autre', **ADDRESS)
+        stranger = Animal.objects.create(
+            tracking_id='O-1', animal_type=self.goat, breed=self.boer, gender='Male', farm=other_farm
+        )
+        response = self.member_client().post('/api/productions/weight-records/', {
+            'animal': stranger.pk, 'date': '2024-03-01', 'weight': 30,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('animal', response.json())
+
+
+class WeightCategoryTests(ProductionsTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.light = WeightCategory.objects.create(min_weight=0, max_weight=10)
+            self.medium = WeightCategory.objects.create(min_weight=10, max_weight=20)
+            self.heavy = WeightCategory.objects.create(min_weight=30, max_weight=50)
+
+    def test_classify_and_sql_case_agree(self):
+        index = WeightCategoryIndex.current()
+        weights = [None, 0, 5, 10, 15, 20, 25, 30, 50, 60]
+        self.assertEqual(
+            [category and category.pk for category in map(index.classify, weights)],
+            [None, self.light.pk, self.light.pk, self.medium.pk, self.medium.pk, self.medium.pk,
+             None, self.heavy.pk, self.heavy.pk, None]
+        )
+
+        Animal.objects.bulk_create([
+            Animal(tracking_id=f'G-{i}', animal_type=self.goat, breed=self.boer, gender='Male', farm=self.farm,
+                   current_weight=weight)
+            for i, weight in enumerate(weights)
+        ])
+        bands = dict(Animal.objects.annotate(band=index.as_case()).values_list('current_weight', 'band'))
+        for weight in weights:
+            category = index.classify(weight)
+            expected = category.pk if category else (index.UNWEIGHED if weight is None else index.UNCLASSIFIED)
+            self.assertEqual(bands[weight], expected)
+
+    def test_index_follows_committed_changes(self):
+        index = WeightCategoryIndex.current()
+        self.assertIs(WeightCategoryIndex.current(), index)
+        with self.captureOnCommitCallbacks(execute=True):
+            WeightCategory.objects.create(min_weight=20, max_weight=30)
+        self.assertEqual(WeightCategoryIndex.current().classify(25).min_weight, 20)
+
+    def test_histogram_counts_the_farm_animals(self):
+        for i, weight in enumerate([5, 12, 18, 25, None]):
+            Animal.objects.create(
+                tracking_id=f'G-{i}', animal_type=self.goat, breed=self.boer, gender='Male', farm=self.farm,
+                current_weight=weight
+            )
+        response = self.member_client().get('/api/productions/weight-categories/histogram/')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([category['count'] for category in data['categories']], [1, 2, 0])
+        self.assertEqual((data['unclassified'], data['unweighed'], data['total']), (1, 1, 5))
+        response = self.client.get('/api/productions/weight-categories/histogram/', {'breed_id': 'boer'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TagLookupTests(ProductionsTestCase):
+    def setUp(self):
+        super().setUp()
+        TagLookup.invalidate()
+        self.animal = Animal.objects.create(
+            tracking_id='FR-001', animal_type=self.goat, breed=self.boer, gender='Male', farm=self.farm
+        )
+        self.other = Animal.objects.create(
+            tracking_id='FR-002', animal_type=self.goat, breed=self.boer, gender='Female', farm=self.farm
+        )
+
+    def test_exact_lookups_are_served_from_memory(self):
+        self.assertEqual(TagLookup.exact('FR-001')['breed'], 'Boer')
+        with self.assertNumQueries(0):
+            self.assertEqual(TagLookup.exact('FR-001')['id'], self.animal.pk)
+        self.assertIsNone(TagLookup.exact('FR-404'))
+
+    def test_a_retag_outdates_the_old_and_new_tags_only(self):
+        TagLookup.exact('FR-001')
+        TagLookup.exact('FR-002')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.animal.tracking_id = 'FR-101'
+            self.animal.save()
+
+        self.assertIsNone(TagLookup.exact('FR-001'))
+        self.assertEqual(TagLookup.exact('FR-101')['id'], self.animal.pk)
+        with self.assertNumQueries(0):
+            TagLookup.exact('FR-002')
+
+    def test_a_weigh_session_refreshes_the_weighed_tags(self):
+        TagLookup.exact('FR-001')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/productions/weigh-sessions/', {
+                'farm': self.farm.pk, 'readings': [{'tracking_id': 'FR-001', 'weight': 31}],
+            }, format='json')
+        self.assertEqual(TagLookup.exact('FR-001')['current_weight'], 31)
+
+    def test_prefix_lookups_are_scoped_to_the_current_farm(self):
+        other_farm = Farm.objects.create(name='Autre', **ADDRESS)
+        Animal.objects.create(tracking_id='FR-003', animal_type=self.goat, breed=self.boer, gender='Male', farm=other_farm)
+        client = self.member_client()
+
+        response = client.get('/api/productions/animals/scan/', {'prefix': 'FR-00'})
+        self.assertEqual([row['tracking_id'] for row in response.json()], ['FR-001', 'FR-002'])
+        response = client.get('/api/productions/animals/scan/', {'tracking_id': 'FR-003'})
+        self.assertEqual(response.status_code, 404)
+        # A superuser without a farm would scan every farm
+        response = self.client.get('/api/productions/animals/scan/', {'prefix': 'FR-00'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_exact_lookups_without_a_farm_stay_within_the_user_farms(self):
+        other_farm = Farm.objects.create(name='Autre', **ADDRESS)
+        Animal.objects.create(tracking_id='FR-003', animal_type=self.goat, breed=self.boer, gender='Male', farm=other_farm)
+        client = self.member_client(current=False)
+
+        response = client.get('/api/productions/animals/scan/', {'tracking_id': 'FR-001'})
+        self.assertEqual((response.status_code, response.json()['farm']), (200, self.farm.pk))
+        # Cached by a superuser's scan, still refused
+        self.assertEqual(self.client.get('/api/productions/animals/scan/', {'tracking_id': 'FR-003'}).status_code, 200)
+        response = client.get('/api/productions/animals/scan/', {'tracking_id': 'FR-003'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_successor_bounds_the_prefix_range(self):
+        self.assertEqual(TagLookup.successor('FR-0'), 'FR-1')
+        self.assertEqual(TagLookup.successor('A' + chr(0x10FFFF)), 'B')
+        self.assertIsNone(TagLookup.successor(chr(0x10FFFF)))
+
+
+class PedigreeTests(ProductionsTestCase):
+    def add_animal(self, tracking_id, gender, dam=None, sire=None):
+        birth_record = None
+        if dam or sire:
+            birth_record = BirthRecord.objects.create(animal=dam, sire=sire, number_of_male=1, farm=self.farm)
+        return Animal.objects.create(
+            tracking_id=tracking_id, animal_type=self.goat, breed=self.boer, gender=gender, farm=self.farm,
+            birth_record=birth_record
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.dam = self.add_animal('D', 'Female')
+        self.sire = self.add_animal('S', 'Male')
+        self.brother = self.add_animal('A', 'Male', self.dam, self.sire)
+        self.sister = self.add_animal('B', 'Female', self.dam, self.sire)
+        self.inbred = self.add_animal('C', 'Female', self.sister, self.brother)
+
+    def test_ancestors_are_listed_once_at_their_nearest_generation(self):
+        animals = Pedigree.ancestors([self.inbred.pk], depth=2)
+        self.assertEqual(
+            [(animal['tracking_id'], animal['depth']) for animal in animals],
+            [('C', 0), ('A', 1), ('B', 1), ('D', 2), ('S', 2)]
+        )
+        self.assertEqual((animals[0]['dam'], animals[0]['sire']), (self.sister.pk, self.brother.pk))
+        self.assertEqual(len(Pedigree.ancestors([self.inbred.pk], depth=1)), 3)
+
+    def test_descendants(self):
+        animals = Pedigree.descendants([self.sire.pk])
+        self.assertEqual([animal['tracking_id'] for animal in animals], ['S', 'A', 'B', 'C'])
+
+    def test_inbreeding_coefficients(self):
+        self.assertEqual(Pedigree.inbreeding(self.inbred.pk), 0.25)
+        self.assertEqual(Pedigree.inbreeding(self.brother.pk), 0.0)
+        self.assertEqual(Pedigree.coancestry(self.brother.pk, self.sister.pk), 0.25)
+        # Beyond the depth the parents are unknown
+        self.assertEqual(Pedigree.coancestry(self.brother.pk, self.sister.pk, depth=0), 0.0)
+
+        half_sibling = self.add_animal('E', 'Female', self.add_animal('F', 'Female'), self.sire)
+        self.assertEqual(Pedigree.coancestry(self.brother.pk, half_sibling.pk), 0.125)
+
+    def test_endpoints(self):
+        url = f'/api/productions/animals/{self.brother.pk}/inbreeding/'
+        self.assertEqual(self.client.get(url, {'mate': self.sister.pk}).json()['offspring_inbreeding'], 0.25)
+        self.assertEqual(self.client.get(url, {'mate': self.brother.pk}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'depth': 0}).status_code, 400)
+        response = self.client.get(f'/api/productions/animals/{self.inbred.pk}/ancestors/', {'depth': 1})
+        self.assertEqual(len(response.json()['animals']), 3)
+
+
+class InventoryBatchTests(ProductionsTestCase):
+    def test_movements_are_written_when_the_batch_closes(self):
+        with InventoryLedger.batch():
+            self.add_birth()
+            self.add_birth(males=1, females=0)
+            self.assertEqual((self.stock(), self.ledger()), (0, 0))
+            self.assertEqual(len(InventoryLedger.pending()), 2)
+        self.assertEqual((self.stock(), self.ledger()), (4, 4))
+        self.assertEqual(InventoryLedger.pending(), [])
+
+    def test_stock_is_checked_against_the_net_change(self):
+        with InventoryLedger.batch():
+            self.add_death(quantity=2)
+            self.add_birth()
+        self.assertEqual(self.stock(), 1)
+
+        with self.assertRaises(InsufficientInventoryError):
+            with InventoryLedger.batch():
+                self.add_birth()
+                self.add_death(quantity=5)
+        self.assertEqual((self.stock(), BirthRecord.objects.count()), (1, 1))
+
+    def test_a_record_updated_within_the_batch_books_its_net_change(self):
+        with InventoryLedger.batch():
+            birth = self.add_birth()
+            birth.number_of_male = 5
+            birth.save()
+        self.assertEqual((self.stock(), self.ledger()), (6, 6))
+
+    def test_a_rolled_back_nested_batch_discards_its_movements(self):
+        with InventoryLedger.batch():
+            self.add_birth()
+            try:
+                with InventoryLedger.batch():
+                    self.add_birth(males=10, females=0)
+                    raise ValueError
+            except ValueError:
+                pass
+            self.add_birth(males=1, females=0)
+        self.assertEqual((self.stock(), self.ledger(), BirthRecord.objects.count()), (4, 4, 2))
+
+    def test_a_rolled_back_batch_discards_its_movements(self):
+        with self.assertRaises(ValueError):
+            with InventoryLedger.batch():
+                self.add_birth()
+                raise ValueError
+        self.assertEqual(InventoryLedger.pending(), [])
+
+        # Flushed when the block closes, the movements still roll back with an enclosing transaction
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                with InventoryLedger.batch():
+                    self.add_birth()
+                self.assertEqual(self.ledger(), 3)
+                raise ValueError
+        self.assertEqual((self.stock(), self.ledger(), BirthRecord.objects.count()), (0, 0, 0))
+
+
+class BulkRecordTests(ProductionsTestCase):
+    url = '/api/productions/birth-records/bulk/'
+
+    def birth(self, **fields):
+        return {'animal_group': self.group.pk, 'number_of_male': 1, 'farm': self.farm.pk, **fields}
+
+    def test_valid_records_are_booked_rolled_up_and_indexed_together(self):
+        response = self.client.post(self.url, [self.birth(notes='Jumeaux'), self.birth(number_of_female=2)], format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['index'] for item in response.json()['created']], [0, 1])
+        self.assertEqual((self.stock(), InventoryMovement.objects.count()), (4, 2))
+        self.assertEqual(FarmDailyStats.objects.get(farm=self.farm, animal_type=self.goat).births, 4)
+        self.assertEqual(SearchEntry.objects.filter(document='Jumeaux').count(), 1)
+
+    def test_partial_failures_are_a_207(self):
+        response = self.client.post(self.url, [self.birth(), self.birth(number_of_male=0), self.birth()], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([item['index'] for item in response.json()['created']], [0, 2])
+        self.assertEqual(list(response.json()['errors']), ['1'])
+        self.assertEqual(BirthRecord.objects.count(), 2)
+
+    def test_nothing_valid_is_a_400(self):
+        self.assertEqual(self.client.post(self.url, [self.birth(number_of_male=0)], format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, self.birth(), format='json').status_code, 400)
+        oversized = [self.birth()] * (BirthRecordViewSet.BULK_MAX_SIZE + 1)
+        self.assertEqual(self.client.post(self.url, oversized, format='json').status_code, 400)
+        self.assertFalse(BirthRecord.objects.exists())
+
+    def test_records_of_another_farm_are_refused(self):
+        other_farm = Farm.objects.create(name='Autre', **ADDRESS)
+        response = self.member_client().post(self.url, [self.birth(), self.birth(farm=other_farm.pk)], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertIn('farm', response.json()['errors']['1'])
+        self.assertFalse(BirthRecord.objects.filter(farm=other_farm).exists())
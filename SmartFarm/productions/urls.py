@@ -2,6 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from productions.feed_views import FeedInventoryViewSet, FeedTypeViewSet, FeedingRecordViewSet
+from productions.weight_views import WeighSessionViewSet, WeightRecordViewSet
 from productions.health_views import HealthIssueViewSet, HealthRecordViewSet, MedicationTypeViewSet, TreatmentViewSet
 from .views import (
     AcquisitionRecordViewSet, AnimalInventoryViewSet, AnimalTypeViewSet, AnimalBreedViewSet, AnimalViewSet, DiedRecordViewSet, WeightCategoryViewSet,
@@ -26,6 +27,8 @@ router.register(r'feed-types', FeedTypeViewSet)
 router.register(r'feed-inventory', FeedInventoryViewSet)
 router.register(r'feeding-records', FeedingRecordViewSet)
 router.register(r'animals', AnimalViewSet, basename='animal')
+router.register(r'weigh-sessions', WeighSessionViewSet, basename='weigh-session')
+router.register(r'weight-records', WeightRecordViewSet, basename='weight-record')
 
 # Farm-specific endpoints with explicit farm_id in URL
 farm_router = DefaultRouter()
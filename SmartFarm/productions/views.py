@@ -1,22 +1,49 @@
-from rest_framework import viewsets
+from contextlib import contextmanager
+from urllib.parse import unquote
+from datetime import date
+from django.db import transaction
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import content_disposition_header, parse_etags, quote_etag
+from django.urls import reverse
+from django.utils.dateparse import parse_date
+from rest_framework import serializers, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
-from productions.filters import AcquisitionRecordFilter, AnimalInventoryFilter, BirthRecordFilter, DiedRecordFilter
+from productions.filters import AcquisitionRecordFilter, AnimalInventoryFilter, BirthRecordFilter, DiedRecordFilter, filter_intake
 from productions.models import (
     AcquisitionRecord, Animal, AnimalInventory, AnimalType, AnimalBreed,DiedRecord, WeightCategory,
     BirthRecord
 )
 from .serializers import (
-    AcquisitionRecordSerializer, AnimalInventorySerializer, AnimalSerializer, AnimalTypeSerializer, AnimalBreedSerializer, DiedRecordSerializer, WeightCategorySerializer,
-    BirthRecordSerializer
+    AcquisitionRecordSerializer, AnimalBulkCreateSerializer, AnimalCompactSerializer, AnimalGroupSerializer, AnimalInventorySerializer, AnimalSerializer, AnimalTypeSerializer, AnimalBreedSerializer, DiedRecordSerializer, WeightCategorySerializer,
+    BirthRecordSerializer, BirthRecordBulkSerializer, AcquisitionRecordBulkSerializer, DiedRecordBulkSerializer
 )
+from productions.inventory import InsufficientInventoryError, InventoryLedger
+from productions.labels import LabelSheet
+from productions.pedigree import Pedigree
+from productions.qr import QRCodeRenderer
+from productions.scanning import TagLookup
+from productions.tasks import QRCodeJobs
+from productions.weight_bands import WeightCategoryIndex
+from reports.services.cache_service import ReportCache
+from reports.services.daily_stats_service import DailyStatsService
+from account.access import AccessSet
 from account.permissions import IsAuthenticatedAndHasRole
+from account.serializers import FarmSerializer
+from utilities.fieldsets import SparseFieldsMixin
+from utilities.pagination import KeysetPagination
+from utilities.search import IndexedSearchFilter, SearchIndex
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 
-class AnimalTypeViewSet(viewsets.ModelViewSet):
+class AnimalTypeViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = AnimalType.objects.all()
     serializer_class = AnimalTypeSerializer
+    field_sources = {'image': ['image']}
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'description']
@@ -32,9 +59,11 @@ class AnimalTypeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-class AnimalBreedViewSet(viewsets.ModelViewSet):
+class AnimalBreedViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = AnimalBreed.objects.all()
     serializer_class = AnimalBreedSerializer
+    field_sources = {'image': ['image'], 'thumbnail': ['image']}
+    expandable_fields = {'animal_type': AnimalTypeSerializer}
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'description', 'animal_type__name']
@@ -65,53 +94,457 @@ class WeightCategoryViewSet(viewsets.ModelViewSet):
     ordering_fields = ['min_weight', 'max_weight']
     filterset_fields = ['min_weight', 'max_weight']
 
-class BirthRecordViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def histogram(self, request):
+        """
+        Headcount per weight category of the current farm's animals, in one
+        grouped query. Narrow with `breed_id`, `animal_type_id`, `group_id`
+        and `status` (default active).
+        """
+        params = {name: request.query_params.get(name) for name in ('breed_id', 'animal_type_id', 'group_id')}
+        params['animal_status'] = request.query_params.get('status', 'active')
+        for name in ('breed_id', 'animal_type_id', 'group_id'):
+            if params[name] and not params[name].isdigit():
+                return Response({name: 'Expected an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        farm_id = getattr(request, 'current_farm_id', None)
+        index = WeightCategoryIndex.current()
+        key = ReportCache.build_key(
+            'weight-histogram', farm_id, request.user.is_superuser, index.version, *params.values()
+        )
+        return Response(ReportCache.get_or_set(key, lambda: self.build_histogram(index, farm_id, **params)))
+
+    def build_histogram(self, index, farm_id, breed_id=None, animal_type_id=None, group_id=None, animal_status=None):
+        animals = Animal.objects.order_by()
+        if farm_id:
+            animals = animals.filter(farm_id=farm_id)
+        elif not self.request.user.is_superuser:
+            animals = animals.none()
+        if breed_id:
+            animals = animals.filter(breed_id=breed_id)
+        if animal_type_id:
+            animals = animals.filter(animal_type_id=animal_type_id)
+        if animal_status:
+            animals = animals.filter(status=animal_status)
+        animals = filter_intake(animals, group=group_id)
+
+        counts = dict(
+            animals.annotate(weight_band=index.as_case('current_weight'))
+            .values('weight_band').annotate(count=Count('pk')).values_list('weight_band', 'count')
+        )
+        return {
+            'categories': [
+                {
+                    'id': category.pk,
+                    'min_weight': category.min_weight,
+                    'max_weight': category.max_weight,
+                    'label': str(category),
+                    'count': counts.get(category.pk, 0),
+                }
+                for category in index.categories
+            ],
+            'unclassified': counts.get(index.UNCLASSIFIED, 0),
+            'unweighed': counts.get(index.UNWEIGHED, 0),
+            'total': sum(counts.values()),
+        }
+
+@contextmanager
+def inventory_transaction(batch=False):
+    """
+    Run a write and its inventory movements atomically, reporting stock errors
+    as a 400. With `batch` the movements are coalesced, see InventoryLedger.batch.
+    """
+    try:
+        with InventoryLedger.batch() if batch else transaction.atomic():
+            yield
+    except InsufficientInventoryError as e:
+        raise serializers.ValidationError({'inventory': e.messages})
+
+class InventoryRecordMixin:
+    """Production records whose writes book inventory movements through signals."""
+
+    def perform_create(self, serializer):
+        with inventory_transaction(batch=True):
+            serializer.save()
+
+    def perform_update(self, serializer):
+        with inventory_transaction(batch=True):
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with inventory_transaction(batch=True):
+            instance.delete()
+
+    BULK_MAX_SIZE = 500
+    bulk_serializer_class = None
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """
+        Create a list of records at once, e.g. replayed by a client that was
+        offline. Valid items are inserted together and reported in `created`,
+        the others in `errors` by their index in the list: 201 when every item
+        was created, 207 when some were, 400 when none was.
+        """
+        if not isinstance(request.data, list):
+            return Response({'detail': 'Expected a list of records.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.BULK_MAX_SIZE:
+            return Response(
+                {'detail': f'Ensure this list has no more than {self.BULK_MAX_SIZE} records.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # One serializer for the whole list, so related ids are resolved once each
+        serializer = self.bulk_serializer_class(context=self.get_serializer_context())
+        model = serializer.Meta.model
+        farm_ids = None if request.user.is_superuser else AccessSet.request_farm_ids(request)
+        records, indexes, errors = [], [], {}
+        for index, item in enumerate(request.data):
+            try:
+                data = serializer.run_validation(item)
+            except serializers.ValidationError as e:
+                errors[index] = e.detail
+                continue
+            data['farm'] = data.get('farm') or getattr(request, 'current_farm', None)
+            if data['farm'] is None:
+                errors[index] = {'farm': ['This field is required.']}
+                continue
+            if farm_ids is not None and data['farm'].pk not in farm_ids:
+                errors[index] = {'farm': ['You do not have access to this farm.']}
+                continue
+            records.append(model(**data, created_by=request.user))
+            indexes.append(index)
+        if not records:
+            return Response({'created': [], 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with inventory_transaction(batch=True):
+            records = model.objects.bulk_create(records, batch_size=500)
+            # bulk_create sends no post_save: book the inventory, roll up and invalidate here
+            for record in records:
+                InventoryLedger.sync_record(record, created=True)
+            source = DailyStatsService.sources[model]
+            DailyStatsService.apply(source.buckets(model.objects.filter(pk__in=[record.pk for record in records])))
+            SearchIndex.index(records)
+            for farm_id in {record.farm_id for record in records}:
+                transaction.on_commit(lambda farm_id=farm_id: ReportCache.bump_version(farm_id))
+
+        return Response({
+            'created': [{'index': index, 'id': record.pk} for index, record in zip(indexes, records)],
+            'errors': errors,
+        }, status=status.HTTP_207_MULTI_STATUS if errors else status.HTTP_201_CREATED)
+
+class BirthRecordViewSet(SparseFieldsMixin, InventoryRecordMixin, viewsets.ModelViewSet):
     queryset = BirthRecord.objects.all()
     serializer_class = BirthRecordSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    bulk_serializer_class = BirthRecordBulkSerializer
+    field_sources = {'total_born': ['number_of_male', 'number_of_female', 'number_of_died']}
+    expandable_fields = {'animal': AnimalCompactSerializer, 'sire': AnimalCompactSerializer, 'animal_group': AnimalGroupSerializer}
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_class = BirthRecordFilter
-    search_fields = ['notes', 'animal_type__name', 'breed__name']
+    search_fields = ['notes']
     ordering_fields = ['date_of_birth', 'animal_type__name', 'breed__name', 'number_of_male', 'number_of_female']
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = '-date_of_birth'
+    cursor_ordering_fields = ['date_of_birth']
 
-class AcquisitionRecordViewSet(viewsets.ModelViewSet):
+class AcquisitionRecordViewSet(SparseFieldsMixin, InventoryRecordMixin, viewsets.ModelViewSet):
     queryset = AcquisitionRecord.objects.all()
     serializer_class = AcquisitionRecordSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    bulk_serializer_class = AcquisitionRecordBulkSerializer
+    field_sources = {'total_cost': ['unit_preis', 'quantity']}
+    expandable_fields = {'animal': AnimalCompactSerializer, 'animal_group': AnimalGroupSerializer}
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_class = AcquisitionRecordFilter
     search_fields = ['notes', 'vendor', 'receipt_number']
     ordering_fields = ['date_of_acquisition', 'animal_type__name', 'breed__name', 'quantity']
     permission_classes = [IsAuthenticated]
     
-class DiedRecordViewSet(viewsets.ModelViewSet):
+class DiedRecordViewSet(SparseFieldsMixin, InventoryRecordMixin, viewsets.ModelViewSet):
     queryset = DiedRecord.objects.all()
     serializer_class = DiedRecordSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    bulk_serializer_class = DiedRecordBulkSerializer
+    expandable_fields = {'animal': AnimalCompactSerializer, 'animal_group': AnimalGroupSerializer}
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_class = DiedRecordFilter
-    search_fields = ['notes', 'cause', 'animal_type__name', 'breed__name']
+    search_fields = ['notes', 'cause']
     ordering_fields = ['date_of_death', 'animal_type__name', 'breed__name', 'quantity']
     permission_classes = [IsAuthenticated]
 
-class AnimalInventoryViewSet(viewsets.ModelViewSet):
+class AnimalInventoryViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = AnimalInventory.objects.all()
     serializer_class = AnimalInventorySerializer
+    expandable_fields = {'animal_type': AnimalTypeSerializer, 'breed': AnimalBreedSerializer, 'farm': FarmSerializer}
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = AnimalInventoryFilter
     search_fields = ['animal_type__name', 'breed__name']
     ordering_fields = ['animal_type__name', 'breed__name', 'quantity']
     permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        as_of = self.get_as_of()
+        if as_of and self.action == 'list':
+            # Balances at the end of `as_of`, rebuilt from checkpoints and the movement ledger
+            queryset = InventoryLedger.annotate_as_of(queryset, as_of)
+        return queryset
+
+    def get_as_of(self):
+        value = self.request.query_params.get('as_of')
+        if not value:
+            return None
+        try:
+            as_of = parse_date(value)
+        except ValueError:
+            as_of = None
+        if not as_of:
+            raise serializers.ValidationError({'as_of': 'Expected a date (YYYY-MM-DD).'})
+        return as_of
+
+    # Manual quantity edits are booked as adjustments so the ledger stays the source of truth
+
+    def perform_create(self, serializer):
+        quantity = serializer.validated_data.pop('quantity', 0)
+        with inventory_transaction():
+            inventory = serializer.save(quantity=0)
+            if quantity:
+                InventoryLedger.record(
+                    inventory.farm_id, inventory.animal_type_id, inventory.breed_id, quantity,
+                    'adjustment', date.today(), created_by_id=self.request.user.id
+                )
+            inventory.refresh_from_db(fields=['quantity'])
+
+    def perform_update(self, serializer):
+        # Only the quantity can change (see AnimalInventorySerializer.validate)
+        quantity = serializer.validated_data.get('quantity')
+        with inventory_transaction():
+            inventory = AnimalInventory.objects.select_for_update().get(pk=serializer.instance.pk)
+            if quantity is not None and quantity != inventory.quantity:
+                InventoryLedger.record(
+                    inventory.farm_id, inventory.animal_type_id, inventory.breed_id, quantity - inventory.quantity,
+                    'adjustment', date.today(), created_by_id=self.request.user.id
+                )
+            serializer.instance.refresh_from_db(fields=['quantity'])
+
+    def perform_destroy(self, instance):
+        with inventory_transaction():
+            if instance.quantity:
+                InventoryLedger.record(
+                    instance.farm_id, instance.animal_type_id, instance.breed_id, -instance.quantity,
+                    'adjustment', date.today(), created_by_id=self.request.user.id
+                )
+            instance.delete()
     
-class AnimalViewSet(viewsets.ModelViewSet):
+class AnimalViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = AnimalSerializer
+    field_sources = {'qr_code': [], 'weight_category': ['current_weight'], 'created_by': ['created_by__username']}
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['farm', 'animal_type', 'breed', 'status']
     search_fields = ['tracking_id']
     ordering_fields = ['tracking_id', 'date_of_birth', 'current_weight']
     ordering = ['id']
+    pagination_class = KeysetPagination
+    cursor_ordering = 'id'
+    cursor_ordering_fields = ['id', 'tracking_id']
 
     def get_queryset(self):
+        if self.is_compact():
+            # Related objects are described once per page, see list()
+            return Animal.objects.all().order_by('id')
         # Précharger relations pour éviter les N+1
         return Animal.objects.select_related(
-            'animal_type', 'breed', 'farm'
-        ).all().order_by('id')  # ⚠️ ordre nécessaire pour éviter UnorderedObjectListWarning
\ No newline at end of file
+            'animal_type', 'breed__animal_type', 'farm', 'created_by'
+        ).prefetch_related(
+            'animal_type__farms', 'breed__farms'
+        ).all().order_by('id')  # ⚠️ ordre nécessaire pour éviter UnorderedObjectListWarning
+
+    @action(detail=False, methods=['get'])
+    def scan(self, request):
+        """
+        Minimal payload for scanner handhelds: `?tracking_id=` resolves a tag
+        of the user's farms exactly, `?prefix=` lists up to `limit` tags of the current farm
+        starting with it.
+        """
+        farm_id = getattr(request, 'current_farm_id', None)
+        tracking_id = request.query_params.get('tracking_id')
+        if tracking_id:
+            # Without a current farm, any of the user's farms (every farm for superusers)
+            if farm_id:
+                farm_ids = {farm_id}
+            else:
+                farm_ids = None if request.user.is_superuser else AccessSet.request_farm_ids(request)
+            animal = TagLookup.exact(tracking_id)
+            if animal is None or (farm_ids is not None and animal['farm'] not in farm_ids):
+                return Response({'detail': 'Unknown tag.'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(animal)
+
+        prefix = request.query_params.get('prefix')
+        if not prefix:
+            return Response({'detail': "Provide 'tracking_id' or 'prefix'."}, status=status.HTTP_400_BAD_REQUEST)
+        if not farm_id:
+            return Response({'detail': 'Prefix lookups require a farm (X-Farm-ID).'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(int(request.query_params.get('limit', 10)), 1)
+        except ValueError:
+            return Response({'limit': 'Expected an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(TagLookup.prefix(prefix, farm_id=farm_id, limit=limit))
+
+    def get_pedigree_depth(self):
+        try:
+            depth = int(self.request.query_params.get('depth', Pedigree.DEFAULT_DEPTH))
+        except ValueError:
+            raise serializers.ValidationError({'depth': 'Expected an integer.'})
+        if not 1 <= depth <= Pedigree.MAX_DEPTH:
+            raise serializers.ValidationError({'depth': f'Must be between 1 and {Pedigree.MAX_DEPTH}.'})
+        return depth
+
+    @action(detail=True, methods=['get'])
+    def ancestors(self, request, pk=None):
+        """Dams and sires up to `depth` generations, in one query."""
+        animal, depth = self.get_object(), self.get_pedigree_depth()
+        return Response({'animal': animal.pk, 'depth': depth, 'animals': Pedigree.ancestors([animal.pk], depth)})
+
+    @action(detail=True, methods=['get'])
+    def descendants(self, request, pk=None):
+        """Offspring up to `depth` generations, in one query."""
+        animal, depth = self.get_object(), self.get_pedigree_depth()
+        return Response({'animal': animal.pk, 'depth': depth, 'animals': Pedigree.descendants([animal.pk], depth)})
+
+    @action(detail=True, methods=['get'])
+    def inbreeding(self, request, pk=None):
+        """
+        Inbreeding coefficient of the animal, or with `?mate=<id>` the one of
+        the offspring it would have with that mate.
+        """
+        animal, depth = self.get_object(), self.get_pedigree_depth()
+        mate_id = request.query_params.get('mate')
+        if not mate_id:
+            return Response({'animal': animal.pk, 'depth': depth, 'inbreeding': Pedigree.inbreeding(animal.pk, depth)})
+
+        mate = Animal.objects.filter(pk=mate_id).first() if mate_id.isdigit() else None
+        if mate is None or mate.pk == animal.pk:
+            return Response({'mate': 'Unknown animal.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'animal': animal.pk,
+            'mate': mate.pk,
+            'depth': depth,
+            'offspring_inbreeding': Pedigree.coancestry(animal.pk, mate.pk, depth),
+        })
+
+    def is_compact(self):
+        return self.action == 'list' and self.request.query_params.get('representation') == 'compact'
+
+    def get_serializer_class(self):
+        if self.is_compact():
+            return AnimalCompactSerializer
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        """
+        `?representation=compact` returns flat rows with related ids, plus
+        `lookups` describing each referenced type, breed and farm once per page.
+        """
+        if not self.is_compact():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        animals = list(page if page is not None else queryset)
+        serializer = self.get_serializer(animals, many=True)
+        if page is not None:
+            response = self.get_paginated_response(serializer.data)
+        else:
+            response = Response({'results': serializer.data})
+        response.data['lookups'] = AnimalCompactSerializer.get_lookups(
+            animals, self.get_serializer_context(), serializer.child.fields
+        )
+        response.data['qr_code_url'] = unquote(request.build_absolute_uri(reverse('animal-qr-code', args=['{id}'])))
+        return response
+
+    BULK_MAX_SIZE = 1000
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """
+        Register a list of animals in one insert. QR codes are rendered in the
+        background afterwards; poll the returned job for their progress.
+        """
+        serializer = AnimalBulkCreateSerializer(
+            data=request.data, many=True, max_length=self.BULK_MAX_SIZE, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            animals = serializer.save()
+            ids = [animal.pk for animal in animals]
+            job_id = QRCodeJobs.enqueue(ids)
+            # bulk_create sends no post_save, so invalidate the reports here
+            for farm_id in {animal.farm_id for animal in animals}:
+                transaction.on_commit(lambda farm_id=farm_id: ReportCache.bump_version(farm_id))
+
+        return Response({
+            'ids': ids,
+            'qr_code_job': QRCodeJobs.get_state(job_id),
+            'qr_code_job_url': request.build_absolute_uri(f'{job_id}/'),
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path=r'bulk/(?P<job_id>[0-9a-f]{32})')
+    def bulk_job(self, request, job_id=None):
+        state = QRCodeJobs.get_state(job_id)
+        if state is None:
+            return Response({'detail': 'Unknown or expired job.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(state)
+
+    @action(detail=True, methods=['get'], url_path='qr-code')
+    def qr_code(self, request, pk=None):
+        """QR code of the animal as `?type=png` (default) or `?type=svg`, rendered once then cached."""
+        image_type = request.query_params.get('type', 'png')
+        if image_type not in QRCodeRenderer.CONTENT_TYPES:
+            return Response(
+                {'type': f"Must be one of: {', '.join(QRCodeRenderer.CONTENT_TYPES)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        animal = self.get_object()
+
+        # The content address is a strong validator, no need to render to answer a revalidation
+        data = QRCodeRenderer.animal_data(animal.pk)
+        etag = quote_etag(QRCodeRenderer.digest(data, image_type))
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            _, content = QRCodeRenderer.get(data, image_type)
+            response = HttpResponse(content, content_type=QRCodeRenderer.CONTENT_TYPES[image_type])
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, max_age=60 * 60 * 24 * 365, immutable=True)
+        return response
+
+    LABELS_MAX_SIZE = 5000
+
+    @action(detail=False, methods=['get'], url_path='qr-labels')
+    def qr_labels(self, request):
+        """
+        PDF sheet of QR labels for the filtered animals (same filters as the list,
+        plus `group` and `created_since`), laid out for label paper.
+        """
+        since = request.query_params.get('created_since')
+        if since:
+            try:
+                since = parse_date(since)
+            except ValueError:
+                since = None
+            if not since:
+                return Response({'created_since': 'Expected a date (YYYY-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+        group = request.query_params.get('group')
+        if group and not group.isdigit():
+            return Response({'group': 'Expected an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = filter_intake(self.filter_queryset(self.get_queryset()), group, since)
+        if queryset.count() > self.LABELS_MAX_SIZE:
+            return Response(
+                {'detail': f"At most {self.LABELS_MAX_SIZE} labels per sheet, narrow the filters."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Drawn while the response is sent, each page as soon as it is ready
+        response = StreamingHttpResponse(LabelSheet.stream(queryset), content_type='application/pdf')
+        response['Content-Disposition'] = content_disposition_header(True, 'qr_labels.pdf')
+        return response
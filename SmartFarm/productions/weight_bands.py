@@ -0,0 +1,67 @@
+import bisect
+from django.db.models import Case, IntegerField, Value, When
+
+from productions.models import WeightCategory
+from utilities.cache import bump_version, get_version
+
+
+class WeightCategoryIndex:
+    """
+    Sorted in-memory index of the WeightCategory intervals.
+
+    Categories do not overlap, so sorted on their lower bound they can be
+    searched by bisecting those bounds: the category with the greatest lower
+    bound not above the weight wins, provided the weight does not exceed its
+    upper bound. Bounds are inclusive and may be shared, in which case the
+    upper category wins: with 0-10 and 10-20 a weight of 10 falls in 10-20.
+    Every process rebuilds its index once the shared version, bumped by the
+    WeightCategory signals, has moved.
+    """
+
+    VERSION_KEY = 'productions:weight-categories:version'
+    # Histogram buckets of the animals outside every category
+    UNWEIGHED = -1
+    UNCLASSIFIED = 0
+
+    _current = None
+
+    def __init__(self, categories, version=None):
+        self.categories = sorted(categories, key=lambda category: (category.min_weight, category.max_weight))
+        self.lower_bounds = [category.min_weight for category in self.categories]
+        self.version = version
+
+    @classmethod
+    def invalidate(cls):
+        bump_version(cls.VERSION_KEY)
+        cls._current = None
+
+    @classmethod
+    def current(cls):
+        """The index of the categories as of the shared version, rebuilt when it moved."""
+        version = get_version(cls.VERSION_KEY)
+        index = cls._current
+        if index is None or index.version != version:
+            index = cls(WeightCategory.objects.all(), version)
+            cls._current = index
+        return index
+
+    def classify(self, weight):
+        if weight is None:
+            return None
+        position = bisect.bisect_right(self.lower_bounds, weight) - 1
+        if position >= 0 and weight <= self.categories[position].max_weight:
+            return self.categories[position]
+        return None
+
+    def as_case(self, field='current_weight'):
+        """
+        SQL counterpart of `classify`, yielding the category id, UNWEIGHED or
+        UNCLASSIFIED. CASE keeps the first match, hence the greatest lower
+        bound first.
+        """
+        whens = [When(**{f'{field}__isnull': True}, then=Value(self.UNWEIGHED))]
+        whens += [
+            When(**{f'{field}__gte': category.min_weight, f'{field}__lte': category.max_weight}, then=Value(category.pk))
+            for category in reversed(self.categories)
+        ]
+        return Case(*whens, default=Value(self.UNCLASSIFIED), output_field=IntegerField())
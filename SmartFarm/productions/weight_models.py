@@ -0,0 +1,58 @@
+from datetime import date
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+from account.models import Farm
+from productions.models import Animal, AnimalGroup
+from productions.scanning import TagLookup
+
+class WeighSession(models.Model):
+    """A batch of scale readings taken together, typically a whole pen."""
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='weigh_sessions')
+    animal_group = models.ForeignKey(AnimalGroup, null=True, blank=True, on_delete=models.SET_NULL, related_name='weigh_sessions')
+    date = models.DateField(default=date.today)
+    notes = models.TextField(blank=True, null=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['farm', 'date']),
+        ]
+
+    def __str__(self):
+        return f"Weigh session {self.date} ({self.farm})"
+
+class WeightRecord(models.Model):
+    """One weighing of one animal; Animal.current_weight mirrors the latest."""
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='weight_records')
+    animal = models.ForeignKey(Animal, on_delete=models.CASCADE, related_name='weight_records')
+    session = models.ForeignKey(WeighSession, null=True, blank=True, on_delete=models.CASCADE, related_name='records')
+    date = models.DateField(default=date.today)
+    weight = models.FloatField()
+
+    class Meta:
+        ordering = ['animal', 'date']
+        indexes = [
+            models.Index(fields=['animal', 'date']),
+            # Keyset pagination, see utilities.pagination.KeysetPagination
+            models.Index(fields=['farm', 'date', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.animal.tracking_id}: {self.weight} kg on {self.date}"
+
+    @staticmethod
+    def refresh_current_weights(animal_ids):
+        """Mirror the latest remaining reading of each animal, after readings were edited or removed."""
+        latest = WeightRecord.objects.filter(animal=OuterRef('pk')).order_by('-date', '-id')
+        Animal.objects.filter(Exists(latest), pk__in=animal_ids).update(
+            current_weight=Subquery(latest.values('weight')[:1]),
+            last_weigh_date=Subquery(latest.values('date')[:1]),
+            updated_at=timezone.now(),
+        )
+        tags = list(Animal.objects.filter(pk__in=animal_ids).values_list('tracking_id', flat=True))
+        if tags:
+            transaction.on_commit(lambda: TagLookup.invalidate(*tags))
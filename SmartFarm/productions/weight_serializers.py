@@ -0,0 +1,137 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from account.access import AccessSet
+from productions.models import Animal
+from productions.scanning import TagLookup
+from productions.serializers import FarmRelatedSerializer
+from productions.weight_models import WeighSession, WeightRecord
+from reports.services.cache_service import ReportCache
+
+def mirror_weight(animal, weight, day):
+    """Copy a reading onto the animal unless a later weighing is already recorded."""
+    if animal.last_weigh_date and animal.last_weigh_date > day:
+        return False
+    animal.current_weight = weight
+    animal.last_weigh_date = day
+    if animal.initial_weight is None:
+        animal.initial_weight = weight
+    animal.updated_at = timezone.now()
+    return True
+
+
+class WeightRecordSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WeightRecord
+        fields = ['id', 'animal', 'session', 'date', 'weight', 'farm']
+        read_only_fields = ['session', 'farm']
+
+    def validate_animal(self, animal):
+        request = self.context.get('request')
+        current_farm_id = getattr(request, 'current_farm_id', None)
+        if current_farm_id:
+            allowed = animal.farm_id == current_farm_id
+        else:
+            allowed = request is None or request.user.is_superuser or animal.farm_id in AccessSet.request_farm_ids(request)
+        if not allowed:
+            raise serializers.ValidationError("Unknown animal on this farm.")
+        return animal
+
+    def create(self, validated_data):
+        animal = validated_data['animal']
+        validated_data['farm'] = animal.farm
+        with transaction.atomic():
+            record = super().create(validated_data)
+            if mirror_weight(animal, record.weight, record.date):
+                animal.save(update_fields=['current_weight', 'last_weigh_date', 'initial_weight', 'updated_at'])
+        return record
+
+    def update(self, instance, validated_data):
+        previous_animal_id = instance.animal_id
+        if 'animal' in validated_data:
+            validated_data['farm'] = validated_data['animal'].farm
+        with transaction.atomic():
+            record = super().update(instance, validated_data)
+            # A reading moved to another animal changes the latest weight of both
+            WeightRecord.refresh_current_weights({previous_animal_id, record.animal_id})
+        return record
+
+
+class ScaleReadingSerializer(serializers.Serializer):
+    """A reading identifies the animal by id or by tracking id (ear tag, RFID)."""
+    animal = serializers.IntegerField(required=False)
+    tracking_id = serializers.CharField(required=False)
+    weight = serializers.FloatField(min_value=0.001)
+
+    def validate(self, data):
+        if ('animal' in data) == ('tracking_id' in data):
+            raise serializers.ValidationError("Provide either 'animal' or 'tracking_id'.")
+        return data
+
+
+class WeighSessionSerializer(FarmRelatedSerializer):
+    readings = ScaleReadingSerializer(many=True, write_only=True, max_length=2000, allow_empty=False)
+    records_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = WeighSession
+        fields = ['id', 'farm', 'animal_group', 'date', 'notes', 'readings', 'records_count', 'created_by', 'created_at']
+        read_only_fields = ['created_by', 'created_at']
+
+    def validate(self, data):
+        farm = data.get('farm') or getattr(self.context.get('request'), 'current_farm', None)
+        if farm is None:
+            raise serializers.ValidationError({'farm': "This field is required."})
+        data['farm'] = farm
+
+        # Resolve every reading in two queries whatever the session size
+        readings = data['readings']
+        ids = {reading['animal'] for reading in readings if 'animal' in reading}
+        tags = {reading['tracking_id'] for reading in readings if 'tracking_id' in reading}
+        animals = Animal.objects.filter(farm_id=farm.pk)
+        by_id = animals.in_bulk(ids) if ids else {}
+        by_tag = animals.in_bulk(tags, field_name='tracking_id') if tags else {}
+
+        errors, seen = {}, set()
+        for index, reading in enumerate(readings):
+            animal = by_id.get(reading['animal']) if 'animal' in reading else by_tag.get(reading['tracking_id'])
+            if animal is None:
+                errors[index] = "Unknown animal on this farm."
+            elif animal.pk in seen:
+                errors[index] = "Animal weighed twice in the session."
+            else:
+                seen.add(animal.pk)
+                reading['instance'] = animal
+        if errors:
+            raise serializers.ValidationError({'readings': errors})
+        return data
+
+    def create(self, validated_data):
+        readings = validated_data.pop('readings')
+        with transaction.atomic():
+            session = WeighSession.objects.create(**validated_data)
+            WeightRecord.objects.bulk_create([
+                WeightRecord(
+                    farm=session.farm, animal=reading['instance'], session=session,
+                    date=session.date, weight=reading['weight']
+                )
+                for reading in readings
+            ], batch_size=500)
+
+            animals = [
+                reading['instance'] for reading in readings
+                if mirror_weight(reading['instance'], reading['weight'], session.date)
+            ]
+            Animal.objects.bulk_update(
+                animals, ['current_weight', 'last_weigh_date', 'initial_weight', 'updated_at'], batch_size=500
+            )
+            # bulk_update sends no post_save, so invalidate the reports and scans here
+            transaction.on_commit(lambda: ReportCache.bump_version(session.farm_id))
+            tags = [animal.tracking_id for animal in animals]
+            transaction.on_commit(lambda: TagLookup.invalidate(*tags))
+        return session
+
+    def get_records_count(self, obj):
+        count = getattr(obj, 'records_count', None)
+        return obj.records.count() if count is None else count
@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models import Count
+from rest_framework import mixins, viewsets
+from rest_framework.permissions import IsAuthenticated
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters
+
+from productions.weight_models import WeighSession, WeightRecord
+from productions.weight_serializers import WeighSessionSerializer, WeightRecordSerializer
+from reports.services.cache_service import ReportCache
+from utilities.pagination import KeysetPagination
+
+
+class FarmScopedMixin:
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_superuser:
+            return queryset
+        current_farm_id = getattr(self.request, 'current_farm_id', None)
+        if current_farm_id:
+            return queryset.filter(farm_id=current_farm_id)
+        return queryset.none()
+
+
+class WeighSessionViewSet(FarmScopedMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                          mixins.ListModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    POST a session with its `readings` ([{animal | tracking_id, weight}, ...]) to
+    record a whole pen at once. Sessions are not edited, delete and weigh again.
+    """
+    queryset = WeighSession.objects.annotate(records_count=Count('records'))
+    serializer_class = WeighSessionSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['farm', 'animal_group', 'date']
+    ordering_fields = ['date']
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            animal_ids = list(instance.records.values_list('animal_id', flat=True))
+            instance.delete()
+            WeightRecord.refresh_current_weights(animal_ids)
+            transaction.on_commit(lambda: ReportCache.bump_version(instance.farm_id))
+
+
+class WeightRecordViewSet(FarmScopedMixin, viewsets.ModelViewSet):
+    queryset = WeightRecord.objects.all()
+    serializer_class = WeightRecordSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = {'animal': ['exact'], 'session': ['exact'], 'date': ['gte', 'lte']}
+    ordering_fields = ['date', 'weight']
+    pagination_class = KeysetPagination
+    cursor_ordering = 'date'
+    cursor_ordering_fields = ['date']
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            WeightRecord.refresh_current_weights([instance.animal_id])
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from reports.models import Alert
+from reports.models import Alert, FarmDailyStats
 
 @admin.register(Alert)
 class AlertAdmin(admin.ModelAdmin):
@@ -7,4 +7,12 @@ class AlertAdmin(admin.ModelAdmin):
     list_filter = ('severity', 'is_resolved', 'farm')
     search_fields = ('message',)
     readonly_fields = ('created_at',)
-    autocomplete_fields = ('farm',)
\ No newline at end of file
+    autocomplete_fields = ('farm',)
+
+@admin.register(FarmDailyStats)
+class FarmDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('date', 'farm', 'animal_type', 'births', 'deaths', 'acquisitions', 'sales_total', 'expenses_total')
+    list_filter = ('farm', 'animal_type')
+    date_hierarchy = 'date'
+    readonly_fields = ('farm', 'date', 'animal_type', 'births', 'deaths', 'acquisitions',
+                       'acquisition_cost', 'sales_total', 'expenses_total')
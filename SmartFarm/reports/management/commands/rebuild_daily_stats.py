@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from account.models import Farm
+from reports.services.daily_stats_service import DailyStatsService
+
+class Command(BaseCommand):
+    help = 'Rebuild the FarmDailyStats rollup from the raw sale, expense and production records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farm', type=int, help='Only rebuild the rollup of this farm id')
+
+    def handle(self, *args, **options):
+        farm = None
+        if options['farm']:
+            farm = Farm.objects.filter(pk=options['farm']).first()
+            if not farm:
+                raise CommandError(f"Farm {options['farm']} does not exist.")
+
+        count = DailyStatsService.rebuild(farm)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} daily stats rows."))
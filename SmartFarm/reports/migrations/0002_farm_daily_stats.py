@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+        ('productions', '0001_initial'),
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FarmDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('births', models.IntegerField(default=0)),
+                ('deaths', models.IntegerField(default=0)),
+                ('acquisitions', models.IntegerField(default=0)),
+                ('acquisition_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sales_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expenses_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('animal_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='productions.animaltype')),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='account.farm')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['farm', 'date'], name='reports_far_farm_id_d5268f_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('animal_type__isnull', True)), fields=('farm', 'date'), name='unique_farm_daily_stats_without_type')],
+                'unique_together': {('farm', 'date', 'animal_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+from collections import defaultdict
+from django.db import migrations
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+
+SUBJECT_TYPE = ('animal__animal_type', 'animal_group__animal_type')
+
+# Rollup sources as of this migration, see reports.services.daily_stats_service
+SOURCES = [
+    ('productions', 'BirthRecord', 'date_of_birth', {'births': lambda: Sum(F('number_of_male') + F('number_of_female'))}, SUBJECT_TYPE),
+    ('productions', 'DiedRecord', 'date_of_death', {'deaths': lambda: Sum('quantity')}, SUBJECT_TYPE),
+    ('productions', 'AcquisitionRecord', 'date_of_acquisition', {
+        'acquisitions': lambda: Sum('quantity'),
+        'acquisition_cost': lambda: Sum(F('unit_preis') * F('quantity')),
+    }, SUBJECT_TYPE),
+    ('finance', 'Sale', 'sale_date', {'sales_total': lambda: Sum('total_amount')}, ()),
+    ('finance', 'Expense', 'date', {'expenses_total': lambda: Sum('amount')}, ('animal_type',)),
+]
+
+
+def seed_farm_daily_stats(apps, schema_editor):
+    # Roll up the records saved before the rollup existed
+    FarmDailyStats = apps.get_model('reports', 'FarmDailyStats')
+    totals = defaultdict(dict)
+    for app_label, model_name, date_field, aggregates, animal_type in SOURCES:
+        queryset = apps.get_model(app_label, model_name).objects.order_by()
+        group_by = ['farm_id', date_field]
+        if animal_type:
+            queryset = queryset.annotate(
+                bucket_type=Coalesce(*animal_type) if len(animal_type) > 1 else F(animal_type[0])
+            )
+            group_by.append('bucket_type')
+        rows = queryset.values(*group_by).annotate(**{column: aggregate() for column, aggregate in aggregates.items()})
+        for row in rows:
+            key = (row['farm_id'], row[date_field], row.get('bucket_type'))
+            totals[key].update({column: row[column] or 0 for column in aggregates})
+
+    FarmDailyStats.objects.all().delete()
+    FarmDailyStats.objects.bulk_create([
+        FarmDailyStats(farm_id=farm_id, date=day, animal_type_id=animal_type_id, **values)
+        for (farm_id, day, animal_type_id), values in totals.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_farm_daily_stats'),
+        ('productions', '0001_initial'),
+        ('finance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_farm_daily_stats, migrations.RunPython.noop),
+    ]
@@ -19,3 +19,33 @@ class Alert(models.Model):
 
     def __str__(self):
         return f"[{self.get_severity_display()}] {self.message[:50]}..."
+
+class FarmDailyStats(models.Model):
+    """Per-day rollup of production and finance records, maintained on write."""
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    animal_type = models.ForeignKey('productions.AnimalType', on_delete=models.CASCADE, null=True, blank=True, related_name='daily_stats')
+    births = models.IntegerField(default=0)
+    deaths = models.IntegerField(default=0)
+    acquisitions = models.IntegerField(default=0)
+    acquisition_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    sales_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expenses_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date']
+        unique_together = ('farm', 'date', 'animal_type')
+        constraints = [
+            # unique_together does not cover rows without an animal type (NULLs are distinct)
+            models.UniqueConstraint(
+                fields=['farm', 'date'],
+                condition=models.Q(animal_type__isnull=True),
+                name='unique_farm_daily_stats_without_type',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['farm', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.farm} - {self.date} ({self.animal_type or 'all types'})"
@@ -0,0 +1,53 @@
+# reports/services/cache_service.py
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+
+from utilities.cache import bump_version, get_version
+
+
+class ReportCache:
+    """
+    Response cache for report endpoints keyed on a per-farm data version.
+
+    Every write to a record feeding the reports bumps the version of its farm
+    (and the global version used by cross-farm reports), so cached entries are
+    never served once the underlying data changed. The versions must live in a
+    cache shared by every server process (file based or Redis, see CACHES),
+    or a bump would only outdate the entries of the process making it.
+    """
+
+    VERSION_KEY = 'reports:data-version:{}'
+    ALL_FARMS = 'all'
+
+    @staticmethod
+    def get_alias():
+        return getattr(settings, 'REPORTS_CACHE_ALIAS', 'default')
+
+    @classmethod
+    def get_cache(cls):
+        return caches[cls.get_alias()]
+
+    @classmethod
+    def get_version(cls, farm_id=None):
+        return get_version(cls.VERSION_KEY.format(farm_id or cls.ALL_FARMS), cls.get_alias())
+
+    @classmethod
+    def bump_version(cls, farm_id=None):
+        for key in {cls.ALL_FARMS, farm_id or cls.ALL_FARMS}:
+            bump_version(cls.VERSION_KEY.format(key), cls.get_alias())
+
+    @classmethod
+    def build_key(cls, name, farm_id, *parts):
+        raw = ':'.join(str(part) for part in (cls.get_version(farm_id),) + parts)
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        return f"reports:{name}:{farm_id or cls.ALL_FARMS}:{digest}"
+
+    @classmethod
+    def get_or_set(cls, key, compute):
+        cache = cls.get_cache()
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            cache.set(key, value, timeout=getattr(settings, 'REPORTS_CACHE_TIMEOUT', 60 * 60 * 24))
+        return value
@@ -0,0 +1,143 @@
+# reports/services/daily_stats_service.py
+from collections import defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+
+from finance.models import Expense
+from finance.sales_models import Sale
+from productions.models import AcquisitionRecord, BirthRecord, DiedRecord
+from reports.models import FarmDailyStats
+
+
+class RollupSource:
+    """
+    Describes how the rows of a record model contribute to FarmDailyStats.
+
+    `aggregates` maps rollup columns to aggregate expressions over the model,
+    `animal_type` lists the lookups resolving the animal type (the first non
+    null one wins), or is empty when the model is not type specific.
+    """
+
+    def __init__(self, model, date_field, aggregates, animal_type=()):
+        self.model = model
+        self.date_field = date_field
+        self.aggregates = aggregates
+        self.animal_type = animal_type
+
+    def buckets(self, queryset):
+        """Group `queryset` into {(farm_id, date, animal_type_id): {column: value}}."""
+        queryset = queryset.order_by()
+        group_by = ['farm_id', self.date_field]
+        if len(self.animal_type) > 1:
+            queryset = queryset.annotate(bucket_type=Coalesce(*self.animal_type))
+            group_by.append('bucket_type')
+        elif self.animal_type:
+            queryset = queryset.annotate(bucket_type=F(self.animal_type[0]))
+            group_by.append('bucket_type')
+
+        result = {}
+        for row in queryset.values(*group_by).annotate(**self.aggregates):
+            key = (row['farm_id'], row[self.date_field], row.get('bucket_type'))
+            result[key] = {column: row[column] or 0 for column in self.aggregates}
+        return result
+
+
+SUBJECT_TYPE = ('animal__animal_type', 'animal_group__animal_type')
+
+
+class DailyStatsService:
+    sources = {
+        BirthRecord: RollupSource(BirthRecord, 'date_of_birth', {
+            'births': Sum(F('number_of_male') + F('number_of_female')),
+        }, animal_type=SUBJECT_TYPE),
+        DiedRecord: RollupSource(DiedRecord, 'date_of_death', {
+            'deaths': Sum('quantity'),
+        }, animal_type=SUBJECT_TYPE),
+        AcquisitionRecord: RollupSource(AcquisitionRecord, 'date_of_acquisition', {
+            'acquisitions': Sum('quantity'),
+            'acquisition_cost': Sum(F('unit_preis') * F('quantity')),
+        }, animal_type=SUBJECT_TYPE),
+        Sale: RollupSource(Sale, 'sale_date', {
+            'sales_total': Sum('total_amount'),
+        }),
+        Expense: RollupSource(Expense, 'date', {
+            'expenses_total': Sum('amount'),
+        }, animal_type=('animal_type',)),
+    }
+
+    @classmethod
+    def contributions(cls, instance):
+        """Rollup contributions of a single saved record, read from the database."""
+        source = cls.sources[type(instance)]
+        return source.buckets(source.model.objects.filter(pk=instance.pk))
+
+    @classmethod
+    def apply(cls, contributions, previous=None):
+        """
+        Add `contributions` to the rollup, minus the `previous` contributions
+        of the same record when it is being updated or deleted.
+        """
+        changes = defaultdict(lambda: defaultdict(int))
+        for key, values in contributions.items():
+            for column, value in values.items():
+                changes[key][column] += value
+        for key, values in (previous or {}).items():
+            for column, value in values.items():
+                changes[key][column] -= value
+
+        with transaction.atomic():
+            for (farm_id, day, animal_type_id), values in changes.items():
+                values = {column: value for column, value in values.items() if value}
+                if values:
+                    cls._increment(farm_id, day, animal_type_id, values)
+
+    @classmethod
+    def _increment(cls, farm_id, day, animal_type_id, values):
+        lookup = {'farm_id': farm_id, 'date': day, 'animal_type_id': animal_type_id}
+        expressions = {column: F(column) + value for column, value in values.items()}
+        if FarmDailyStats.objects.filter(**lookup).update(**expressions):
+            return
+        # No row yet: the change alone would be wrong (negative for a delete), count the bucket from the records
+        values = cls.bucket(farm_id, day, animal_type_id)
+        if not any(values.values()):
+            return
+        try:
+            with transaction.atomic():
+                FarmDailyStats.objects.create(**lookup, **values)
+        except IntegrityError:
+            # Created concurrently in the meantime, with the records as they were then
+            FarmDailyStats.objects.filter(**lookup).update(**expressions)
+
+    @classmethod
+    def bucket(cls, farm_id, day, animal_type_id):
+        """Rollup columns of one (farm, day, animal type), recomputed from the records."""
+        values = {}
+        for source in cls.sources.values():
+            queryset = source.model.objects.filter(farm_id=farm_id, **{source.date_field: day})
+            values.update(dict.fromkeys(source.aggregates, 0))
+            values.update(source.buckets(queryset).get((farm_id, day, animal_type_id), {}))
+        return values
+
+    @classmethod
+    def rebuild(cls, farm=None):
+        """Recompute the whole rollup (or one farm's) from the raw record tables."""
+        totals = defaultdict(dict)
+        for source in cls.sources.values():
+            queryset = source.model.objects.all()
+            if farm:
+                queryset = queryset.filter(farm=farm)
+            for key, values in source.buckets(queryset).items():
+                totals[key].update(values)
+
+        rows = [
+            FarmDailyStats(farm_id=farm_id, date=day, animal_type_id=animal_type_id, **values)
+            for (farm_id, day, animal_type_id), values in totals.items()
+        ]
+        with transaction.atomic():
+            existing = FarmDailyStats.objects.all()
+            if farm:
+                existing = existing.filter(farm=farm)
+            existing.delete()
+            FarmDailyStats.objects.bulk_create(rows, batch_size=500)
+        return len(rows)
@@ -1,61 +1,239 @@
-from datetime import date
-from django.db.models import Sum
+from collections import defaultdict
+from datetime import date, timedelta
+from django.db.models import DateField, F, Q, Subquery, Sum, Value
+from django.db.models.functions import Trunc
+from django.utils.dateparse import parse_date
 
+from account.models import Farm
 from finance.models import Expense
 from finance.sales_models import Sale
+from productions.inventory import InventoryLedger
 from productions.models import DiedRecord, BirthRecord, AnimalInventory
+from reports.models import FarmDailyStats
+
+
+class Metric:
+    """
+    Declarative description of a dashboard metric.
+
+    Every metric is compiled to a scalar subquery so that the whole set is
+    collected in a single SELECT, whatever the number of metrics.
+    `animal_type` is either the lookup used to scope the metric to an animal
+    type, a callable returning a Q for a given type id, or None when the
+    metric is not type specific. Without a farm, `farm_ids` limits the
+    metric to those farms (None: every farm).
+    """
+
+    def __init__(self, name, model, aggregate, date_field=None, animal_type=None, internal=False):
+        self.name = name
+        self.model = model
+        self.aggregate = aggregate
+        self.date_field = date_field
+        self.animal_type = animal_type
+        self.internal = internal
+
+    def animal_type_q(self, animal_type_id):
+        if not (animal_type_id and self.animal_type):
+            return None
+        if callable(self.animal_type):
+            return self.animal_type(animal_type_id)
+        return Q(**{self.animal_type: animal_type_id})
+
+    def get_queryset(self, farm, start_date, end_date, animal_type_id, farm_ids=None):
+        queryset = self.model.objects.order_by()
+        if farm:
+            queryset = queryset.filter(farm_id=farm.pk)
+        elif farm_ids is not None:
+            queryset = queryset.filter(farm_id__in=farm_ids)
+        if self.date_field:
+            queryset = queryset.filter(**{f'{self.date_field}__range': [start_date, end_date]})
+        animal_type_q = self.animal_type_q(animal_type_id)
+        if animal_type_q:
+            queryset = queryset.filter(animal_type_q)
+        return queryset
+
+    def filtered_aggregate(self, animal_type_id):
+        """The aggregate with the animal type scoping moved into its FILTER clause."""
+        aggregate = self.aggregate.copy()
+        aggregate.filter = self.animal_type_q(animal_type_id)
+        return aggregate
+
+    def as_subquery(self, farm, start_date, end_date, animal_type_id, farm_ids=None):
+        # Grouping on a constant collapses the queryset into a single aggregate row.
+        queryset = self.get_queryset(farm, start_date, end_date, animal_type_id, farm_ids)
+        queryset = queryset.annotate(_group=Value(1)).values('_group').annotate(value=self.aggregate)
+        return Subquery(queryset.values('value'))
+
+
+class InventoryAsOfMetric(Metric):
+    """Inventory balance at the end of `as_of`, read back from the movement ledger."""
+
+    def __init__(self, name, as_of, animal_type=None, internal=False):
+        super().__init__(name, AnimalInventory, Sum('quantity_as_of'), animal_type=animal_type, internal=internal)
+        self.as_of = as_of
+
+    def get_queryset(self, farm, start_date, end_date, animal_type_id, farm_ids=None):
+        queryset = super().get_queryset(farm, start_date, end_date, animal_type_id, farm_ids)
+        return InventoryLedger.annotate_as_of(queryset, self.as_of)
+
+
+def bucket_starts(start_date, end_date, interval):
+    """Every bucket start between the two dates, matching Trunc(kind=interval)."""
+    if interval == 'month':
+        current = start_date.replace(day=1)
+    elif interval == 'week':
+        current = start_date - timedelta(days=start_date.weekday())
+    else:
+        current = start_date
+
+    while current <= end_date:
+        yield current
+        if interval == 'month':
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+        elif interval == 'week':
+            current += timedelta(days=7)
+        else:
+            current += timedelta(days=1)
+
+
+def subject_animal_type(animal_type_id):
+    """Records point at either an animal or a group, both carrying the animal type."""
+    return Q(animal__animal_type_id=animal_type_id) | Q(animal_group__animal_type_id=animal_type_id)
+
+
+def compute_profit(values):
+    return values['sales_total'] - values['expenses_total']
+
+
+def compute_mortality_rate(values):
+    total_base = values['total_animals'] + values['deaths']
+    return round(values['deaths'] / (total_base or 1), 4)
+
 
 class DashboardService:
+    # Ranges longer than this are read from the FarmDailyStats rollup.
+    ROLLUP_MIN_DAYS = 31
+
+    metrics = [
+        Metric('total_animals', AnimalInventory, Sum('quantity'), animal_type='animal_type_id'),
+        Metric('sales_total', Sale, Sum('total_amount'), date_field='sale_date'),
+        Metric('expenses_total', Expense, Sum('amount'), date_field='date'),
+        Metric('deaths', DiedRecord, Sum('quantity'), date_field='date_of_death',
+               animal_type=subject_animal_type, internal=True),
+        Metric('births', BirthRecord, Sum(F('number_of_male') + F('number_of_female')),
+               date_field='date_of_birth', animal_type=subject_animal_type),
+    ]
+
+    rollup_metrics = [
+        metrics[0],
+        Metric('sales_total', FarmDailyStats, Sum('sales_total'), date_field='date'),
+        Metric('expenses_total', FarmDailyStats, Sum('expenses_total'), date_field='date'),
+        Metric('deaths', FarmDailyStats, Sum('deaths'), date_field='date',
+               animal_type='animal_type_id', internal=True),
+        Metric('births', FarmDailyStats, Sum('births'), date_field='date', animal_type='animal_type_id'),
+    ]
+
+    SERIES_INTERVALS = ('day', 'week', 'month')
+
+    # Derived metrics are computed from the collected values, in this order.
+    derived_metrics = [
+        ('profit', compute_profit),
+        ('mortality_rate', compute_mortality_rate),
+    ]
+
+    @classmethod
+    def collect(cls, metrics, farm, start_date, end_date, animal_type_id=None, farm_ids=None):
+        """Evaluate `metrics` in one round trip and return a name -> value dict."""
+        # Any single farm row serves as carrier for the uncorrelated subqueries.
+        carrier = Farm.objects.filter(pk=farm.pk) if farm else Farm.objects.all()
+        rows = carrier.order_by().values(**{
+            metric.name: metric.as_subquery(farm, start_date, end_date, animal_type_id, farm_ids)
+            for metric in metrics
+        })[:1]
+        row = rows[0] if rows else {}
+        return {metric.name: row.get(metric.name) or 0 for metric in metrics}
+
+    @classmethod
+    def collect_series(cls, metrics, farm, start_date, end_date, animal_type_id, interval, farm_ids=None):
+        """
+        Evaluate dated `metrics` bucketed by `interval`, with one grouped query
+        per model, and return a bucket start -> name -> value dict.
+        """
+        families = defaultdict(list)
+        for metric in metrics:
+            if metric.date_field:
+                families[(metric.model, metric.date_field)].append(metric)
+
+        values = defaultdict(dict)
+        for (model, date_field), family in families.items():
+            queryset = family[0].get_queryset(farm, start_date, end_date, None, farm_ids)
+            queryset = queryset.annotate(
+                bucket=Trunc(date_field, interval, output_field=DateField())
+            ).values('bucket').annotate(**{
+                metric.name: metric.filtered_aggregate(animal_type_id) for metric in family
+            })
+            for row in queryset:
+                for metric in family:
+                    values[row['bucket']][metric.name] = row[metric.name] or 0
+        return values
+
+    @classmethod
+    def get_series(cls, farm, start_date=None, end_date=None, animal_type_id=None, interval='day', farm_ids=None):
+        start_date, end_date = cls.parse_range(start_date, end_date)
+        metrics = cls.get_source_metrics(start_date, end_date)
+        names = [metric.name for metric in metrics if metric.date_field]
+
+        values = cls.collect_series(metrics, farm, start_date, end_date, animal_type_id, interval, farm_ids)
+        series = []
+        for bucket in bucket_starts(start_date, end_date, interval):
+            point = {name: values.get(bucket, {}).get(name, 0) for name in names}
+            point['profit'] = compute_profit(point)
+            series.append({'period': bucket, **point})
+        return series
+
     @staticmethod
-    def get_metrics(farm, start_date=None, end_date=None, animal_type_id=None):
-        date_range = {}
-        if start_date and end_date:
-            date_range = {'date__range': [start_date, end_date]}
-        else:
-            today = date.today()
-            date_range = {'date__range': [today, today]}
-
-        filters = {'farm': farm} if farm else {}
-
-        # Inventory
-        inventory_qs = AnimalInventory.objects.filter(**filters)
-        if animal_type_id:
-            inventory_qs = inventory_qs.filter(animal_type_id=animal_type_id)
-        total_animals = inventory_qs.aggregate(total=Sum('quantity'))['total'] or 0
-
-        # Sales
-        sales_qs = Sale.objects.filter(**filters, sale_date__range=date_range['date__range'])
-        sales_total = sales_qs.aggregate(total=Sum('total_amount'))['total'] or 0
-
-        # Expenses
-        expenses_qs = Expense.objects.filter(**filters, date__range=date_range['date__range'])
-        expenses_total = expenses_qs.aggregate(total=Sum('amount'))['total'] or 0
-
-        # Profit
-        profit = sales_total - expenses_total
-
-        # Deaths
-        deaths_qs = DiedRecord.objects.filter(**filters, date_of_death__range=date_range['date__range'])
-        if animal_type_id:
-            deaths_qs = deaths_qs.filter(animal_type_id=animal_type_id)
-        deaths = deaths_qs.aggregate(total=Sum('quantity'))['total'] or 0
-
-        total_base = total_animals + deaths if total_animals + deaths else 1
-        mortality_rate = round(deaths / total_base, 4)
-
-        # Births
-        births_qs = BirthRecord.objects.filter(**filters, date_of_birth__range=date_range['date__range'])
-        if animal_type_id:
-            births_qs = births_qs.filter(animal_type_id=animal_type_id)
-        male = births_qs.aggregate(m=Sum('number_of_male'))['m'] or 0
-        female = births_qs.aggregate(f=Sum('number_of_female'))['f'] or 0
-        total_births = male + female
-
-        return {
-            'total_animals': total_animals,
-            'sales_total': sales_total,
-            'expenses_total': expenses_total,
-            'profit': profit,
-            'mortality_rate': mortality_rate,
-            'births': total_births
-        }
+    def parse_range(start_date, end_date):
+        if isinstance(start_date, str):
+            start_date = parse_date(start_date)
+        if isinstance(end_date, str):
+            end_date = parse_date(end_date)
+        if not (start_date and end_date):
+            start_date = end_date = date.today()
+        return start_date, end_date
+
+    @staticmethod
+    def resolve_as_of(as_of, end_date):
+        """
+        The day the inventory balance is read at: the explicit `as_of`, else the
+        end of a range lying in the past. None means the live balance.
+        """
+        if isinstance(as_of, str):
+            as_of = parse_date(as_of)
+        if not as_of and end_date < date.today():
+            as_of = end_date
+        if as_of and as_of >= date.today():
+            return None
+        return as_of
+
+    @classmethod
+    def get_source_metrics(cls, start_date, end_date, as_of=None):
+        metrics = cls.metrics
+        if (end_date - start_date).days >= cls.ROLLUP_MIN_DAYS:
+            metrics = cls.rollup_metrics
+        if as_of:
+            inventory = metrics[0]
+            metrics = [InventoryAsOfMetric(inventory.name, as_of, inventory.animal_type)] + metrics[1:]
+        return metrics
+
+    @classmethod
+    def get_metrics(cls, farm, start_date=None, end_date=None, animal_type_id=None, as_of=None, farm_ids=None):
+        start_date, end_date = cls.parse_range(start_date, end_date)
+        as_of = cls.resolve_as_of(as_of, end_date)
+        metrics = cls.get_source_metrics(start_date, end_date, as_of)
+
+        values = cls.collect(metrics, farm, start_date, end_date, animal_type_id, farm_ids)
+        for name, compute in cls.derived_metrics:
+            values[name] = compute(values)
+
+        public = [metric.name for metric in metrics if not metric.internal]
+        return {name: values[name] for name in public + [name for name, _ in cls.derived_metrics]}
@@ -0,0 +1,189 @@
+import numpy as np
+from django.db.models import Q
+
+from productions.models import Animal, AnimalBreed
+from productions.weight_models import WeightRecord
+
+
+def grouped_stats(groups, values, percentiles):
+    """
+    Percentiles of `values` within each group of `groups`, and the percentile
+    rank of every value in its group (share of the group strictly below it).
+
+    Both arrays are processed in one sort, whatever the number of groups.
+    Returns (unique groups, counts, percentile matrix, ranks in input order).
+    """
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    counts = np.diff(np.r_[starts, len(groups)])
+
+    # Linear interpolation between closest ranks, as np.percentile does
+    positions = starts[:, None] + np.asarray(percentiles) / 100 * (counts[:, None] - 1)
+    lower = np.floor(positions).astype(int)
+    upper = np.ceil(positions).astype(int)
+    table = values[lower] + (values[upper] - values[lower]) * (positions - lower)
+
+    # Ties share the rank of their first occurrence
+    index = np.arange(len(values))
+    first = np.r_[True, (values[1:] != values[:-1]) | (groups[1:] != groups[:-1])]
+    tie_start = np.maximum.accumulate(np.where(first, index, 0))
+    group_start = np.repeat(starts, counts)
+    group_count = np.repeat(counts, counts)
+    ranks = np.empty(len(values))
+    ranks[order] = 100 * (tie_start - group_start) / group_count
+    return groups[starts], counts, table, ranks
+
+
+def to_number(value, digits=3):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+class GrowthService:
+    """
+    Growth analytics over the weighing history: average daily gain (ADG),
+    weight-for-age percentile curves per breed, and the animals falling behind
+    their breed.
+
+    Readings are loaded as plain columns with `values_list` and processed as
+    NumPy arrays, so the cost is a single query plus a few sorts whatever the
+    herd size.
+    """
+
+    PERCENTILES = (10, 25, 50, 75, 90)
+    DEFAULT_BIN_DAYS = 30
+    DEFAULT_THRESHOLD = 10
+    DEFAULT_LIMIT = 50
+    # Smaller cohorts give meaningless percentiles, their animals are not ranked
+    MIN_COHORT_SIZE = 5
+
+    @staticmethod
+    def get_queryset(farm=None, breed_id=None, group_id=None):
+        queryset = WeightRecord.objects.filter(animal__status__in=['active', 'quarantine']).order_by()
+        if farm:
+            queryset = queryset.filter(farm_id=farm.pk)
+        if breed_id:
+            queryset = queryset.filter(animal__breed_id=breed_id)
+        if group_id:
+            queryset = queryset.filter(
+                Q(animal__birth_record__animal_group_id=group_id)
+                | Q(animal__acquisition_record__animal_group_id=group_id)
+            )
+        return queryset
+
+    @staticmethod
+    def load(queryset):
+        """Readings as arrays, sorted by animal then date."""
+        rows = list(queryset.values_list('animal_id', 'animal__breed_id', 'animal__date_of_birth', 'date', 'weight'))
+        if not rows:
+            return None
+        animal_ids, breed_ids, births, dates, weights = zip(*rows)
+        data = {
+            'animal': np.array(animal_ids, dtype=np.int64),
+            'breed': np.array(breed_ids, dtype=np.int64),
+            'birth': np.array(births, dtype='datetime64[D]'),
+            'date': np.array(dates, dtype='datetime64[D]'),
+            'weight': np.array(weights, dtype=np.float64),
+        }
+        order = np.lexsort((data['date'], data['animal']))
+        return {name: column[order] for name, column in data.items()}
+
+    @classmethod
+    def get_report(cls, farm=None, breed_id=None, group_id=None, bin_days=DEFAULT_BIN_DAYS,
+                   threshold=DEFAULT_THRESHOLD, limit=DEFAULT_LIMIT):
+        data = cls.load(cls.get_queryset(farm, breed_id, group_id))
+        if data is None:
+            return {'animals': 0, 'readings': 0, 'breeds': [], 'poor_performers': []}
+
+        # First and last reading of every animal
+        animal = data['animal']
+        first = np.flatnonzero(np.r_[True, animal[1:] != animal[:-1]])
+        last = np.r_[first[1:] - 1, len(animal) - 1]
+        days = (data['date'][last] - data['date'][first]).astype(np.int64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            adg = np.where(days > 0, (data['weight'][last] - data['weight'][first]) / days, np.nan)
+        breed = data['breed'][first]
+
+        # Weight for age, in age bands of `bin_days`
+        valid = ~np.isnat(data['birth'])
+        age = np.where(valid, (data['date'] - data['birth']).astype(np.int64), -1)
+        valid &= age >= 0
+        band = age // bin_days
+        bands = int(band.max()) + 1 if valid.any() else 1
+        cohort = data['breed'] * bands + band
+
+        ranks = np.full(len(animal), np.nan)
+        curves = {}
+        if valid.any():
+            cohorts, counts, table, valid_ranks = grouped_stats(cohort[valid], data['weight'][valid], cls.PERCENTILES)
+            small = np.isin(cohort[valid], cohorts[counts < cls.MIN_COHORT_SIZE])
+            ranks[valid] = np.where(small, np.nan, valid_ranks)
+            for code, count, row in zip(cohorts.tolist(), counts.tolist(), table):
+                curves.setdefault(code // bands, []).append(dict(
+                    age_days=(code % bands) * bin_days, readings=count,
+                    **{f'p{q}': to_number(value) for q, value in zip(cls.PERCENTILES, row)}
+                ))
+
+        # ADG rank within the breed
+        adg_ranks = np.full(len(first), np.nan)
+        measured = ~np.isnan(adg)
+        breed_stats = {}
+        if measured.any():
+            breeds, counts, table, measured_ranks = grouped_stats(breed[measured], adg[measured], cls.PERCENTILES)
+            small = np.isin(breed[measured], breeds[counts < cls.MIN_COHORT_SIZE])
+            adg_ranks[measured] = np.where(small, np.nan, measured_ranks)
+            breed_stats = dict(zip(breeds.tolist(), table))
+
+        names = dict(AnimalBreed.objects.filter(pk__in=np.unique(breed).tolist()).values_list('pk', 'name'))
+        breed_rows = []
+        for breed_pk in np.unique(breed).tolist():
+            in_breed = breed == breed_pk
+            gains = adg[in_breed & measured]
+            breed_rows.append({
+                'breed_id': breed_pk,
+                'breed': names.get(breed_pk),
+                'animals': int(in_breed.sum()),
+                'readings': int((data['breed'] == breed_pk).sum()),
+                'average_daily_gain': dict(
+                    mean=to_number(gains.mean()) if len(gains) else None,
+                    **{f'p{q}': to_number(value) for q, value in zip(cls.PERCENTILES, breed_stats.get(breed_pk, []))}
+                ),
+                'curve': curves.get(breed_pk, []),
+            })
+
+        return {
+            'animals': len(first),
+            'readings': len(animal),
+            'bin_days': bin_days,
+            'average_daily_gain': to_number(np.nanmean(adg)) if measured.any() else None,
+            'breeds': breed_rows,
+            'poor_performers': cls.poor_performers(data, first, last, age, adg, ranks, adg_ranks, threshold, limit),
+        }
+
+    @staticmethod
+    def poor_performers(data, first, last, age, adg, ranks, adg_ranks, threshold, limit):
+        """Animals whose latest weight for age or whose ADG ranks below `threshold` in their breed."""
+        weight_ranks = ranks[last]
+        with np.errstate(invalid='ignore'):
+            score = np.fmin(weight_ranks, adg_ranks)
+            flagged = np.flatnonzero(score < threshold)
+        flagged = flagged[np.argsort(score[flagged], kind='stable')][:limit]
+        if not len(flagged):
+            return []
+
+        animal_ids = data['animal'][first][flagged].tolist()
+        tracking_ids = dict(Animal.objects.filter(pk__in=animal_ids).values_list('pk', 'tracking_id'))
+        return [
+            {
+                'animal_id': animal_id,
+                'tracking_id': tracking_ids.get(animal_id),
+                'breed_id': int(data['breed'][last[index]]),
+                'age_days': int(age[last[index]]) if age[last[index]] >= 0 else None,
+                'weight': to_number(data['weight'][last[index]]),
+                'last_weigh_date': data['date'][last[index]].item(),
+                'weight_percentile': to_number(weight_ranks[index], 1),
+                'average_daily_gain': to_number(adg[index]),
+                'average_daily_gain_percentile': to_number(adg_ranks[index], 1),
+            }
+            for animal_id, index in zip(animal_ids, flagged.tolist())
+        ]
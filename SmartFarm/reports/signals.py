@@ -0,0 +1,54 @@
+# reports/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from finance.models import Expense
+from finance.sales_models import Sale
+from productions.models import AcquisitionRecord, Animal, AnimalInventory, BirthRecord, DiedRecord, InventoryMovement
+from productions.weight_models import WeightRecord
+from reports.services.cache_service import ReportCache
+from reports.services.daily_stats_service import DailyStatsService
+
+# Models whose writes change what the dashboard and report endpoints return
+REPORT_SOURCES = [
+    Animal, AnimalInventory, InventoryMovement, BirthRecord, AcquisitionRecord, DiedRecord, WeightRecord, Sale, Expense
+]
+
+
+def remember_daily_stats_contributions(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding:
+        instance._daily_stats_previous = DailyStatsService.contributions(instance)
+
+
+def update_daily_stats_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        previous = getattr(instance, '_daily_stats_previous', None)
+        instance._daily_stats_previous = None
+        DailyStatsService.apply(DailyStatsService.contributions(instance), previous)
+
+
+def remember_daily_stats_on_delete(sender, instance, **kwargs):
+    instance._daily_stats_previous = DailyStatsService.contributions(instance)
+
+
+def update_daily_stats_on_delete(sender, instance, **kwargs):
+    DailyStatsService.apply({}, getattr(instance, '_daily_stats_previous', None))
+
+
+for model in DailyStatsService.sources:
+    pre_save.connect(remember_daily_stats_contributions, sender=model)
+    post_save.connect(update_daily_stats_on_save, sender=model)
+    pre_delete.connect(remember_daily_stats_on_delete, sender=model)
+    post_delete.connect(update_daily_stats_on_delete, sender=model)
+
+
+def bump_report_cache_version(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # After commit, so a concurrent request cannot cache pre-commit data under the new version
+        farm_id = instance.farm_id
+        transaction.on_commit(lambda: ReportCache.bump_version(farm_id))
+
+
+for model in REPORT_SOURCES:
+    post_save.connect(bump_report_cache_version, sender=model)
+    post_delete.connect(bump_report_cache_version, sender=model)
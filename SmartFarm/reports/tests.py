@@ -1,3 +1,336 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+import numpy as np
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from account.models import CustomUser, Farm, FarmUser
+from account.serializers import CustomTokenObtainPairSerializer
+from finance.models import Expense, ExpenseCategory
+from finance.sales_models import Sale
+from productions.models import Animal, AnimalBreed, AnimalGroup, AnimalType, BirthRecord, DiedRecord
+from productions.weight_models import WeightRecord
+from reports.models import FarmDailyStats
+from reports.services.cache_service import ReportCache
+from reports.services.daily_stats_service import DailyStatsService
+from reports.services.dashboard_service import DashboardService
+from reports.services.growth_service import GrowthService, grouped_stats
+
+ADDRESS = dict(street='1 rue des Baobabs', city='Thiès', postal_code='21000', country_name='Sénégal', country_code='SN')
+# Versions and cached responses stay out of the development cache
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'reports-tests'}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReportsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('fermier', password='secret', **ADDRESS)
+        cls.farm = Farm.objects.create(name='Ferme', owner=cls.user, **ADDRESS)
+        FarmUser.objects.create(farm=cls.farm, user=cls.user)
+        cls.goat = AnimalType.objects.create(name='Goat')
+        cls.boer = AnimalBreed.objects.create(name='Boer', animal_type=cls.goat)
+        cls.group = AnimalGroup.objects.create(
+            animal_type=cls.goat, breed=cls.boer, quantity=10, location='Enclos', farm=cls.farm
+        )
+        cls.category = ExpenseCategory.objects.create(name='Feed')
+
+    def setUp(self):
+        cache.clear()
+
+    def jwt_client(self, farm=None):
+        """A client holding the user's JWT, working in `farm` when given."""
+        # The memberships moved the version the token is checked against
+        self.user.refresh_from_db()
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {CustomTokenObtainPairSerializer.get_token(self.user).access_token}'}
+        if farm is not None:
+            headers['HTTP_X_FARM_ID'] = str(farm.pk)
+        client = APIClient()
+        client.credentials(**headers)
+        return client
+
+    def add_birth(self, males=2, females=1, farm=None):
+        return BirthRecord.objects.create(
+            animal_group=self.group, number_of_male=males, number_of_female=females, farm=farm or self.farm
+        )
+
+    def add_death(self, quantity=1):
+        return DiedRecord.objects.create(animal_group=self.group, quantity=quantity, weight=20, farm=self.farm)
+
+    def add_sale(self, amount, invoice_number='F-1'):
+        return Sale.objects.create(farm=self.farm, invoice_number=invoice_number, total_amount=Decimal(amount))
+
+    def add_expense(self, amount, day=None):
+        return Expense.objects.create(
+            farm=self.farm, category=self.category, amount=Decimal(amount), created_by=self.user,
+            animal_type=self.goat, date=day or date.today()
+        )
+
+
+class DashboardMetricsTests(ReportsTestCase):
+    def test_metrics_are_collected_in_one_query(self):
+        self.add_birth()
+        self.add_death()
+        self.add_sale('500')
+        self.add_expense('200')
+
+        with self.assertNumQueries(1):
+            metrics = DashboardService.get_metrics(self.farm)
+
+        self.assertEqual(metrics['total_animals'], 2)
+        self.assertEqual(metrics['births'], 3)
+        self.assertEqual(metrics['sales_total'], Decimal('500'))
+        self.assertEqual(metrics['expenses_total'], Decimal('200'))
+        self.assertEqual(metrics['profit'], Decimal('300'))
+        self.assertEqual(metrics['mortality_rate'], round(1 / 3, 4))
+        self.assertNotIn('deaths', metrics)
+
+    def test_metrics_are_scoped_to_the_farm_and_animal_type(self):
+        other_farm = Farm.objects.create(name='Autre', **ADDRESS)
+        other_group = AnimalGroup.objects.create(
+            animal_type=self.goat, breed=self.boer, quantity=5, location='Enclos', farm=other_farm
+        )
+        BirthRecord.objects.create(animal_group=other_group, number_of_male=4, farm=other_farm)
+        self.add_birth()
+        sheep = AnimalType.objects.create(name='Sheep')
+
+        self.assertEqual(DashboardService.get_metrics(self.farm)['births'], 3)
+        self.assertEqual(DashboardService.get_metrics(None)['births'], 7)
+        self.assertEqual(DashboardService.get_metrics(self.farm, animal_type_id=sheep.pk)['births'], 0)
+
+    def test_endpoint_without_a_farm_covers_the_user_farms_only(self):
+        other_farm = Farm.objects.create(name='Autre', **ADDRESS)
+        Sale.objects.create(farm=other_farm, invoice_number='F-9', total_amount=Decimal('900'))
+        self.add_sale('500')
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        self.assertEqual(client.get('/api/feed/dashboard-metrics/').json()['sales_total'], 500)
+        response = client.get('/api/feed/dashboard-metrics/', {'export': 'csv'})
+        self.assertIn('Sales total,500', response.content.decode())
+        admin = CustomUser.objects.create_superuser('admin', password='secret', **ADDRESS)
+        client.force_authenticate(admin)
+        self.assertEqual(client.get('/api/feed/dashboard-metrics/').json()['sales_total'], 1400)
+
+
+class DailyStatsTests(ReportsTestCase):
+    def rollup(self):
+        return {
+            (row.date, row.animal_type_id): (row.births, row.deaths, row.sales_total, row.expenses_total)
+            for row in FarmDailyStats.objects.filter(farm=self.farm)
+        }
+
+    def test_rollup_follows_saves_updates_and_deletes(self):
+        birth = self.add_birth()
+        self.add_sale('500')
+        expense = self.add_expense('200')
+        today = date.today()
+
+        self.assertEqual(self.rollup(), {
+            (today, self.goat.pk): (3, 0, 0, Decimal('200')),
+            (today, None): (0, 0, Decimal('500'), 0),
+        })
+
+        birth.number_of_female = 4
+        birth.save()
+        expense.delete()
+        self.assertEqual(self.rollup()[today, self.goat.pk], (6, 0, 0, 0))
+
+    def test_rollup_matches_a_rebuild(self):
+        self.add_birth()
+        self.add_death()
+        self.add_sale('500')
+        self.add_expense('120')
+        self.add_expense('80', day=date(2024, 3, 1))
+        maintained = self.rollup()
+
+        DailyStatsService.rebuild(self.farm)
+        self.assertEqual(self.rollup(), maintained)
+
+    def test_missing_bucket_is_recounted_from_the_records(self):
+        first = self.add_birth()
+        self.add_birth(males=1, females=0)
+        FarmDailyStats.objects.all().delete()
+
+        # A delete alone would book -3 births
+        first.delete()
+        self.assertEqual(self.rollup(), {(date.today(), self.goat.pk): (1, 0, 0, 0)})
+
+    def test_long_ranges_read_the_rollup(self):
+        self.add_birth()
+        self.add_expense('200')
+        start = date.today().replace(day=1) - timedelta(days=90)
+
+        long_range = DashboardService.get_metrics(self.farm, start, date.today())
+        FarmDailyStats.objects.all().delete()
+        short_range = DashboardService.get_metrics(self.farm)
+
+        self.assertEqual((long_range['births'], long_range['expenses_total']), (3, Decimal('200')))
+        self.assertEqual((short_range['births'], short_range['expenses_total']), (3, Decimal('200')))
+        self.assertEqual(DashboardService.get_metrics(self.farm, start, date.today())['births'], 0)
+
+
+class ReportCacheTests(ReportsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def births(self):
+        return self.client.get('/api/feed/dashboard-metrics/').json()['births']
+
+    def test_responses_are_cached_until_a_write_commits(self):
+        self.add_birth()
+        self.assertEqual(self.births(), 3)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.add_birth(males=1, females=0)
+        # Not committed yet: the cached response is still served
+        self.assertEqual(self.births(), 3)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.births(), 4)
+
+    def test_a_write_outdates_its_farm_and_the_cross_farm_reports_only(self):
+        other_farm = Farm.objects.create(name='Autre', **ADDRESS)
+        versions = lambda: [ReportCache.get_version(farm_id) for farm_id in (self.farm.pk, other_farm.pk, None)]
+        before = versions()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_sale('500')
+
+        after = versions()
+        self.assertNotEqual(after[0], before[0])
+        self.assertEqual(after[1], before[1])
+        self.assertNotEqual(after[2], before[2])
+
+    def test_a_cleared_version_is_not_reused(self):
+        version = ReportCache.get_version(self.farm.pk)
+        ReportCache.bump_version(self.farm.pk)
+        cache.delete(ReportCache.VERSION_KEY.format(self.farm.pk))
+        self.assertNotIn(ReportCache.get_version(self.farm.pk), (version, version + 1))
+
+
+class DashboardSeriesTests(ReportsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_every_bucket_is_listed_with_missing_ones_at_zero(self):
+        self.add_expense('200', day=date(2024, 3, 2))
+        self.add_expense('50', day=date(2024, 3, 4))
+
+        series = DashboardService.get_series(self.farm, date(2024, 3, 1), date(2024, 3, 4))
+
+        self.assertEqual([point['period'] for point in series], [date(2024, 3, day) for day in range(1, 5)])
+        self.assertEqual([point['expenses_total'] for point in series], [0, Decimal('200'), 0, Decimal('50')])
+        self.assertEqual(series[1]['profit'], Decimal('-200'))
+
+    def test_weeks_and_months_start_like_trunc(self):
+        # Monday 2024-03-04 and Monday 2024-03-11
+        self.add_expense('200', day=date(2024, 3, 6))
+        self.add_expense('50', day=date(2024, 3, 11))
+
+        weeks = DashboardService.get_series(self.farm, date(2024, 3, 6), date(2024, 3, 12), interval='week')
+        months = DashboardService.get_series(self.farm, date(2024, 2, 15), date(2024, 3, 31), interval='month')
+
+        self.assertEqual([(point['period'], point['expenses_total']) for point in weeks], [
+            (date(2024, 3, 4), Decimal('200')), (date(2024, 3, 11), Decimal('50')),
+        ])
+        self.assertEqual([(point['period'], point['expenses_total']) for point in months], [
+            (date(2024, 2, 1), 0), (date(2024, 3, 1), Decimal('250')),
+        ])
+
+    def test_endpoint_picks_the_interval_and_rejects_bad_ranges(self):
+        response = self.client.get('/api/feed/dashboard-series/', {'start_date': '2024-01-01', 'end_date': '2024-06-30'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['interval'], 'month')
+
+        response = self.client.get('/api/feed/dashboard-series/', {'interval': 'hour'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/feed/dashboard-series/', {'start_date': '2024-03-02', 'end_date': '2024-03-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_endpoint_without_a_farm_covers_the_user_farms_only(self):
+        other_farm = Farm.objects.create(name='Autre', **ADDRESS)
+        Expense.objects.create(
+            farm=other_farm, category=self.category, amount=Decimal('900'), created_by=self.user, date=date(2024, 3, 1)
+        )
+        self.add_expense('200', day=date(2024, 3, 1))
+
+        response = self.client.get('/api/feed/dashboard-series/', {'start_date': '2024-03-01', 'end_date': '2024-03-01'})
+        self.assertEqual(response.json()['series'][0]['expenses_total'], 200)
+        series = DashboardService.get_series(None, date(2024, 3, 1), date(2024, 3, 1), farm_ids=[])
+        self.assertEqual(series[0]['expenses_total'], 0)
+
+
+class GrowthReportTests(ReportsTestCase):
+    def add_animal(self, tracking_id, readings, born=date(2024, 1, 1)):
+        animal = Animal.objects.create(
+            tracking_id=tracking_id, animal_type=self.goat, breed=self.boer, gender='Male',
+            date_of_birth=born, farm=self.farm
+        )
+        WeightRecord.objects.bulk_create([
+            WeightRecord(farm=self.farm, animal=animal, date=day, weight=weight) for day, weight in readings
+        ])
+        return animal
+
+    def test_grouped_stats_match_numpy_per_group(self):
+        rng = np.random.default_rng(7)
+        groups = rng.integers(0, 4, 200)
+        values = rng.normal(30, 5, 200).round(1)
+
+        uniques, counts, table, ranks = grouped_stats(groups, values, GrowthService.PERCENTILES)
+
+        for group, count, row in zip(uniques, counts, table):
+            in_group = values[groups == group]
+            self.assertEqual(count, len(in_group))
+            np.testing.assert_allclose(row, np.percentile(in_group, GrowthService.PERCENTILES))
+        for index in range(0, 200, 17):
+            in_group = values[groups == groups[index]]
+            self.assertAlmostEqual(ranks[index], 100 * (in_group < values[index]).sum() / len(in_group))
+
+    def test_average_daily_gain_and_poor_performers(self):
+        for index in range(5):
+            self.add_animal(f'G-{index}', [(date(2024, 3, 1), 10), (date(2024, 3, 31), 16 + index / 10)])
+        laggard = self.add_animal('G-9', [(date(2024, 3, 1), 10), (date(2024, 3, 31), 11)])
+
+        report = GrowthService.get_report(self.farm)
+
+        self.assertEqual((report['animals'], report['readings']), (6, 12))
+        gains = report['breeds'][0]['average_daily_gain']
+        self.assertEqual(gains['p50'], round(6.15 / 30, 3))
+        self.assertEqual([row['animal_id'] for row in report['poor_performers']], [laggard.pk])
+        self.assertEqual(report['poor_performers'][0]['average_daily_gain'], round(1 / 30, 3))
+
+    def test_small_cohorts_are_not_ranked(self):
+        self.add_animal('G-1', [(date(2024, 3, 1), 10), (date(2024, 3, 31), 16)])
+        self.add_animal('G-2', [(date(2024, 3, 1), 10), (date(2024, 3, 31), 11)])
+        self.assertEqual(GrowthService.get_report(self.farm)['poor_performers'], [])
+
+    def test_endpoint_validates_its_parameters(self):
+        client = self.jwt_client(self.farm)
+        self.assertEqual(client.get('/api/feed/growth/').json()['animals'], 0)
+        response = client.get('/api/feed/growth/', {'bin_days': '0', 'threshold': 'low'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.json()), ['bin_days', 'threshold'])
+
+    def test_members_only_see_their_farm(self):
+        self.add_animal('G-1', [(date(2024, 3, 1), 10), (date(2024, 3, 31), 16)])
+        other_farm = Farm.objects.create(name='Autre', owner=self.user, **ADDRESS)
+        stranger = Animal.objects.create(
+            tracking_id='O-1', animal_type=self.goat, breed=self.boer, gender='Male', date_of_birth=date(2024, 1, 1),
+            farm=other_farm
+        )
+        WeightRecord.objects.bulk_create([
+            WeightRecord(farm=other_farm, animal=stranger, date=date(2024, 3, 1), weight=10),
+            WeightRecord(farm=other_farm, animal=stranger, date=date(2024, 3, 31), weight=11),
+        ])
+        self.assertEqual(GrowthService.get_report()['animals'], 2)
+
+        response = self.jwt_client().get('/api/feed/growth/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.jwt_client(self.farm).get('/api/feed/growth/').json()['animals'], 1)
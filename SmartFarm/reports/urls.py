@@ -1,7 +1,8 @@
 from django.urls import path
 
 from reports.views.alerts import AlertViewSet
-from reports.views.dashboard import DashboardMetricsView
+from reports.views.dashboard import DashboardMetricsView, DashboardSeriesView
+from reports.views.growth import GrowthReportView
 from reports.views.user_activity import UserActivityReportView
 from rest_framework.routers import DefaultRouter
 
@@ -10,5 +11,7 @@ router.register(r'alerts', AlertViewSet, basename='alert')
 
 urlpatterns = [
     path('dashboard-metrics/', DashboardMetricsView.as_view(), name='dashboard-metrics'),
+    path('dashboard-series/', DashboardSeriesView.as_view(), name='dashboard-series'),
+    path('growth/', GrowthReportView.as_view(), name='growth-report'),
     path('user-activity/', UserActivityReportView.as_view(), name='user-activity-report'),
 ]+ router.urls
\ No newline at end of file
@@ -9,8 +9,8 @@ class AlertViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        current_farm = getattr(self.request, 'current_farm', None)
+        current_farm_id = getattr(self.request, 'current_farm_id', None)
         queryset = Alert.objects.all()
-        if not user.is_superuser and current_farm:
-            queryset = queryset.filter(farm=current_farm)
+        if not user.is_superuser and current_farm_id:
+            queryset = queryset.filter(farm_id=current_farm_id)
         return queryset
\ No newline at end of file
@@ -1,80 +1,123 @@
 from datetime import date, timedelta
-from django.db.models import Sum, Count, Q
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.http import HttpResponse
+from django.utils.dateparse import parse_date
 import csv
-from io import BytesIO
+from io import BytesIO, StringIO
 from reportlab.pdfgen import canvas
 
+from account.access import AccessSet
+from reports.services.cache_service import ReportCache
 from reports.services.dashboard_service import DashboardService
 
+def parse_date_param(request, name):
+    """The `name` query param as a date, None when absent; a 400 when it is not a valid date."""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        # Well formed but impossible, e.g. 2024-02-30
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: 'Expected a date (YYYY-MM-DD).'})
+    return parsed
+
+def report_farm_ids(request, farm):
+    """The farms a report without a current farm covers: the user's, None (every farm) for superusers."""
+    if farm or request.user.is_superuser:
+        return None
+    return sorted(AccessSet.request_farm_ids(request))
+
+def get_date_range(request):
+    """Resolve the `start_date`/`end_date` or `period` (week, month, year) query params."""
+    start_date = parse_date_param(request, 'start_date')
+    end_date = parse_date_param(request, 'end_date')
+    period = request.query_params.get('period')  # week, month, year
+
+    if not start_date or not end_date:
+        today = date.today()
+        if period == 'week':
+            start_date = today - timedelta(days=today.weekday())
+            end_date = today
+        elif period == 'month':
+            start_date = today.replace(day=1)
+            end_date = today
+        elif period == 'year':
+            start_date = today.replace(month=1, day=1)
+            end_date = today
+        else:
+            start_date = end_date = today
+
+    return start_date, end_date
+
 class DashboardMetricsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        user = request.user
         current_farm = getattr(request, 'current_farm', None)
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-        period = request.query_params.get('period')  # week, month, year
+        start_date, end_date = get_date_range(request)
         animal_type_id = request.query_params.get('animal_type_id')
-
-        if not start_date or not end_date:
-            today = date.today()
-            if period == 'week':
-                start_date = today - timedelta(days=today.weekday())
-                end_date = today
-            elif period == 'month':
-                start_date = today.replace(day=1)
-                end_date = today
-            elif period == 'year':
-                start_date = today.replace(month=1, day=1)
-                end_date = today
-            else:
-                start_date = end_date = today
+        as_of = parse_date_param(request, 'as_of')
+        farm_ids = report_farm_ids(request, current_farm)
 
         export_format = request.query_params.get('export')
         if export_format == 'csv':
-            return self.export_csv(current_farm, start_date, end_date, animal_type_id)
+            return self.export_csv(current_farm, start_date, end_date, animal_type_id, as_of, farm_ids)
         elif export_format == 'pdf':
-            return self.export_pdf(current_farm, start_date, end_date, animal_type_id)
+            return self.export_pdf(current_farm, start_date, end_date, animal_type_id, as_of, farm_ids)
 
-        metrics = DashboardService.get_metrics(
-            farm=current_farm,
-            start_date=start_date,
-            end_date=end_date,
-            animal_type_id=animal_type_id
-        )
+        metrics = self.get_metrics(current_farm, start_date, end_date, animal_type_id, as_of, farm_ids)
         return Response(metrics)
 
-    def export_csv(self, farm, start_date, end_date, animal_type_id):
-        metrics = DashboardService.get_metrics(
+    def get_metrics(self, farm, start_date, end_date, animal_type_id, as_of=None, farm_ids=None):
+        farm_id = farm.id if farm else None
+        key = ReportCache.build_key('dashboard', farm_id, start_date, end_date, animal_type_id, as_of, farm_ids)
+        return ReportCache.get_or_set(key, lambda: DashboardService.get_metrics(
             farm=farm,
             start_date=start_date,
             end_date=end_date,
-            animal_type_id=animal_type_id
+            animal_type_id=animal_type_id,
+            as_of=as_of,
+            farm_ids=farm_ids
+        ))
+
+    def export_csv(self, farm, start_date, end_date, animal_type_id, as_of=None, farm_ids=None):
+        farm_id = farm.id if farm else None
+        key = ReportCache.build_key('dashboard-csv', farm_id, start_date, end_date, animal_type_id, as_of, farm_ids)
+        content = ReportCache.get_or_set(
+            key, lambda: self.render_csv(self.get_metrics(farm, start_date, end_date, animal_type_id, as_of, farm_ids))
         )
 
-        response = HttpResponse(content_type='text/csv')
+        response = HttpResponse(content, content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename="dashboard_metrics.csv"'
+        return response
 
-        writer = csv.writer(response)
+    def render_csv(self, metrics):
+        buffer = StringIO()
+        writer = csv.writer(buffer)
         writer.writerow(['Metric', 'Value'])
         for key, value in metrics.items():
             writer.writerow([key.replace('_', ' ').capitalize(), value])
+        return buffer.getvalue()
 
-        return response
-
-    def export_pdf(self, farm, start_date, end_date, animal_type_id):
-        metrics = DashboardService.get_metrics(
-            farm=farm,
-            start_date=start_date,
-            end_date=end_date,
-            animal_type_id=animal_type_id
+    def export_pdf(self, farm, start_date, end_date, animal_type_id, as_of=None, farm_ids=None):
+        farm_id = farm.id if farm else None
+        key = ReportCache.build_key('dashboard-pdf', farm_id, start_date, end_date, animal_type_id, as_of, farm_ids)
+        content = ReportCache.get_or_set(
+            key, lambda: self.render_pdf(self.get_metrics(farm, start_date, end_date, animal_type_id, as_of, farm_ids))
         )
 
+        response = HttpResponse(content, content_type='application/pdf')
+        response['Content-Disposition'] = 'attachment; filename="dashboard_metrics.pdf"'
+        return response
+
+    def render_pdf(self, metrics):
         buffer = BytesIO()
         p = canvas.Canvas(buffer)
         p.setFont("Helvetica-Bold", 14)
@@ -88,8 +131,50 @@ class DashboardMetricsView(APIView):
 
         p.showPage()
         p.save()
+        return buffer.getvalue()
 
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="dashboard_metrics.pdf"'
-        return response
+
+class DashboardSeriesView(APIView):
+    """Dashboard metrics bucketed by day, week or month, for charts."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        current_farm = getattr(request, 'current_farm', None)
+        start_date, end_date = DashboardService.parse_range(*get_date_range(request))
+        animal_type_id = request.query_params.get('animal_type_id')
+        interval = request.query_params.get('interval') or self.default_interval(start_date, end_date)
+
+        if interval not in DashboardService.SERIES_INTERVALS:
+            return Response(
+                {'interval': f"Must be one of: {', '.join(DashboardService.SERIES_INTERVALS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start_date > end_date:
+            return Response({'start_date': 'Must not be after end_date.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        farm_id = current_farm.id if current_farm else None
+        farm_ids = report_farm_ids(request, current_farm)
+        key = ReportCache.build_key('dashboard-series', farm_id, start_date, end_date, animal_type_id, interval, farm_ids)
+        series = ReportCache.get_or_set(key, lambda: DashboardService.get_series(
+            farm=current_farm,
+            start_date=start_date,
+            end_date=end_date,
+            animal_type_id=animal_type_id,
+            interval=interval,
+            farm_ids=farm_ids
+        ))
+        return Response({
+            'interval': interval,
+            'start_date': start_date,
+            'end_date': end_date,
+            'series': series,
+        })
+
+    @staticmethod
+    def default_interval(start_date, end_date):
+        days = (end_date - start_date).days
+        if days <= 31:
+            return 'day'
+        if days <= 92:
+            return 'week'
+        return 'month'
@@ -0,0 +1,51 @@
+from rest_framework import status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+
+from reports.services.cache_service import ReportCache
+from reports.services.growth_service import GrowthService
+
+
+class GrowthReportView(APIView):
+    """
+    Average daily gain, weight-for-age curves per breed and poor performers,
+    for the current farm, optionally narrowed to a `breed_id` or `group_id`.
+    Only superusers may omit the farm, for a report of every farm.
+    Cached until the farm's data version moves, i.e. until new weights arrive.
+    """
+    permission_classes = [IsAuthenticated]
+
+    PARAMS = {
+        'breed_id': (None, 1, None),
+        'group_id': (None, 1, None),
+        'bin_days': (GrowthService.DEFAULT_BIN_DAYS, 1, 365),
+        'threshold': (GrowthService.DEFAULT_THRESHOLD, 0, 100),
+        'limit': (GrowthService.DEFAULT_LIMIT, 0, 1000),
+    }
+
+    def get(self, request, *args, **kwargs):
+        current_farm = getattr(request, 'current_farm', None)
+        params, errors = {}, {}
+        for name, (default, minimum, maximum) in self.PARAMS.items():
+            value = request.query_params.get(name)
+            if not value:
+                params[name] = default
+                continue
+            try:
+                params[name] = int(value)
+                if params[name] < minimum or (maximum is not None and params[name] > maximum):
+                    raise ValueError
+            except ValueError:
+                bounds = f"between {minimum} and {maximum}" if maximum is not None else f"at least {minimum}"
+                errors[name] = f"Expected an integer {bounds}."
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        if current_farm is None and not request.user.is_superuser:
+            # Without a farm the report covers every farm, for superusers only
+            return Response({'detail': 'The growth report requires a farm (X-Farm-ID).'}, status=status.HTTP_400_BAD_REQUEST)
+
+        farm_id = current_farm.id if current_farm else None
+        key = ReportCache.build_key('growth', farm_id, *params.values())
+        report = ReportCache.get_or_set(key, lambda: GrowthService.get_report(farm=current_farm, **params))
+        return Response(report)
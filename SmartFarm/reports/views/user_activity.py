@@ -1,5 +1,4 @@
 from datetime import date, timedelta
-from django.conf import settings
 from django.contrib.auth import get_user_model
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -10,6 +9,7 @@ from finance.sales_models import Sale
 from productions.models import Animal
 from finance.models import Expense
 from productions.models import BirthRecord, DiedRecord
+from reports.services.cache_service import ReportCache
 
 class UserActivityReportView(APIView):
     permission_classes = [IsAuthenticated]
@@ -18,7 +18,7 @@ class UserActivityReportView(APIView):
         user_id = request.query_params.get("user_id")
         period = request.query_params.get("period", "month")  # default to month
 
-        user = get_object_or_404(settings.AUTH_USER_MODEL, id=user_id)
+        user = get_object_or_404(get_user_model(), id=user_id)
         today = date.today()
 
         if period == "week":
@@ -28,9 +28,15 @@ class UserActivityReportView(APIView):
         else:  # default to month
             start_date = today.replace(day=1)
 
+        # The report spans every farm, hence the global data version
+        key = ReportCache.build_key('user-activity', None, user.pk, user.username, user.last_login, start_date)
+        report = ReportCache.get_or_set(key, lambda: self.build_report(user, start_date))
+        return Response(report)
+
+    def build_report(self, user, start_date):
         date_filter = {"created_at__gte": start_date}
 
-        report = {
+        return {
             "user": user.username,
             "animals_created": Animal.objects.filter(created_by=user, **date_filter).count(),
             "sales_recorded": Sale.objects.filter(created_by=user, **date_filter).count(),
@@ -39,5 +45,3 @@ class UserActivityReportView(APIView):
             "death_records": DiedRecord.objects.filter(created_by=user, **date_filter).count(),
             "last_login": user.last_login
         }
-
-        return Response(report)
@@ -85,14 +85,14 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # Enable JWT authentication
+        'account.authentication.MembershipJWTAuthentication',  # JWT, refused once the farm claims are outdated
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',  # Require authentication by default
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
-        'rest_framework.filters.SearchFilter',
+        'utilities.search.IndexedSearchFilter',  # Full-text index for the indexed models
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -158,6 +158,39 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The default cache MUST be shared by every server process: the report cache,
+# weight band index, tag lookups, access sets and lookup tables are outdated by
+# bumping a version in it, and a bump in a per-process cache (LocMemCache) only
+# reaches the process that made it. The file cache below is shared by the
+# processes of one host; use Redis, whose incr is atomic, across hosts:
+#   'django.core.cache.backends.redis.RedisCache' with 'LOCATION': 'redis://127.0.0.1:6379'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    # Content-addressed QR code images, see productions.qr.QRCodeRenderer
+    'qr_codes': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'smartfarm-qr-codes',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+REPORTS_CACHE_ALIAS = 'default'
+REPORTS_CACHE_TIMEOUT = 60 * 60 * 24  # Versioned keys never go stale, this only bounds memory
+
+# Threads warming QR codes for animals registered in bulk (per server process)
+QR_CODE_WORKERS = 2
+QR_CODE_CACHE_ALIAS = 'qr_codes'
+QR_CODE_CACHE_TIMEOUT = None  # Entries are immutable, eviction only bounds memory
+QR_LABEL_WORKERS = None  # Processes rendering QR label sheets, defaults to the CPU count
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
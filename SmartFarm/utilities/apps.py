@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class UtilitiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'utilities'
+
+    def ready(self):
+        from utilities.lookups import LookupTable
+        from utilities.search import SearchIndex
+        LookupTable.register_defaults()
+        SearchIndex.register_defaults()
@@ -0,0 +1,101 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import caches
+
+
+def get_version(key, alias='default'):
+    """The shared version counter `key` of the `alias` cache, created on first read."""
+    cache = caches[alias]
+    version = cache.get(key)
+    if version is None:
+        # Seed from the nanosecond clock so an evicted counter never reuses an old version
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key, alias='default'):
+    """Move the shared version counter `key`, outdating whatever was keyed on it."""
+    cache = caches[alias]
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+class VersionedLRUCache:
+    """
+    Small in-process LRU cache for hot rows, flushed in every process when its
+    shared version moves.
+
+    Lookups cost one read of the shared versions (the cache's and the key's)
+    instead of a database query. Writers call `invalidate(*keys)` once their
+    transaction has committed, which outdates those keys only, or
+    `invalidate()` to flush every key; a value computed while a write was in
+    flight is stored under the versions read before computing it, so it is
+    dropped by the next lookup.
+    """
+
+    VERSION_KEY = 'lru:{}:version'
+    KEY_VERSION_KEY = 'lru:{}:key:{}:version'
+
+    def __init__(self, name, maxsize=1024, alias='default'):
+        self.name = name
+        self.version_key = self.VERSION_KEY.format(name)
+        self.maxsize = maxsize
+        self.alias = alias
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get_version(self):
+        return get_version(self.version_key, self.alias)
+
+    def key_version_key(self, key):
+        # Hashed, keys may not be valid cache keys (spaces, length)
+        return self.KEY_VERSION_KEY.format(self.name, hashlib.md5(str(key).encode()).hexdigest())
+
+    def get_versions(self, key):
+        """The shared version of the cache and of `key`, in one read."""
+        keys = [self.version_key, self.key_version_key(key)]
+        versions = caches[self.alias].get_many(keys)
+        return [versions[name] if name in versions else get_version(name, self.alias) for name in keys]
+
+    def invalidate(self, *keys):
+        """Outdate `keys` in every process, every key without any."""
+        if not keys:
+            bump_version(self.version_key, self.alias)
+            with self._lock:
+                self._entries.clear()
+                self._version = None
+            return
+        for key in keys:
+            bump_version(self.key_version_key(key), self.alias)
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def get_or_set(self, key, compute):
+        """The cached value of `key`, else `compute()`, cached unless it returned None."""
+        version, key_version = self.get_versions(key)
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            elif key in self._entries:
+                entry_version, value = self._entries[key]
+                if entry_version == key_version:
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+
+        value = compute()
+        if value is not None:
+            with self._lock:
+                if version == self._version:
+                    self._entries[key] = (key_version, value)
+                    if len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+        return value
@@ -0,0 +1,126 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+class SparseFieldsMixin:
+    """
+    `?fields=a,b` and `?expand=x,y` for read requests on a viewset.
+
+    `fields` prunes the serializer to the listed fields, `expand` swaps the
+    listed relations for the nested serializers declared in `expandable_fields`.
+    The queryset follows the resulting serializer: only() the columns it reads,
+    select_related() the relations it traverses and prefetch_related() the
+    many-valued ones. Fields computed from several columns (serializer methods,
+    model properties) declare their columns in `field_sources`; without such
+    a declaration every column is loaded, as before.
+    """
+
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    # Field name -> serializer class rendering the relation when expanded
+    expandable_fields = {}
+    # Field name -> model paths read by a computed field
+    field_sources = {}
+
+    def get_fieldset(self):
+        """The requested (fields or None, expand) pair, empty outside read requests."""
+        if self.request is None or self.request.method != 'GET':
+            return None, set()
+        params = self.request.query_params
+        fields = params.get(self.fields_query_param)
+        expand = {name for name in params.get(self.expand_query_param, '').split(',') if name}
+        expand &= set(self.expandable_fields)
+        if fields:
+            fields = {name for name in fields.split(',') if name} | expand
+        return fields or None, expand
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        self.apply_fieldset(getattr(serializer, 'child', serializer))
+        return serializer
+
+    def apply_fieldset(self, serializer):
+        fields, expand = self.get_fieldset()
+        for name in expand:
+            serializer.fields[name] = self.expandable_fields[name](read_only=True)
+        if fields is not None:
+            for name in list(serializer.fields):
+                if name not in fields:
+                    serializer.fields.pop(name)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, expand = self.get_fieldset()
+        if fields is None and not expand:
+            return queryset
+
+        plan = {'only': {'pk'}, 'select': set(), 'prefetch': set(), 'complete': True}
+        serializer = self.get_serializer()
+        self.plan_serializer(getattr(serializer, 'child', serializer), queryset.model, '', plan, self.field_sources)
+
+        if fields is not None and plan['complete']:
+            # The plan covers every relation the serializer reads
+            queryset = queryset.select_related(None).prefetch_related(None)
+            queryset = queryset.only(*plan['only'])
+        if plan['select']:
+            queryset = queryset.select_related(*plan['select'])
+        if plan['prefetch']:
+            queryset = queryset.prefetch_related(*plan['prefetch'])
+        return queryset
+
+    @classmethod
+    def plan_serializer(cls, serializer, model, prefix, plan, field_sources=None, nested=False):
+        """Record in `plan` the columns and relations `serializer` reads on `model`, below `prefix`."""
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            sources = (field_sources or {}).get(name)
+            if sources is None:
+                if field.source == '*':
+                    plan['complete'] = plan['complete'] and nested
+                    continue
+                sources = ['__'.join(field.source_attrs)]
+
+            target = getattr(field, 'child', field)
+            for source in sources:
+                if not cls.plan_path(model, prefix, source, target, plan, nested):
+                    plan['complete'] = plan['complete'] and nested
+
+    @classmethod
+    def plan_path(cls, model, prefix, path, field, plan, nested):
+        traversed = []
+        parts = path.split('__')
+        for index, part in enumerate(parts):
+            try:
+                model_field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                # A property or method, whose columns are unknown
+                return False
+            traversed.append(part)
+            lookup = prefix + '__'.join(traversed)
+            last = index == len(parts) - 1
+
+            if model_field.many_to_many or model_field.one_to_many:
+                plan['prefetch'].add(lookup)
+                if isinstance(field, serializers.BaseSerializer):
+                    cls.plan_serializer(field, model_field.related_model, lookup + '__', plan, nested=True)
+                return True
+            if model_field.is_relation and not (last and not isinstance(field, serializers.BaseSerializer)):
+                if model_field.one_to_one and model_field.auto_created:
+                    return False
+                if any(lookup.startswith(prefetched + '__') for prefetched in plan['prefetch']):
+                    plan['prefetch'].add(lookup)
+                else:
+                    plan['select'].add(lookup)
+                if not nested:
+                    plan['only'].add(lookup)
+                model = model_field.related_model
+                if last:
+                    cls.plan_serializer(field, model, lookup + '__', plan, nested=True)
+                    return True
+                continue
+            if not nested:
+                plan['only'].add(lookup)
+            return True
+        return True
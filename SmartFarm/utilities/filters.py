@@ -2,21 +2,32 @@ from django_filters import rest_framework as filters
 from django.utils import timezone
 import datetime
 
+from account.access import AccessSet
+from utilities.lookups import LookupChoiceField
+
 class BaseFarmFilter(filters.FilterSet):
     farm = filters.NumberFilter(method='filter_farm')
 
     def filter_farm(self, queryset, name, value):
+        user = getattr(self.request, 'user', None)
+        if not (user and user.is_authenticated):
+            return queryset.filter(farm=value) if value else queryset
+
+        # Fermes de l'utilisateur lues dans le token, sans requête sur FarmUser
+        farm_ids = AccessSet.request_farm_ids(self.request)
         if value:
+            if not user.is_superuser and int(value) not in farm_ids:
+                return queryset.none()
             return queryset.filter(farm=value)
 
-        user = getattr(self.request, 'user', None)
-        if user and user.is_authenticated:
-            current_farm = getattr(self.request, 'current_farm', None)
-            if current_farm:
-                return queryset.filter(farm=current_farm)
-            if hasattr(user, 'accessible_farms'):
-                return queryset.filter(farm__in=user.accessible_farms.all())
-        return queryset
+        current_farm_id = getattr(self.request, 'current_farm_id', None)
+        if current_farm_id:
+            return queryset.filter(farm_id=current_farm_id)
+        return queryset.filter(farm__in=farm_ids)
+
+class LookupChoiceFilter(filters.ModelChoiceFilter):
+    """ModelChoiceFilter validating its value from the lookup tables, see utilities.lookups."""
+    field_class = LookupChoiceField
 
 class BasePeriodFilter:
     def filter_period(self, queryset, name, value, date_field):
@@ -0,0 +1,139 @@
+import threading
+from django import forms
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.db.models.utils import make_model_tuple
+from rest_framework import serializers
+
+from utilities.cache import bump_version, get_version
+
+DEFAULT_LOOKUP_TABLES = [
+    'productions.AnimalType',
+    'productions.AnimalBreed',
+    'productions.WeightCategory',
+    'productions.MedicationType',
+    'productions.FeedType',
+    'finance.ExpenseCategory',
+    'finance.PaymentMethod',
+]
+
+
+class LookupTable:
+    """
+    Process-local copy of a small reference table, keyed by primary key.
+
+    The whole table is loaded on first use and reloaded once its shared
+    version, bumped after commit by the post_save and post_delete signals,
+    has moved. A lookup costs one read of that version from the shared cache.
+    The instances are shared by every request of the process: read them,
+    never modify them. Their relations are not loaded, resolve those through
+    `related()` when they point to another lookup table.
+    """
+
+    VERSION_KEY = 'lookups:{}:version'
+
+    tables = {}
+
+    def __init__(self, model):
+        self.model = model
+        self.version_key = self.VERSION_KEY.format(model._meta.label_lower)
+        self._rows = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def register(cls, model):
+        table = cls.tables[model] = cls(model)
+        post_save.connect(table.on_change, sender=model, dispatch_uid=table.version_key)
+        post_delete.connect(table.on_change, sender=model, dispatch_uid=table.version_key)
+        return table
+
+    @classmethod
+    def register_defaults(cls):
+        for label in getattr(settings, 'LOOKUP_TABLES', DEFAULT_LOOKUP_TABLES):
+            # Feed and health models are only loaded with the views importing them
+            apps.lazy_model_operation(cls.register, make_model_tuple(label))
+
+    @classmethod
+    def for_model(cls, model):
+        """The table of `model`, None when it is not cached."""
+        return cls.tables.get(model)
+
+    @classmethod
+    def for_queryset(cls, queryset):
+        """The table of an unfiltered `queryset`, which it can stand for."""
+        return None if queryset.query.has_filters() else cls.tables.get(queryset.model)
+
+    def invalidate(self):
+        bump_version(self.version_key)
+        self._rows = None
+
+    def on_change(self, sender, raw=False, **kwargs):
+        if not raw:
+            # After commit, or another process could reload the old rows under the new version
+            transaction.on_commit(self.invalidate)
+
+    def rows(self):
+        """Every row of the table by primary key, as of the shared version."""
+        version = get_version(self.version_key)
+        rows = self._rows
+        if rows is None or self._version != version:
+            with self._lock:
+                rows = self._rows
+                if rows is None or self._version != version:
+                    rows = {row.pk: row for row in self.model._default_manager.all()}
+                    self._rows, self._version = rows, version
+        return rows
+
+    def get(self, pk):
+        """The row of primary key `pk` (an int or its string), None when there is none."""
+        try:
+            pk = self.model._meta.pk.to_python(pk)
+        except Exception:
+            return None
+        return self.rows().get(pk)
+
+    def all(self):
+        return list(self.rows().values())
+
+
+def related(instance, field_name):
+    """`instance.<field_name>`, from the lookup tables when it is not loaded yet."""
+    field = instance._meta.get_field(field_name)
+    if not field.is_cached(instance):
+        table = LookupTable.for_model(field.related_model)
+        value = table.get(getattr(instance, field.attname)) if table is not None else None
+        if value is not None:
+            return value
+    return getattr(instance, field_name)
+
+
+class LookupRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field resolving the lookup tables from memory, other models with a query."""
+
+    def to_internal_value(self, data):
+        table = LookupTable.for_queryset(self.get_queryset())
+        if table is None or self.pk_field is not None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        instance = table.get(data)
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
+
+class LookupChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField validating against the lookup table of its model."""
+
+    def to_python(self, value):
+        table = LookupTable.for_queryset(self.queryset)
+        if table is None or self.to_field_name or value in self.empty_values:
+            return super().to_python(value)
+        instance = table.get(value)
+        if instance is None:
+            raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+        return instance
+
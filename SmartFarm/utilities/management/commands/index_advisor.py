@@ -0,0 +1,139 @@
+from datetime import date, timedelta
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import NoReverseMatch, URLPattern, URLResolver, get_resolver, reverse
+from django_filters import filters
+from rest_framework.test import APIClient
+
+from account.models import Farm
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the farm, period, date range and status filters of every list endpoint, "
+        "EXPLAIN the queries they issue and report the full table scans"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farm', type=int, help='Farm id to filter on (default: the first farm)')
+        parser.add_argument('--user', help='Username to query as (default: the first superuser)')
+        parser.add_argument('--url', action='append', default=[], help='Extra URL to check, e.g. from an access log (repeatable)')
+        parser.add_argument('--prefix', default='/api/', help='Only check list endpoints under this path')
+        parser.add_argument('--plans', action='store_true', help='Print every plan, not only the slow ones')
+
+    def handle(self, *args, **options):
+        farm = Farm.objects.filter(pk=options['farm']).first() if options['farm'] else Farm.objects.order_by('pk').first()
+        if farm is None:
+            raise CommandError("No such farm.")
+        users = get_user_model().objects.all()
+        user = (users.filter(username=options['user']) if options['user'] else users.filter(is_superuser=True)).first()
+        if user is None:
+            raise CommandError("No such user, pass --user.")
+
+        # A broken endpoint is reported, not fatal
+        self.client = APIClient(SERVER_NAME='localhost', raise_request_exception=False)
+        self.client.force_authenticate(user)
+        self.explain_prefix = connection.ops.explain_query_prefix()
+        self.show_plans = options['plans']
+
+        urls = [url for url in self.filter_urls(farm) if url.startswith(options['prefix'])] + options['url']
+        slow = {}
+        for url in urls:
+            for table in self.check_url(url):
+                slow.setdefault(table, []).append(url)
+
+        if not slow:
+            self.stdout.write(self.style.SUCCESS(f"Checked {len(urls)} requests, no full table scan."))
+            return
+        self.stdout.write(f"\nChecked {len(urls)} requests, full scans by table:")
+        for table, table_urls in sorted(slow.items()):
+            self.stdout.write(self.style.WARNING(f"  {table}: {len(table_urls)} requests"))
+            for url in table_urls:
+                self.stdout.write(f"    {url}")
+
+    def list_routes(self, patterns=None):
+        """(url name, viewset class) of every DRF list route."""
+        for pattern in get_resolver().url_patterns if patterns is None else patterns:
+            if isinstance(pattern, URLResolver):
+                yield from self.list_routes(pattern.url_patterns)
+            elif isinstance(pattern, URLPattern) and pattern.name and pattern.name.endswith('-list'):
+                view = getattr(pattern.callback, 'cls', None)
+                if view is not None and (getattr(pattern.callback, 'actions', None) or {}).get('get') == 'list':
+                    yield pattern.name, view
+
+    def filter_urls(self, farm):
+        """The requests exercising the farm scoped filters the API exposes."""
+        today = date.today()
+        urls = []
+        for name, view in dict(self.list_routes()).items():
+            try:
+                path = reverse(name)
+            except NoReverseMatch:
+                try:
+                    path = reverse(name, kwargs={'farm_id': farm.pk})
+                except NoReverseMatch:
+                    continue
+            urls.append(f"{path}?farm={farm.pk}")
+
+            filterset_class = getattr(view, 'filterset_class', None)
+            if filterset_class is None:
+                continue
+            for filter_name, declared in filterset_class.base_filters.items():
+                if filter_name == 'period':
+                    value = 'period=month'
+                elif isinstance(declared, filters.DateFromToRangeFilter):
+                    value = f"{filter_name}_after={today - timedelta(days=30)}&{filter_name}_before={today}"
+                elif filter_name == 'status' and isinstance(declared, filters.ChoiceFilter):
+                    value = f"status={list(declared.extra['choices'])[0][0]}"
+                else:
+                    continue
+                urls.append(f"{path}?farm={farm.pk}&{value}")
+        return urls
+
+    def check_url(self, url):
+        """EXPLAIN the SELECTs `url` issues, return the tables they scan in full."""
+        queries = []
+        def capture(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            response = self.client.get(url)
+        if response.status_code != 200:
+            self.stdout.write(self.style.ERROR(f"GET {url}: HTTP {response.status_code}"))
+            return set()
+
+        scanned = set()
+        seen = set()
+        for sql, params in queries:
+            if sql in seen:
+                continue
+            seen.add(sql)
+            with connection.cursor() as cursor:
+                cursor.execute(f"{self.explain_prefix} {sql}", params)
+                plan = [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+            tables = self.full_scans(plan)
+            scanned |= tables
+            if tables or self.show_plans:
+                self.stdout.write(f"GET {url}")
+                self.stdout.write(f"  {sql}")
+                for line in plan:
+                    self.stdout.write(f"    {line}")
+        return scanned
+
+    @staticmethod
+    def full_scans(plan):
+        """Tables read in full according to a SQLite or PostgreSQL plan."""
+        tables = set()
+        for line in plan:
+            words = line.split()
+            if 'SCAN' in words and 'USING' not in words:
+                # SQLite: "SCAN table" (a "SCAN table USING INDEX" walks an index)
+                position = words.index('SCAN') + 1
+                if position < len(words) and not words[position].startswith('CONSTANT'):
+                    tables.add(words[position])
+            elif 'Seq Scan on' in line:
+                tables.add(line.split('Seq Scan on', 1)[1].split()[0])
+        return tables
@@ -0,0 +1,28 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from utilities.search import SearchIndex
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search entries of the indexed models"
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', help='Models to reindex as app_label.Model (default: all indexed models)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        models = list(SearchIndex.documents)
+        if options['models']:
+            try:
+                models = [apps.get_model(label) for label in options['models']]
+            except (LookupError, ValueError) as e:
+                raise CommandError(str(e))
+            unknown = [model._meta.label for model in models if not SearchIndex.is_indexed(model)]
+            if unknown:
+                raise CommandError(f"Not indexed: {', '.join(unknown)}")
+
+        for model in models:
+            count = SearchIndex.rebuild(model, batch_size=options['batch_size'])
+            self.stdout.write(f"{model._meta.label}: {count} entries")
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
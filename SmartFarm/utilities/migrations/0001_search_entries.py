@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_TABLE = 'utilities_searchentry_fts'
+GIN_INDEX = 'utilities_search_document_gin'
+
+
+def create_fulltext_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        # External content FTS5 table kept in sync with the entries by triggers
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            "document, content='utilities_searchentry', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON utilities_searchentry BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.id, new.document); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON utilities_searchentry BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.id, old.document); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON utilities_searchentry BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.id, old.document); "
+            f"INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.id, new.document); END"
+        )
+    elif connection.vendor == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+        from django.contrib.postgres.search import SearchVector
+        SearchEntry = apps.get_model('utilities', 'SearchEntry')
+        schema_editor.add_index(SearchEntry, GinIndex(SearchVector('document', config='simple'), name=GIN_INDEX))
+
+
+def drop_fulltext_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        for suffix in ('_ai', '_ad', '_au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {GIN_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('farm_id', models.BigIntegerField(blank=True, null=True)),
+                ('document', models.TextField(blank=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['content_type', 'farm_id'], name='utilities_s_content_37f149_idx')],
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
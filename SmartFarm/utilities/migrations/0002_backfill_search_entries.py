@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.db import migrations
+
+# Indexed text of each model as of this migration, see utilities.search
+DOCUMENTS = {
+    'finance.Expense': ['description', 'invoice_number', 'category__name'],
+    'finance.Sale': ['invoice_number', 'notes', 'customer__name'],
+    'account.Customer': ['name', 'phone', 'email', 'city', 'street'],
+    'productions.BirthRecord': ['notes'],
+    'productions.AcquisitionRecord': ['notes', 'vendor', 'receipt_number'],
+    'productions.DiedRecord': ['notes', 'cause'],
+}
+BATCH_SIZE = 1000
+
+
+def document(instance, fields):
+    values = []
+    for path in fields:
+        value = instance
+        for name in path.split('__'):
+            value = getattr(value, name)
+            if value is None:
+                break
+        if value not in (None, ''):
+            values.append(str(value))
+    return ' '.join(values)
+
+
+def backfill_search_entries(apps, schema_editor):
+    # Index the rows saved before the index existed
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    SearchEntry = apps.get_model('utilities', 'SearchEntry')
+    for label, fields in getattr(settings, 'SEARCH_DOCUMENTS', DOCUMENTS).items():
+        model = apps.get_model(label)
+        content_type, _ = ContentType.objects.get_or_create(
+            app_label=model._meta.app_label, model=model._meta.model_name
+        )
+        paths = {field.rsplit('__', 1)[0] for field in fields if '__' in field}
+        indexed = SearchEntry.objects.filter(content_type=content_type).values('object_id')
+        queryset = model._default_manager.select_related(*paths).exclude(pk__in=indexed).order_by('pk')
+        batch = []
+        for instance in queryset.iterator(chunk_size=BATCH_SIZE):
+            batch.append(SearchEntry(
+                content_type=content_type,
+                object_id=instance.pk,
+                farm_id=getattr(instance, 'farm_id', None),
+                document=document(instance, fields),
+            ))
+            if len(batch) >= BATCH_SIZE:
+                SearchEntry.objects.bulk_create(batch)
+                batch = []
+        SearchEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utilities', '0001_search_entries'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('account', '0002_customuser_membership_version'),
+        ('finance', '0003_farm_status_index'),
+        ('productions', '0009_farm_scoped_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_entries, migrations.RunPython.noop),
+    ]
@@ -6,3 +6,14 @@ class TimestampedModel(models.Model):
     
     class Meta:
         abstract = True
+
+class SearchEntry(models.Model):
+    """Searchable text of one indexed object, see utilities.search.SearchIndex."""
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    farm_id = models.BigIntegerField(null=True, blank=True)
+    document = models.TextField(blank=True)
+
+    class Meta:
+        unique_together = ('content_type', 'object_id')
+        indexes = [models.Index(fields=['content_type', 'farm_id'])]
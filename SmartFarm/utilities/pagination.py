@@ -0,0 +1,119 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError as APIValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page number pagination that switches to keyset (cursor) pagination when the
+    client asks for it with `?pagination=cursor`, or follows a `cursor` link.
+
+    Cursor pages are keyed on (ordering field, id): a page is fetched with
+    `WHERE (field, id) < (last field, last id)` instead of an OFFSET, and
+    without COUNT(*), so every page costs the same whatever its depth. Views set
+    `cursor_ordering` (the default key, e.g. '-date') and may accept others from
+    `?ordering=` through `cursor_ordering_fields`. Key fields must be non null
+    and backed by a (farm, field, id) index. Search results, ordered by their
+    rank, are only paginated by page number.
+    """
+
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    invalid_cursor_message = 'Invalid cursor'
+
+    cursor_mode = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        if 'search_rank' in queryset.query.annotations:
+            raise APIValidationError({self.mode_query_param: 'Search results cannot be paginated with a cursor.'})
+
+        self.request = request
+        self.display_page_controls = False
+        page_size = self.get_page_size(request)
+        self.ordering = self.get_cursor_ordering(queryset, view)
+        field = self.ordering.lstrip('-')
+        cursor = self.decode_cursor(request)
+        if cursor and field != 'pk':
+            try:
+                cursor['v'] = queryset.model._meta.get_field(field).to_python(cursor['v'])
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+        reverse = bool(cursor and cursor['r'])
+
+        # Walking backwards flips the direction of the scan
+        descending = self.ordering.startswith('-') != reverse
+        keys = ['pk'] if field == 'pk' else [field, 'pk']
+        queryset = queryset.order_by(*[f'-{key}' if descending else key for key in keys])
+        if cursor:
+            lookup = 'lt' if descending else 'gt'
+            condition = Q(**{f'pk__{lookup}': cursor['pk']})
+            if field != 'pk':
+                condition = Q(**{f'{field}__{lookup}': cursor['v']}) | (Q(**{field: cursor['v']}) & condition)
+            queryset = queryset.filter(condition)
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        has_next, has_previous = (True, has_more) if reverse else (has_more, cursor is not None)
+        self.next_position = self.get_position(rows[-1], field) if rows and has_next else None
+        self.previous_position = self.get_position(rows[0], field) if rows and has_previous else None
+        return rows
+
+    def get_cursor_ordering(self, queryset, view):
+        requested = list(queryset.query.order_by)
+        allowed = getattr(view, 'cursor_ordering_fields', [])
+        if requested and requested[0].lstrip('-') in allowed:
+            ordering = requested[0]
+        else:
+            ordering = getattr(view, 'cursor_ordering', '-pk')
+        if ordering.lstrip('-') == 'id':
+            ordering = ordering.replace('id', 'pk')
+        return ordering
+
+    @staticmethod
+    def get_position(row, field):
+        return {'v': getattr(row, field) if field != 'pk' else None, 'pk': row.pk}
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if cursor['o'] != self.ordering:
+                raise ValueError('ordering changed')
+            cursor['pk'], cursor['r'] = int(cursor['pk']), int(cursor['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, position, reverse):
+        cursor = dict(position, o=self.ordering, r=int(reverse))
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, cls=DjangoJSONEncoder).encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.encode_cursor(self.next_position, False) if self.next_position else None,
+            'previous': self.encode_cursor(self.previous_position, True) if self.previous_position else None,
+            'results': data,
+        })
@@ -0,0 +1,234 @@
+import re
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import FloatField, OuterRef, Subquery, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.db.models.utils import make_model_tuple
+from rest_framework.filters import SearchFilter
+
+from account.access import AccessSet
+from utilities.lookups import related
+from utilities.models import SearchEntry
+
+# Indexed text of each model, relations followed with `__`
+DEFAULT_SEARCH_DOCUMENTS = {
+    'finance.Expense': ['description', 'invoice_number', 'category__name'],
+    'finance.Sale': ['invoice_number', 'notes', 'customer__name'],
+    'account.Customer': ['name', 'phone', 'email', 'city', 'street'],
+    'productions.BirthRecord': ['notes'],
+    'productions.AcquisitionRecord': ['notes', 'vendor', 'receipt_number'],
+    'productions.DiedRecord': ['notes', 'cause'],
+}
+
+
+class SearchIndex:
+    """
+    Full-text index of the farm records, one SearchEntry per indexed object.
+
+    Entries are searched through an FTS5 table on SQLite and a GIN index on
+    to_tsvector('simple', document) on PostgreSQL, both created by the
+    utilities migration, and ranked with bm25 / ts_rank. Every term of a
+    query must match, as a word prefix. Entries follow post_save and
+    post_delete of the indexed models, and of the models their documents
+    read through a relation (a renamed customer reindexes its sales once the
+    rename commits); bulk_create and update() bypass them, call `index()`
+    after those or `manage.py rebuild_search_index`.
+    """
+
+    FTS_TABLE = 'utilities_searchentry_fts'
+    CONFIG = 'simple'
+
+    documents = {}
+
+    @classmethod
+    def register(cls, model, fields):
+        cls.documents[model] = fields
+        uid = f'search:{model._meta.label_lower}'
+        post_save.connect(cls.on_save, sender=model, dispatch_uid=uid)
+        post_delete.connect(cls.on_delete, sender=model, dispatch_uid=uid)
+        for path in {field.rsplit('__', 1)[0] for field in fields if '__' in field}:
+            # Reindex the objects reading a related row once it changed, after commit and with
+            # the row joined: a lookup table still holds the old row until then
+            def reindex_dependents(sender, instance, raw=False, model=model, path=path, **kwargs):
+                if not raw:
+                    pk = instance.pk
+                    transaction.on_commit(
+                        lambda: cls.index(model._default_manager.select_related(path).filter(**{path: pk}))
+                    )
+            field = model._meta.get_field(path.split('__')[0])
+            post_save.connect(reindex_dependents, sender=field.related_model, weak=False, dispatch_uid=f'{uid}:{path}')
+
+    @classmethod
+    def register_defaults(cls):
+        for label, fields in getattr(settings, 'SEARCH_DOCUMENTS', DEFAULT_SEARCH_DOCUMENTS).items():
+            apps.lazy_model_operation(lambda model, fields=fields: cls.register(model, fields), make_model_tuple(label))
+
+    @classmethod
+    def is_indexed(cls, model):
+        return model in cls.documents
+
+    @classmethod
+    def on_save(cls, sender, instance, raw=False, **kwargs):
+        if not raw:
+            cls.index([instance])
+
+    @classmethod
+    def on_delete(cls, sender, instance, **kwargs):
+        cls.remove(sender, [instance.pk])
+
+    @classmethod
+    def document(cls, instance):
+        values = []
+        for path in cls.documents[type(instance)]:
+            value = instance
+            for name in path.split('__'):
+                value = related(value, name) if value._meta.get_field(name).is_relation else getattr(value, name)
+                if value is None:
+                    break
+            if value not in (None, ''):
+                values.append(str(value))
+        return ' '.join(values)
+
+    @classmethod
+    def index(cls, instances):
+        """Create or refresh the entries of `instances` (a list or a queryset of one model)."""
+        instances = list(instances)
+        if not instances:
+            return
+        model = type(instances[0])
+        content_type = ContentType.objects.get_for_model(model)
+        existing = dict(
+            SearchEntry.objects.filter(content_type=content_type, object_id__in=[instance.pk for instance in instances])
+            .values_list('object_id', 'pk')
+        )
+        entries = [
+            SearchEntry(
+                pk=existing.get(instance.pk),
+                content_type=content_type,
+                object_id=instance.pk,
+                farm_id=getattr(instance, 'farm_id', None),
+                document=cls.document(instance),
+            )
+            for instance in instances
+        ]
+        with transaction.atomic():
+            SearchEntry.objects.bulk_update([entry for entry in entries if entry.pk], ['farm_id', 'document'], batch_size=500)
+            SearchEntry.objects.bulk_create([entry for entry in entries if not entry.pk], batch_size=500)
+
+    @classmethod
+    def remove(cls, model, pks):
+        content_type = ContentType.objects.get_for_model(model)
+        SearchEntry.objects.filter(content_type=content_type, object_id__in=pks).delete()
+
+    @classmethod
+    def rebuild(cls, model, batch_size=1000):
+        """Reindex every object of `model`, returns how many."""
+        content_type = ContentType.objects.get_for_model(model)
+        # Relations read by the documents come with the rows
+        paths = {field.rsplit('__', 1)[0] for field in cls.documents[model] if '__' in field}
+        queryset = model._default_manager.select_related(*paths).order_by('pk')
+        count = 0
+        with transaction.atomic():
+            SearchEntry.objects.filter(content_type=content_type).delete()
+            batch = []
+            for instance in queryset.iterator(chunk_size=batch_size):
+                batch.append(SearchEntry(
+                    content_type=content_type,
+                    object_id=instance.pk,
+                    farm_id=getattr(instance, 'farm_id', None),
+                    document=cls.document(instance),
+                ))
+                if len(batch) >= batch_size:
+                    count += len(SearchEntry.objects.bulk_create(batch))
+                    batch = []
+            count += len(SearchEntry.objects.bulk_create(batch))
+        return count
+
+    @staticmethod
+    def terms(query):
+        return re.findall(r'\w+', query or '')
+
+    @classmethod
+    def filter(cls, queryset, query, farm_ids=None):
+        """
+        `queryset` restricted to the matches of `query` within `farm_ids` when
+        given, best first (the rank is annotated as search_rank). The matches
+        are a subquery of the entries and the rank is only computed for the
+        matching rows of `queryset`, whatever their number.
+        """
+        terms = cls.terms(query)
+        if not terms or (farm_ids is not None and not farm_ids):
+            return queryset.none()
+        model = queryset.model
+        content_type = ContentType.objects.get_for_model(model)
+        farm_ids = list(farm_ids) if farm_ids is not None else None
+
+        if connection.vendor == 'postgresql':
+            from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+            vector = SearchVector('document', config=cls.CONFIG)
+            search_query = SearchQuery(' & '.join(f'{term}:*' for term in terms), config=cls.CONFIG, search_type='raw')
+            entries = SearchEntry.objects.annotate(vector=vector).filter(content_type=content_type, vector=search_query)
+            if farm_ids is not None:
+                entries = entries.filter(farm_id__in=farm_ids)
+            matching = entries.values('object_id')
+            rank = Subquery(
+                entries.filter(object_id=OuterRef('pk')).annotate(rank=SearchRank(vector, search_query)).values('rank')[:1],
+                output_field=FloatField(),
+            )
+
+        elif connection.vendor == 'sqlite':
+            match = ' '.join(f'"{term}"*' for term in terms)
+            entries = SearchEntry._meta.db_table
+            sql = (
+                f"SELECT e.object_id FROM {cls.FTS_TABLE} JOIN {entries} e ON e.id = {cls.FTS_TABLE}.rowid "
+                f"WHERE {cls.FTS_TABLE} MATCH %s AND e.content_type_id = %s"
+            )
+            params = [match, content_type.pk]
+            if farm_ids is not None:
+                sql += f" AND e.farm_id IN ({', '.join(['%s'] * len(farm_ids))})"
+                params += farm_ids
+            matching = RawSQL(sql, params)
+            # bm25 of the row's own entry, only evaluated for the matching rows
+            outer_pk = f'{connection.ops.quote_name(model._meta.db_table)}.{connection.ops.quote_name(model._meta.pk.column)}'
+            rank = RawSQL(
+                f"(SELECT -bm25({cls.FTS_TABLE}) FROM {cls.FTS_TABLE} WHERE {cls.FTS_TABLE} MATCH %s AND rowid = "
+                f"(SELECT id FROM {entries} WHERE content_type_id = %s AND object_id = {outer_pk}))",
+                [match, content_type.pk],
+                output_field=FloatField(),
+            )
+
+        else:
+            # No full-text support: every term in the document, unranked
+            entries = SearchEntry.objects.filter(content_type=content_type)
+            if farm_ids is not None:
+                entries = entries.filter(farm_id__in=farm_ids)
+            for term in terms:
+                entries = entries.filter(document__icontains=term)
+            matching = entries.values('object_id')
+            rank = Value(0.0, output_field=FloatField())
+
+        return queryset.filter(pk__in=matching).annotate(search_rank=rank).order_by('-search_rank', '-pk')
+
+    @staticmethod
+    def request_farm_ids(request):
+        """The farms a request searches: its current farm, else the user's farms, None for superusers."""
+        current_farm_id = getattr(request, 'current_farm_id', None)
+        if current_farm_id:
+            return [current_farm_id]
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated or user.is_superuser:
+            return None
+        return AccessSet.request_farm_ids(request)
+
+
+class IndexedSearchFilter(SearchFilter):
+    """SearchFilter answering from the SearchIndex for indexed models, ranked best first."""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or not SearchIndex.is_indexed(queryset.model):
+            return super().filter_queryset(request, queryset, view)
+        return SearchIndex.filter(queryset, ' '.join(terms), SearchIndex.request_farm_ids(request))
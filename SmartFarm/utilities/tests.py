@@ -1,3 +1,281 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from django import forms
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from account.models import CustomUser, Customer, Farm, FarmUser
+from finance.models import Expense, ExpenseCategory
+from productions.models import DiedRecord
+from utilities.lookups import LookupChoiceField, LookupRelatedField, LookupTable, related
+from utilities.management.commands.index_advisor import Command
+from utilities.models import SearchEntry
+from utilities.search import SearchIndex
+
+ADDRESS = dict(street='1 rue des Baobabs', city='Thiès', postal_code='21000', country_name='Sénégal', country_code='SN')
+# Versions and cached lookups stay out of the development cache
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'utilities-tests'}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class UtilitiesTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_superuser('admin', password='secret', **ADDRESS)
+        cls.farm = Farm.objects.create(name='Ferme', owner=cls.user, **ADDRESS)
+        FarmUser.objects.create(farm=cls.farm, user=cls.user)
+        cls.category = ExpenseCategory.objects.create(name='Feed')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_expense(self, amount='100', day=None, **fields):
+        return Expense.objects.create(
+            farm=self.farm, category=self.category, amount=Decimal(amount), created_by=self.user,
+            date=day or date.today(), **fields
+        )
+
+
+class KeysetPaginationTests(UtilitiesTestCase):
+    def setUp(self):
+        super().setUp()
+        # Three dates shared by many rows, so pages split ties on the id
+        for index in range(60):
+            self.add_expense(day=date(2024, 1, 1 + index % 3))
+        self.expected = list(Expense.objects.order_by('-date', '-pk').values_list('pk', flat=True))
+
+    def walk(self, url, direction):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertNotIn('count', data)
+            page = [row['id'] for row in data['results']]
+            ids = page + ids if direction == 'previous' else ids + page
+            url = data[direction]
+        return ids, data
+
+    def test_cursor_pages_follow_the_ordering_both_ways(self):
+        forward, last_page = self.walk('/api/finance/expenses/?pagination=cursor', 'next')
+        self.assertEqual(forward, self.expected)
+
+        previous = last_page['previous']
+        backward, _ = self.walk(previous, 'previous')
+        self.assertEqual(backward, self.expected[:50])
+
+    def test_cursor_pages_seek_instead_of_counting(self):
+        first = self.client.get('/api/finance/expenses/?pagination=cursor').json()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(first['next'])
+        self.assertEqual(len(response.json()['results']), 25)
+        expenses = [query['sql'] for query in queries if 'finance_expense' in query['sql']]
+        self.assertFalse(any('COUNT(' in sql or 'OFFSET' in sql for sql in expenses))
+
+    def test_tampered_cursors_are_a_404(self):
+        self.assertEqual(self.client.get('/api/finance/expenses/', {'cursor': 'garbage'}).status_code, 404)
+        first = self.client.get('/api/finance/expenses/?pagination=cursor').json()
+        # Not a cursor key: the page keeps the default key
+        response = self.client.get(first['next'] + '&ordering=amount')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(first['next'] + '&ordering=date')
+        self.assertEqual(response.status_code, 404)
+
+
+class SparseFieldsTests(UtilitiesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_expense(description='Foin', invoice_number='INV-1')
+
+    def test_fields_prune_the_payload_and_the_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/finance/expenses/', {'fields': 'id,amount'})
+        self.assertEqual(list(response.json()['results'][0]), ['id', 'amount'])
+        select = next(query['sql'] for query in queries if query['sql'].startswith('SELECT "finance_expense"."id"'))
+        self.assertNotIn('"description"', select)
+
+    def test_expand_nests_the_relation_in_the_same_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/finance/expenses/', {'fields': 'id', 'expand': 'category'})
+        self.assertEqual(response.json()['results'][0]['category']['name'], 'Feed')
+        self.assertFalse(any('FROM "finance_expensecategory"' in query['sql'] for query in queries))
+
+    def test_unknown_expansions_are_ignored(self):
+        response = self.client.get('/api/finance/expenses/', {'expand': 'created_by'})
+        self.assertEqual(response.json()['results'][0]['category'], self.category.pk)
+
+
+class IndexAdvisorTests(UtilitiesTestCase):
+    def test_full_scans_are_read_from_sqlite_and_postgresql_plans(self):
+        plans = [
+            '2 0 0 SCAN productions_animal',
+            '3 0 0 SEARCH finance_expense USING INDEX finance_exp_farm_id_1a2b3c (farm_id=?)',
+            '4 0 0 SCAN productions_diedrecord USING INDEX productions_farm_status',
+            '5 0 0 SCAN CONSTANT ROW',
+            'Seq Scan on finance_sale  (cost=0.00..1.01 rows=1 width=4)',
+            'Index Scan using productions_birthrecord_farm on productions_birthrecord',
+        ]
+        self.assertEqual(Command.full_scans(plans), {'productions_animal', 'finance_sale'})
+
+    def test_farm_scoped_record_filters_use_an_index(self):
+        queryset = DiedRecord.objects.filter(farm=self.farm, date_of_death__gte=date(2024, 1, 1))
+        plan = queryset.explain().splitlines()
+        self.assertNotIn('productions_diedrecord', Command.full_scans(plan))
+
+    def test_command_replays_the_list_filters(self):
+        out = StringIO()
+        call_command('index_advisor', prefix='/api/finance/expenses/', stdout=out)
+        self.assertRegex(out.getvalue(), r'Checked [1-9]\d* requests')
+        self.assertNotIn('HTTP 500', out.getvalue())
+
+
+class LookupTableTests(UtilitiesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.table = LookupTable.for_model(ExpenseCategory)
+
+    def test_rows_are_served_from_memory(self):
+        self.assertEqual(self.table.get(self.category.pk).name, 'Feed')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.table.get(str(self.category.pk)).name, 'Feed')
+            self.assertIsNone(self.table.get('feed'))
+            self.assertIsNone(self.table.get(999999))
+
+    def test_committed_changes_reload_the_table(self):
+        self.table.all()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.category.name = 'Fourrage'
+            self.category.save()
+            # Until the commit, the old row
+            self.assertEqual(self.table.get(self.category.pk).name, 'Feed')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.table.get(self.category.pk).name, 'Fourrage')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            added = ExpenseCategory.objects.create(name='Vaccins')
+        self.assertEqual(self.table.get(added.pk).name, 'Vaccins')
+
+    def test_related_reads_unloaded_relations_from_the_table(self):
+        expense = Expense.objects.get(pk=self.add_expense().pk)
+        self.table.all()
+        with self.assertNumQueries(0):
+            self.assertEqual(related(expense, 'category').name, 'Feed')
+        # Not a lookup table: the usual query
+        with self.assertNumQueries(1):
+            self.assertEqual(related(expense, 'farm'), self.farm)
+
+    def test_serializer_fields_validate_against_the_table(self):
+        field = LookupRelatedField(queryset=ExpenseCategory.objects.all())
+        self.table.all()
+        with self.assertNumQueries(0):
+            self.assertEqual(field.to_internal_value(str(self.category.pk)), self.category)
+            with self.assertRaisesMessage(ValidationError, 'does not exist'):
+                field.to_internal_value(999999)
+            with self.assertRaisesMessage(ValidationError, 'Incorrect type'):
+                field.to_internal_value(True)
+        # A filtered queryset is not the table: queried as usual
+        field = LookupRelatedField(queryset=ExpenseCategory.objects.exclude(pk=self.category.pk))
+        with self.assertRaisesMessage(ValidationError, 'does not exist'):
+            field.to_internal_value(self.category.pk)
+
+    def test_form_fields_validate_against_the_table(self):
+        field = LookupChoiceField(queryset=ExpenseCategory.objects.all())
+        self.table.all()
+        with self.assertNumQueries(0):
+            self.assertEqual(field.clean(str(self.category.pk)), self.category)
+            with self.assertRaises(forms.ValidationError):
+                field.clean('999999')
+
+    def test_the_api_rejects_unknown_lookups(self):
+        response = self.client.post('/api/finance/expenses/', {
+            'farm': self.farm.pk, 'category': 999999, 'amount': '10', 'date': '2024-01-01',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('category', response.json())
+
+
+class SearchIndexTests(UtilitiesTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_farm = Farm.objects.create(name='Autre ferme', owner=cls.user, **ADDRESS)
+
+    def search(self, query, farm_ids=None, queryset=None):
+        queryset = Expense.objects.all() if queryset is None else queryset
+        return list(SearchIndex.filter(queryset, query, farm_ids).values_list('pk', flat=True))
+
+    def test_saved_objects_are_searchable_by_word_prefix(self):
+        hay = self.add_expense(description='Foin de brousse', invoice_number='INV-7')
+        straw = self.add_expense(description='Paille')
+        self.assertEqual(self.search('foi brou'), [hay.pk])
+        self.assertEqual(self.search('inv 7'), [hay.pk])
+        self.assertEqual(sorted(self.search('feed')), [hay.pk, straw.pk])
+        self.assertEqual(self.search('foin paille'), [])
+        self.assertEqual(self.search('  '), [])
+
+        straw.description = 'Foin'
+        straw.save()
+        self.assertEqual(sorted(self.search('foin')), [hay.pk, straw.pk])
+        hay.delete()
+        self.assertEqual(self.search('foin'), [straw.pk])
+        self.assertFalse(SearchEntry.objects.filter(document__contains='brousse').exists())
+
+    def test_renamed_relations_reindex_their_dependents_after_commit(self):
+        expense = self.add_expense(description='Foin')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Fourrage'
+            self.category.save()
+        self.assertEqual(self.search('fourrage'), [expense.pk])
+        self.assertEqual(self.search('feed'), [])
+
+        customer = Customer.objects.create(name='Moussa Diop', farm=self.farm, **ADDRESS)
+        with self.captureOnCommitCallbacks(execute=True):
+            customer.name = 'Aminata Diop'
+            customer.save()
+        self.assertEqual(self.search('aminata', queryset=Customer.objects.all()), [customer.pk])
+
+    def test_searches_stay_within_the_farms_and_the_queryset(self):
+        here = self.add_expense(description='Foin', day=date(2024, 1, 1))
+        later = self.add_expense(description='Foin', day=date(2024, 6, 1))
+        elsewhere = Expense.objects.create(
+            farm=self.other_farm, category=self.category, amount=Decimal('5'), created_by=self.user, description='Foin'
+        )
+        self.assertEqual(self.search('foin', [self.farm.pk]), [later.pk, here.pk])
+        self.assertEqual(self.search('foin', [self.other_farm.pk]), [elsewhere.pk])
+        self.assertEqual(self.search('foin', []), [])
+        self.assertEqual(self.search('foin', queryset=Expense.objects.filter(date__lt=date(2024, 2, 1))), [here.pk])
+
+    def test_the_api_searches_the_index(self):
+        hay = self.add_expense(description='Foin')
+        self.add_expense(description='Paille')
+        response = self.client.get('/api/finance/expenses/', {'search': 'foin'})
+        self.assertEqual([row['id'] for row in response.json()['results']], [hay.pk])
+        # Ranked results have no key to seek on
+        response = self.client.get('/api/finance/expenses/', {'search': 'foin', 'pagination': 'cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_the_backfill_indexes_the_rows_saved_before_the_index(self):
+        hay = self.add_expense(description='Foin')
+        customer = Customer.objects.create(name='Moussa Diop', farm=self.farm, **ADDRESS)
+        SearchEntry.objects.all().delete()
+        self.assertEqual(self.search('foin'), [])
+
+        backfill = import_module('utilities.migrations.0002_backfill_search_entries').backfill_search_entries
+        backfill(apps, None)
+        self.assertEqual(self.search('foin feed'), [hay.pk])
+        self.assertEqual(self.search('moussa', [self.farm.pk], Customer.objects.all()), [customer.pk])
+        # Rows already indexed are left alone
+        count = SearchEntry.objects.count()
+        backfill(apps, None)
+        self.assertEqual(SearchEntry.objects.count(), count)